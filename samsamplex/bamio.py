@@ -0,0 +1,44 @@
+"""BAM output helpers: header sort-order tags and sort/index finalisation."""
+
+from __future__ import annotations
+
+import os
+from typing import Callable
+
+import pysam
+
+
+def header_mark_sorted(
+    header: pysam.AlignmentHeader, sort_order: str = "coordinate",
+) -> pysam.AlignmentHeader:
+    """Return a copy of *header* with ``@HD SO:<sort_order>`` set."""
+    hd = header.to_dict()
+    hd.setdefault("HD", {"VN": "1.6"})
+    hd["HD"]["SO"] = sort_order
+    hd["HD"].pop("GO", None)
+    return pysam.AlignmentHeader.from_dict(hd)
+
+
+def bam_finalize(
+    out_bam: str,
+    presorted: bool,
+    log: Callable[[str], None],
+    tag: str,
+) -> None:
+    """Index *out_bam*, sorting it first unless it is already coordinate-ordered.
+
+    Failures are reported as warnings through *log*; the unsorted/unindexed
+    BAM is left in place.
+    """
+    try:
+        if presorted:
+            log(f"[{tag}] Output already coordinate-sorted, indexing only...")
+        else:
+            log(f"[{tag}] Sorting output BAM...")
+            tmp_sorted = out_bam + ".tmp.sorted.bam"
+            pysam.sort("-o", tmp_sorted, out_bam)
+            os.replace(tmp_sorted, out_bam)
+        pysam.index(out_bam)
+        log(f"[{tag}] {'Indexing' if presorted else 'Sorting and indexing'} complete.")
+    except Exception as exc:
+        log(f"Warning: Failed to sort/index output BAM: {exc}")
@@ -2,13 +2,20 @@
 
 from __future__ import annotations
 
+import gzip
+import os
 import random
+from contextlib import contextmanager
+from itertools import islice
 from pathlib import Path
-from typing import TextIO
+from typing import BinaryIO, Iterable, Iterator, TextIO, TypeVar
 
 import numpy as np
+import pysam
 
-from .depth import DepthArray
+from .depth import DepthArray, RunLengthDepthArray, depth_dense
+
+T = TypeVar("T")
 
 
 def contig_names_match(name1: str, name2: str) -> bool:
@@ -19,6 +26,11 @@ def contig_names_match(name1: str, name2: str) -> bool:
     return strip(name1) == strip(name2)
 
 
+def find_contig(entries: Iterable[T], contig: str) -> T | None:
+    """First of *entries* whose ``name`` matches *contig* (``chr`` prefix ignored)."""
+    return next((e for e in entries if contig_names_match(e.name, contig)), None)
+
+
 # ── Writing ──────────────────────────────────────────────────────────────────
 
 
@@ -27,6 +39,108 @@ def write_bed_entry(fp: TextIO, chrom: str, start: int, end: int, depth: int) ->
     fp.write(f"{chrom}\t{start}\t{end}\t{depth}\n")
 
 
+# Lines formatted per buffer by the bulk writer.
+BED_WRITE_CHUNK = 1 << 18
+
+
+def _digit_tables() -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """4-digit ASCII groups for 0..9999, each packed into one uint32.
+
+    Returns (zero-padded, leading zeros blanked, leading zeros blanked but
+    ``0`` kept as ``"0"``); blanked bytes are 0 and dropped after formatting.
+    """
+    padded = np.array([list(f"{i:04d}".encode()) for i in range(10000)], dtype=np.uint8)
+    lead = padded.copy()
+    for i in range(10000):
+        lead[i, : 4 - len(str(i))] = 0
+    last = lead.copy()
+    lead[0, 3] = 0
+    return tuple(t.view(np.uint32).ravel() for t in (padded, lead, last))
+
+
+_DIGITS_PADDED, _DIGITS_LEAD, _DIGITS_LAST = _digit_tables()
+
+
+def _digit_groups(values: np.ndarray) -> int:
+    """4-digit groups needed for the largest of *values*."""
+    return -(-len(str(int(values.max()))) // 4)
+
+
+def _fill_digits(out: np.ndarray, values: np.ndarray) -> None:
+    """Write non-negative *values* as right-aligned ASCII into *out*, a
+    (len(values), groups) uint32 view of the line buffer, most significant
+    group first, with leading zeros as 0 bytes."""
+    groups = out.shape[1]
+    dt = np.uint32 if int(values.max()) < 2**32 else np.uint64
+    v = values.astype(dt, copy=False)
+    for col, k in enumerate(range(groups - 1, -1, -1)):
+        q = v // dt(10000**k) if k else v
+        lead = _DIGITS_LAST if k == 0 else _DIGITS_LEAD
+        if col == 0:
+            out[:, col] = lead[q]
+        else:
+            r = q % dt(10000)
+            out[:, col] = np.where(q >= 10000, _DIGITS_PADDED[r], lead[r])
+
+
+def _format_bed_lines(chrom: str, starts: np.ndarray, ends: np.ndarray, depths: np.ndarray) -> str:
+    """BED4 lines for arrays of intervals, formatted as one string.
+
+    Each line is laid out as a fixed-width byte row with 0 bytes in place of
+    leading zeros; dropping them leaves exactly what :func:`write_bed_entry`
+    writes for each interval.
+    """
+    name = np.frombuffer(chrom.encode(), dtype=np.uint8)
+    columns = [(starts, _digit_groups(starts)), (ends, _digit_groups(ends)), (depths, _digit_groups(depths))]
+    width = len(name) + sum(1 + 4 * g for _, g in columns) + 1
+
+    rows = np.empty((len(starts), width), dtype=np.uint8)
+    rows[:, : len(name)] = name
+    pos = len(name)
+    for values, groups in columns:
+        rows[:, pos] = ord("\t")
+        _fill_digits(rows[:, pos + 1 : pos + 1 + 4 * groups].view(np.uint32), values)
+        pos += 1 + 4 * groups
+    rows[:, pos] = ord("\n")
+    return rows[rows != 0].tobytes().decode()
+
+
+def write_bed_intervals(
+    fp: TextIO, chrom: str, starts: np.ndarray, ends: np.ndarray, depths: np.ndarray,
+) -> None:
+    """Write arrays of BED4 intervals in buffers of BED_WRITE_CHUNK lines."""
+    for lo in range(0, len(starts), BED_WRITE_CHUNK):
+        hi = lo + BED_WRITE_CHUNK
+        d = depths[lo:hi]
+        if d.min() < 0:
+            # Digit tables assume non-negative depths
+            for a, b, v in zip(starts[lo:hi].tolist(), ends[lo:hi].tolist(), d.tolist()):
+                write_bed_entry(fp, chrom, a, b, v)
+        else:
+            fp.write(_format_bed_lines(chrom, starts[lo:hi], ends[lo:hi], d))
+
+
+def collapse_starts(depths: np.ndarray, collapse: int) -> np.ndarray:
+    """Start indices of collapsed intervals.
+
+    Same greedy rule as a per-position scan: an interval ends at the first
+    position whose depth differs from the interval's *first* depth by more
+    than *collapse*.  Runs of equal depth are found with numpy first, so the
+    (inherently sequential) greedy merge visits each run once instead of
+    each position.
+    """
+    run_starts = np.concatenate(([0], np.flatnonzero(depths[1:] != depths[:-1]) + 1))
+    values = depths[run_starts].tolist()
+
+    keep = []
+    ref = values[0]
+    for j, v in enumerate(values):
+        if v - ref > collapse or ref - v > collapse:
+            keep.append(j)
+            ref = v
+    return np.concatenate(([0], run_starts[keep])).astype(np.int64)
+
+
 def write_bed_output(fp: TextIO, arr: DepthArray, collapse: int = 0) -> None:
     """Write a DepthArray to BED format with optional collapsing.
 
@@ -34,30 +148,268 @@ def write_bed_output(fp: TextIO, arr: DepthArray, collapse: int = 0) -> None:
     consecutive positions whose depth differs by <= *collapse* are merged
     into a single interval (using the depth of the first position in the
     interval.
+
+    Lines are formatted with numpy in chunks and written as single buffers;
+    output is identical to calling :func:`write_bed_entry` per interval.
     """
     if arr.length == 0:
         return
 
     if collapse == 0:
-        for i in range(arr.length):
-            pos = arr.start + i
-            write_bed_entry(fp, arr.contig, pos, pos + 1, int(arr.depths[i]))
+        starts = np.arange(arr.start, arr.end, dtype=np.int64)
+        write_bed_intervals(fp, arr.contig, starts, starts + 1, arr.depths)
     else:
-        interval_start = arr.start
-        interval_depth = int(arr.depths[0])
+        idx = collapse_starts(arr.depths, collapse)
+        ends = np.append(idx[1:], arr.length)
+        write_bed_intervals(fp, arr.contig, idx + arr.start, ends + arr.start, arr.depths[idx])
+
+
+def bed_compress_index(bed_path: str, out_path: str) -> None:
+    """bgzip the plain BED *bed_path* into *out_path* and tabix-index it."""
+    pysam.tabix_compress(bed_path, out_path, force=True)
+    pysam.tabix_index(out_path, preset="bed", force=True)
 
-        for i in range(1, arr.length):
-            current_depth = int(arr.depths[i])
-            if abs(current_depth - interval_depth) > collapse:
-                write_bed_entry(fp, arr.contig, interval_start, arr.start + i, interval_depth)
-                interval_start = arr.start + i
-                interval_depth = current_depth
 
-        write_bed_entry(fp, arr.contig, interval_start, arr.end, interval_depth)
+@contextmanager
+def bed_output(path: str) -> Iterator[TextIO]:
+    """Open *path* for writing BED text.
+
+    A ``.gz`` path is written as plain text to a temporary file, then
+    bgzipped and tabix-indexed (:func:`bed_compress_index`) on close.
+    """
+    if not path.endswith(".gz"):
+        with open(path, "w") as fp:
+            yield fp
+        return
+
+    plain_path = path + ".tmp"
+    try:
+        with open(plain_path, "w") as fp:
+            yield fp
+        bed_compress_index(plain_path, path)
+    finally:
+        if os.path.exists(plain_path):
+            os.remove(plain_path)
 
 
 # ── Reading ──────────────────────────────────────────────────────────────────
 
+# File suffix of binary depth templates, dispatched to samsamplex.ssxd.
+SSXD_SUFFIX = ".ssxd"
+
+# Bytes of BED text parsed per chunk by the bulk reader.
+BED_READ_CHUNK = 1 << 24
+
+# Lines per block when fetching from a tabix-indexed BED.
+TABIX_BATCH_LINES = 1 << 20
+
+# Longest integer field parsed by the vectorised path (fits in int64).
+_MAX_INT_DIGITS = 18
+
+# bed_read_template keeps runs only while there is at most one interval per
+# this many positions; past that runs save little over a per-position array.
+TEMPLATE_DENSE_RATIO = 4
+
+
+def bed_has_index(bed_path: str) -> bool:
+    """True for a bgzipped BED with a tabix (``.tbi``) or CSI index beside it."""
+    return bed_path.endswith(".gz") and (
+        os.path.exists(bed_path + ".tbi") or os.path.exists(bed_path + ".csi")
+    )
+
+
+def _bed_chunks(fp: BinaryIO) -> Iterator[bytes]:
+    """Yield blocks of whole lines (each ending in a newline) from *fp*."""
+    rest = b""
+    while True:
+        block = fp.read(BED_READ_CHUNK)
+        if not block:
+            break
+        block = rest + block
+        cut = block.rfind(b"\n") + 1
+        rest = block[cut:]
+        if cut:
+            yield block[:cut]
+    if rest:
+        yield rest + b"\n"
+
+
+def _tabix_chunks(bed_path: str, contig: str, start: int, end: int) -> Iterator[bytes]:
+    """Yield blocks of the lines overlapping [start, end) from an indexed BED,
+    for every indexed contig name matching *contig* (``chr`` prefix ignored)."""
+    if start >= end:
+        return
+    with pysam.TabixFile(bed_path) as tbx:
+        for name in tbx.contigs:
+            if not contig_names_match(name, contig):
+                continue
+            lines = tbx.fetch(name, start, end)
+            while True:
+                batch = list(islice(lines, TABIX_BATCH_LINES))
+                if not batch:
+                    break
+                yield ("\n".join(batch) + "\n").encode()
+
+
+def _parse_int_fields(buf: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray | None:
+    """Parse unsigned decimal fields ``buf[starts:ends]``; None if any field
+    is empty, too long or contains a non-digit."""
+    lengths = ends - starts
+    if not len(lengths):
+        return np.zeros(0, dtype=np.int64)
+    width = int(lengths.max())
+    if lengths.min() < 1 or width > _MAX_INT_DIGITS:
+        return None
+
+    # Horner's rule over right-aligned digit columns
+    values = np.zeros(len(lengths), dtype=np.int64)
+    for j in range(width):
+        pos = ends - width + j
+        digit = buf[np.maximum(pos, 0)] - np.uint8(ord("0"))  # non-digits wrap above 9
+        if j >= width - int(lengths.min()):
+            if (digit > 9).any():
+                return None
+            values = values * 10 + digit
+        else:
+            inside = pos >= starts
+            if (digit[inside] > 9).any():
+                return None
+            values = np.where(inside, values * 10 + digit, values)
+    return values
+
+
+def _split_bed_chunk(chunk: bytes) -> tuple[list[bytes], np.ndarray, np.ndarray, np.ndarray] | None:
+    """Columns of a block of tab-separated BED lines, parsed with numpy.
+
+    Returns (chroms, starts, ends, depths), with *chroms* holding a single
+    name when every line has the same one.  Returns None when the block is
+    not regular: differing column counts, fewer than 4 columns, blank or
+    comment lines, or fields that are not plain unsigned integers.  Comment
+    lines at the start of the block (a file header) are skipped first.
+    """
+    while chunk.startswith(b"#"):
+        chunk = chunk[chunk.find(b"\n") + 1 :] if b"\n" in chunk else b""
+    if not chunk:
+        return None
+    buf = np.frombuffer(chunk, dtype=np.uint8)
+    seps = np.flatnonzero((buf == ord("\t")) | (buf == ord("\n")))
+    n_cols = chunk.count(b"\t", 0, chunk.find(b"\n")) + 1
+    n_lines = chunk.count(b"\n")
+    if n_cols < 4 or len(seps) != n_cols * n_lines:
+        return None
+    if not (buf[seps[n_cols - 1 :: n_cols]] == ord("\n")).all():
+        return None
+
+    field_starts = np.concatenate(([0], seps[:-1] + 1)).reshape(n_lines, n_cols)
+    field_ends = seps.reshape(n_lines, n_cols)
+    columns = [
+        _parse_int_fields(buf, field_starts[:, j].copy(), field_ends[:, j].copy()) for j in (1, 2, 3)
+    ]
+    if any(c is None for c in columns):
+        return None
+
+    c_starts, c_ends = field_starts[:, 0], field_ends[:, 0]
+    first = chunk[c_starts[0] : c_ends[0]]
+    same = (c_ends - c_starts == len(first)).all() and (
+        buf[c_starts[:, None] + np.arange(len(first))[None, :]] == buf[c_starts[0] : c_ends[0]]
+    ).all()
+    chroms = [first] if same else [chunk[a:b] for a, b in zip(c_starts.tolist(), c_ends.tolist())]
+    return chroms, columns[0], columns[1], columns[2]
+
+
+def _parse_bed_line(line: str) -> tuple[str, int, int, int] | None:
+    """(chrom, start, end, depth) of one BED line; None for comments, blank
+    lines and lines with fewer than 4 columns."""
+    line = line.rstrip("\r")
+    if not line or line.startswith("#"):
+        return None
+
+    parts = line.split("\t")
+    if len(parts) < 4:
+        parts = line.split()
+    if len(parts) < 4:
+        return None
+
+    return parts[0], int(parts[1]), int(parts[2]), int(parts[3])
+
+
+def _fill_bed_lines(
+    depths: np.ndarray, text: str, contig: str, region_start: int, region_end: int,
+) -> None:
+    """Per-line parser: handles any BED text the vectorised path rejects."""
+    for line in text.split("\n"):
+        parsed = _parse_bed_line(line)
+        if parsed is None:
+            continue
+        chrom, bed_start, bed_end, depth = parsed
+
+        if not contig_names_match(chrom, contig):
+            continue
+
+        ov_start = max(bed_start, region_start)
+        ov_end = min(bed_end, region_end)
+        if ov_start >= ov_end:
+            continue
+
+        depths[ov_start - region_start : ov_end - region_start] = depth
+
+
+def _fill_bed_intervals(
+    depths: np.ndarray,
+    chroms: list[bytes],
+    starts: np.ndarray,
+    ends: np.ndarray,
+    values: np.ndarray,
+    contig: str,
+    region_start: int,
+    region_end: int,
+) -> None:
+    """Fill *depths* from parsed intervals; later intervals overwrite earlier."""
+    clipped = _clip_bed_intervals(chroms, starts, ends, values, contig, region_start, region_end)
+    if clipped is not None:
+        _fill_clipped(depths, *clipped)
+
+
+def _clip_bed_intervals(
+    chroms: list[bytes],
+    starts: np.ndarray,
+    ends: np.ndarray,
+    values: np.ndarray,
+    contig: str,
+    region_start: int,
+    region_end: int,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray] | None:
+    """Intervals on *contig* clipped to the region, as region offsets."""
+    names = set(chroms)
+    matched = {c for c in names if contig_names_match(c.decode(), contig)}
+    if not matched:
+        return None
+    if len(chroms) > 1 and len(matched) < len(names):
+        keep = np.fromiter((c in matched for c in chroms), dtype=bool, count=len(chroms))
+        starts, ends, values = starts[keep], ends[keep], values[keep]
+
+    ov_start = np.maximum(starts, region_start) - region_start
+    ov_end = np.minimum(ends, region_end) - region_start
+    keep = ov_start < ov_end
+    if not keep.any():
+        return None
+    return ov_start[keep], ov_end[keep], values[keep]
+
+
+def _fill_clipped(
+    depths: np.ndarray, ov_start: np.ndarray, ov_end: np.ndarray, values: np.ndarray,
+) -> None:
+    if (ov_start[1:] < ov_end[:-1]).any():
+        # Unsorted or overlapping: assign in file order so the last one wins
+        for a, b, v in zip(ov_start.tolist(), ov_end.tolist(), values.tolist()):
+            depths[a:b] = v
+        return
+
+    # Sorted, disjoint intervals: expand runs into one position array
+    lengths = ov_end - ov_start
+    shift = np.repeat(ov_start - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+    depths[np.arange(int(lengths.sum())) + shift] = np.repeat(values, lengths)
+
 
 def bed_read_depths(
     bed_path: str,
@@ -65,80 +417,364 @@ def bed_read_depths(
     region_start: int,
     region_end: int,
 ) -> DepthArray:
-    """Read depth values from a BED4 file into a DepthArray for a region."""
+    """Read depth values from a BED4 file into a DepthArray for a region.
+
+    The file is parsed in chunks of BED_READ_CHUNK bytes.  Regular
+    tab-separated chunks are split into integer columns, filtered and
+    expanded with numpy; any other chunk (comments, blank lines, mixed
+    separators) goes through the per-line parser.  Where intervals overlap,
+    later lines take precedence either way.
+
+    A bgzipped BED with a tabix index (see :func:`bed_compress_index`) is
+    read through the index, fetching only intervals overlapping the region;
+    a ``.gz`` file without an index is decompressed and scanned.  A binary
+    ``.ssxd`` template is loaded memory-mapped (see :mod:`samsamplex.ssxd`).
+    """
+    if bed_path.endswith(SSXD_SUFFIX):
+        from .ssxd import ssxd_read_depths
+
+        return ssxd_read_depths(bed_path, contig, region_start, region_end)
+
     depths = np.zeros(region_end - region_start, dtype=np.int32)
+    for chunk in _region_chunks(bed_path, contig, region_start, region_end):
+        _fill_bed_chunk(depths, chunk, contig, region_start, region_end)
 
-    with open(bed_path) as fp:
-        for line in fp:
-            line = line.rstrip("\n")
-            if not line or line.startswith("#"):
-                continue
+    return DepthArray(contig=contig, start=region_start, end=region_end, depths=depths)
 
-            parts = line.split("\t")
-            if len(parts) < 4:
-                parts = line.split()
-            if len(parts) < 4:
-                continue
 
-            chrom = parts[0]
-            bed_start = int(parts[1])
-            bed_end = int(parts[2])
-            depth = int(parts[3])
+def bed_read_template(
+    bed_path: str,
+    contig: str,
+    region_start: int,
+    region_end: int,
+) -> DepthArray | RunLengthDepthArray:
+    """Read a template for a region, keeping it as runs where that is smaller.
+
+    Clipped intervals are collected while parsing; if the file holds at most
+    one interval per TEMPLATE_DENSE_RATIO positions and they are sorted and
+    disjoint, the result is a RunLengthDepthArray (gaps are depth 0) and no
+    per-position array is allocated.  Otherwise the intervals are expanded
+    into a DepthArray equal to :func:`bed_read_depths`.  A ``.ssxd``
+    template returns runs for run-length blocks and depths for raw ones.
+    """
+    if bed_path.endswith(SSXD_SUFFIX):
+        from .ssxd import ssxd_read_template
+
+        return ssxd_read_template(bed_path, contig, region_start, region_end)
+
+    length = region_end - region_start
+    limit = length // TEMPLATE_DENSE_RATIO
+    parts: list[tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+    n_intervals = 0
+    depths = None
+
+    for chunk in _region_chunks(bed_path, contig, region_start, region_end):
+        clipped = _clip_bed_chunk(chunk, contig, region_start, region_end)
+        if clipped is None:
+            continue
+        if depths is not None:
+            _fill_clipped(depths, *clipped)
+            continue
+        parts.append(clipped)
+        n_intervals += len(clipped[2])
+        if n_intervals > limit:
+            # Too fragmented for runs to pay off: switch to per-position fill
+            depths = np.zeros(length, dtype=np.int32)
+            for part in parts:
+                _fill_clipped(depths, *part)
+            parts = []
+
+    if depths is None:
+        if parts:
+            starts, ends, values = (np.concatenate(cols) for cols in zip(*parts))
+        else:
+            starts = ends = values = np.zeros(0, dtype=np.int64)
+        if not (starts[1:] < ends[:-1]).any():
+            return RunLengthDepthArray.from_intervals(
+                contig, region_start, region_end, starts, ends, values,
+            )
+        depths = np.zeros(length, dtype=np.int32)
+        _fill_clipped(depths, starts, ends, values)
+
+    return DepthArray(contig=contig, start=region_start, end=region_end, depths=depths)
 
-            if not contig_names_match(chrom, contig):
-                continue
 
-            ov_start = max(bed_start, region_start)
-            ov_end = min(bed_end, region_end)
-            if ov_start >= ov_end:
+def _region_chunks(
+    bed_path: str, contig: str, region_start: int, region_end: int,
+) -> Iterator[bytes]:
+    """Raw BED chunks covering the region: via tabix if indexed, else the whole file."""
+    if bed_has_index(bed_path):
+        yield from _tabix_chunks(bed_path, contig, region_start, region_end)
+        return
+    opener = gzip.open if bed_path.endswith(".gz") else open
+    with opener(bed_path, "rb") as fp:
+        yield from _bed_chunks(fp)
+
+
+def _bed_chunk_columns(chunk: bytes) -> tuple[list[bytes], np.ndarray, np.ndarray, np.ndarray] | None:
+    """Columns of any block of BED lines: vectorised when regular, else per line."""
+    cols = _split_bed_chunk(chunk)
+    if cols is not None:
+        return cols
+    parsed = [p for p in map(_parse_bed_line, chunk.decode().split("\n")) if p is not None]
+    if not parsed:
+        return None
+    chrom, start, end, depth = zip(*parsed)
+    return (
+        [c.encode() for c in chrom],
+        np.array(start, dtype=np.int64),
+        np.array(end, dtype=np.int64),
+        np.array(depth, dtype=np.int64),
+    )
+
+
+def _clip_bed_chunk(
+    chunk: bytes, contig: str, region_start: int, region_end: int,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray] | None:
+    cols = _bed_chunk_columns(chunk)
+    if cols is None:
+        return None
+    return _clip_bed_intervals(*cols, contig, region_start, region_end)
+
+
+def bed_read_contigs(bed_path: str) -> Iterator[DepthArray]:
+    """Yield the depth array of every contig in a BED file, one at a time.
+
+    The file is read once, keeping its intervals per contig (in order of
+    first appearance); each contig is then expanded over its extent in
+    turn, so only one dense array exists at a time.  Later lines take
+    precedence where intervals overlap, as in :func:`bed_read_depths`.
+    """
+    intervals: dict[bytes, list[tuple[np.ndarray, np.ndarray, np.ndarray]]] = {}
+    opener = gzip.open if bed_path.endswith(".gz") else open
+    with opener(bed_path, "rb") as fp:
+        for chunk in _bed_chunks(fp):
+            cols = _bed_chunk_columns(chunk)
+            if cols is None:
+                continue
+            chroms, starts, ends, values = cols
+            keep = starts < ends
+            if len(chroms) == 1:
+                intervals.setdefault(chroms[0], []).append((starts[keep], ends[keep], values[keep]))
+                continue
+            names = np.array(chroms, dtype=object)
+            for name in dict.fromkeys(chroms):
+                sel = (names == name) & keep
+                intervals.setdefault(name, []).append((starts[sel], ends[sel], values[sel]))
+
+    for name in list(intervals):
+        parts = intervals.pop(name)
+        starts, ends, values = (np.concatenate(col) for col in zip(*parts))
+        if not len(starts):
+            continue
+        lo, hi = int(starts.min()), int(ends.max())
+        depths = np.zeros(hi - lo, dtype=np.int32)
+        _fill_clipped(depths, starts - lo, ends - lo, values)
+        yield DepthArray(contig=name.decode(), start=lo, end=hi, depths=depths)
+
+
+def bed_contig_extents(bed_path: str) -> dict[str, tuple[int, int]]:
+    """Smallest start and largest end per contig, in order of first appearance."""
+    extents: dict[str, tuple[int, int]] = {}
+
+    def update(name: str, start: int, end: int) -> None:
+        lo, hi = extents.get(name, (start, end))
+        extents[name] = (min(lo, start), max(hi, end))
+
+    opener = gzip.open if bed_path.endswith(".gz") else open
+    with opener(bed_path, "rb") as fp:
+        for chunk in _bed_chunks(fp):
+            cols = _split_bed_chunk(chunk)
+            if cols is None:
+                for line in chunk.decode().split("\n"):
+                    parsed = _parse_bed_line(line)
+                    if parsed is not None:
+                        update(*parsed[:3])
                 continue
+            chroms, starts, ends, _ = cols
+            if len(chroms) == 1:
+                update(chroms[0].decode(), int(starts.min()), int(ends.max()))
+                continue
+            names = np.array(chroms, dtype=object)
+            for name in dict.fromkeys(chroms):
+                sel = names == name
+                update(name.decode(), int(starts[sel].min()), int(ends[sel].max()))
+    return extents
 
-            depths[ov_start - region_start : ov_end - region_start] = depth
 
-    return DepthArray(contig=contig, start=region_start, end=region_end, depths=depths)
+def template_extents(path: str) -> dict[str, tuple[int, int]]:
+    """Covered range per contig of a BED or ``.ssxd`` template."""
+    if path.endswith(SSXD_SUFFIX):
+        from .ssxd import ssxd_read_header
+
+        return {c.name: (c.start, c.end) for c in ssxd_read_header(path).contigs}
+    return bed_contig_extents(path)
+
+
+def template_read_contigs(path: str) -> Iterator[DepthArray]:
+    """Depth array of every contig of a BED or ``.ssxd`` template, one at a time,
+    from a single read (see :func:`bed_read_contigs`)."""
+    if path.endswith(SSXD_SUFFIX):
+        from .ssxd import ssxd_read_depths, ssxd_read_header
+
+        for c in ssxd_read_header(path).contigs:
+            yield ssxd_read_depths(path, c.name, c.start, c.end)
+        return
+    yield from bed_read_contigs(path)
+
+
+def _fill_bed_chunk(
+    depths: np.ndarray, chunk: bytes, contig: str, region_start: int, region_end: int,
+) -> None:
+    cols = _split_bed_chunk(chunk)
+    if cols is None:
+        _fill_bed_lines(depths, chunk.decode(), contig, region_start, region_end)
+    else:
+        _fill_bed_intervals(depths, *cols, contig, region_start, region_end)
 
 
 # ── Combining multiple templates ─────────────────────────────────────────────
 
+# Random-number schemes for the "random" combine mode.  "legacy" reproduces
+# the original per-position random.Random draws; "v2" draws in bulk with a
+# numpy Generator.  A new scheme gets a new name so old seeds stay valid.
+VALID_RANDOM_SCHEMES = ("legacy", "v2")
 
-def bed_combine_depths(
-    arrays: list[DepthArray],
+
+def random_between(lo: np.ndarray, hi: np.ndarray, seed: int, scheme: str) -> np.ndarray:
+    """Per-position random integer in [lo, hi] under a versioned scheme.
+
+    ``"legacy"`` draws ``random.Random(seed).randint`` at each position where
+    lo != hi, in position order (the original output for every seed).
+    ``"v2"`` draws all positions at once from ``np.random.default_rng(seed)``.
+    """
+    if scheme == "v2":
+        rng = np.random.default_rng(seed)
+        return rng.integers(lo, hi, endpoint=True, dtype=np.int64).astype(np.int32)
+
+    rng = random.Random(seed)
+    combined = lo.astype(np.int32)
+    spread = np.flatnonzero(lo != hi)
+    combined[spread] = [
+        rng.randint(mn, mx) for mn, mx in zip(lo[spread].tolist(), hi[spread].tolist())
+    ]
+    return combined
+
+
+def _combine_runs(
+    ref: RunLengthDepthArray, rest: Iterator[DepthArray | RunLengthDepthArray], mode: str,
+) -> RunLengthDepthArray:
+    """Fold templates as runs: each step works on the union of run breaks.
+
+    The first per-position input switches the fold to a per-position
+    accumulator, which is then cheaper than re-encoding every input.
+    """
+    breaks = ref.breaks
+    acc = ref.values.astype(np.int64) if mode == "mean" else ref.values
+    op = {"min": np.minimum, "max": np.maximum, "mean": np.add}[mode]
+    count = 1
+    dense = None
+
+    for arr in rest:
+        if dense is None and not isinstance(arr, RunLengthDepthArray):
+            dense = np.repeat(acc, np.diff(np.append(breaks, ref.end)))
+        if dense is not None:
+            op(dense, depth_dense(arr).depths, out=dense)
+            count += 1
+            continue
+        merged = np.union1d(breaks, arr.breaks)
+        a = acc[np.searchsorted(breaks, merged, side="right") - 1]
+        b = arr.values[np.searchsorted(arr.breaks, merged, side="right") - 1]
+        acc = op(a, b)
+        breaks = merged
+        if mode != "mean":
+            # Merge equal neighbours so the run count tracks the result
+            keep = np.concatenate(([True], acc[1:] != acc[:-1]))
+            breaks, acc = breaks[keep], acc[keep]
+        count += 1
+
+    if dense is not None:
+        if mode == "mean":
+            dense = (dense // count).astype(np.int32)
+        return DepthArray(contig=ref.contig, start=ref.start, end=ref.end, depths=dense)
+    if mode == "mean":
+        acc = (acc // count).astype(np.int32)
+    return RunLengthDepthArray(ref.contig, ref.start, ref.end, breaks, acc).compact()
+
+
+def bed_combine_stream(
+    arrays: Iterable[DepthArray | RunLengthDepthArray],
     mode: str = "min",
     seed: int = 42,
-) -> DepthArray:
-    """Combine multiple DepthArrays position-by-position.
+    scheme: str = "legacy",
+) -> DepthArray | RunLengthDepthArray:
+    """Combine DepthArrays position-by-position, folding in one at a time.
+
+    Only the running accumulators are kept (the running min and/or max, or
+    an int64 sum for ``"mean"``), so with a lazy iterable peak memory is
+    O(length) however many templates are combined.  Results are identical
+    to reducing over all arrays stacked together.
+
+    When the first array is a RunLengthDepthArray and *mode* is not
+    ``"random"``, the fold runs on run breaks instead and returns runs, so
+    time and memory scale with the number of intervals rather than the
+    region length.  ``"random"`` always expands to per-position depths, as
+    its draws are defined per position.
 
     Supported *mode* values: ``"min"``, ``"max"``, ``"mean"``, ``"random"``.
+    *scheme* selects the random-number scheme for ``"random"`` (see
+    VALID_RANDOM_SCHEMES); ``"legacy"`` keeps existing outputs per seed.
     """
-    if len(arrays) == 1:
-        return DepthArray(
-            contig=arrays[0].contig,
-            start=arrays[0].start,
-            end=arrays[0].end,
-            depths=arrays[0].depths.copy(),
-        )
-
-    stacked = np.stack([a.depths for a in arrays], axis=0)  # (n_arrays, length)
+    if mode not in ("min", "max", "mean", "random"):
+        raise ValueError(f"Unknown combine mode: {mode}")
+    if scheme not in VALID_RANDOM_SCHEMES:
+        raise ValueError(f"Unknown random scheme: {scheme}")
+
+    it = iter(arrays)
+    ref = next(it, None)
+    if ref is None:
+        raise ValueError("No depth arrays to combine")
+    if isinstance(ref, RunLengthDepthArray):
+        if mode != "random":
+            return _combine_runs(ref, it, mode)
+        ref = ref.to_dense()
+
+    lo = np.array(ref.depths) if mode in ("min", "random") else None
+    hi = np.array(ref.depths) if mode in ("max", "random") else None
+    total = ref.depths.astype(np.int64) if mode == "mean" else None
+    count = 1
+
+    for arr in it:
+        depths = depth_dense(arr).depths
+        if lo is not None:
+            np.minimum(lo, depths, out=lo)
+        if hi is not None:
+            np.maximum(hi, depths, out=hi)
+        if total is not None:
+            total += depths
+        count += 1
 
     if mode == "min":
-        combined = stacked.min(axis=0)
+        combined = lo
     elif mode == "max":
-        combined = stacked.max(axis=0)
+        combined = hi
     elif mode == "mean":
-        combined = (stacked.sum(axis=0) // len(arrays)).astype(np.int32)
-    elif mode == "random":
-        rng = random.Random(seed)
-        mins = stacked.min(axis=0)
-        maxs = stacked.max(axis=0)
-        combined = np.array(
-            [
-                v if mn == mx else rng.randint(mn, mx)
-                for mn, mx, v in zip(mins, maxs, mins)
-            ],
-            dtype=np.int32,
-        )
+        combined = (total // count).astype(np.int32)
     else:
-        raise ValueError(f"Unknown combine mode: {mode}")
+        combined = random_between(lo, hi, seed, scheme)
 
-    ref = arrays[0]
     return DepthArray(contig=ref.contig, start=ref.start, end=ref.end, depths=combined)
+
+
+def bed_combine_depths(
+    arrays: list[DepthArray],
+    mode: str = "min",
+    seed: int = 42,
+    scheme: str = "legacy",
+) -> DepthArray:
+    """Combine multiple DepthArrays position-by-position.
+
+    Supported *mode* values: ``"min"``, ``"max"``, ``"mean"``, ``"random"``.
+    See :func:`bed_combine_stream`, which this wraps.
+    """
+    return bed_combine_stream(arrays, mode=mode, seed=seed, scheme=scheme)
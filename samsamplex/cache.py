@@ -0,0 +1,133 @@
+"""Persistent on-disk cache of depth arrays keyed by BAM identity and region."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+CACHE_DIR_ENV = "SAMSAMPLEX_CACHE_DIR"
+CACHE_MAX_BYTES_ENV = "SAMSAMPLEX_CACHE_MAX_BYTES"
+DEFAULT_MAX_BYTES = 8 * 1024**3
+
+# Bump when the meaning of a cached array changes so stale entries miss.
+CACHE_FORMAT_VERSION = 1
+
+
+def _index_mtime(bam_path: str) -> int | None:
+    """mtime (ns) of the first index file found next to *bam_path*, or None."""
+    stem = bam_path[:-4] if bam_path.endswith(".bam") else bam_path
+    for candidate in (bam_path + ".bai", stem + ".bai", bam_path + ".csi"):
+        try:
+            return os.stat(candidate).st_mtime_ns
+        except OSError:
+            continue
+    return None
+
+
+class DepthCache:
+    """Directory of ``.npy`` depth arrays with least-recently-used eviction.
+
+    Entries are keyed by the BAM's absolute path, size and mtime, its index
+    mtime, the region and the read-filter settings, so a rewritten BAM or
+    index never returns a stale array.  Hits are returned memory-mapped
+    read-only; the total size of the directory is kept under *max_bytes* by
+    removing the least recently used entries after each write.
+    """
+
+    def __init__(self, root: str, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def key(self, bam_path: str, contig: str, start: int, end: int, **flags: object) -> str:
+        """Hex digest identifying one depth array."""
+        st = os.stat(bam_path)
+        ident = {
+            "version": CACHE_FORMAT_VERSION,
+            "path": os.path.abspath(bam_path),
+            "size": st.st_size,
+            "mtime": st.st_mtime_ns,
+            "index_mtime": _index_mtime(bam_path),
+            "region": [contig, start, end],
+            "flags": flags,
+        }
+        blob = json.dumps(ident, sort_keys=True).encode()
+        return hashlib.sha256(blob).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.npy"
+
+    def get(self, key: str) -> np.ndarray | None:
+        """Return the cached array memory-mapped read-only, or None on a miss."""
+        path = self._path(key)
+        try:
+            arr = np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        return arr
+
+    def put(self, key: str, depths: np.ndarray) -> None:
+        """Store *depths* atomically, then evict down to the size limit."""
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                np.save(fp, np.ascontiguousarray(depths))
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove least recently used entries until the cache fits *max_bytes*."""
+        entries = []
+        for path in self.root.glob("*.npy"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+
+
+def open_depth_cache(cache_dir: str | None = None) -> DepthCache | None:
+    """Open the depth cache from *cache_dir* or ``$SAMSAMPLEX_CACHE_DIR``.
+
+    Returns None when neither is set.  The size limit is read from
+    ``$SAMSAMPLEX_CACHE_MAX_BYTES`` (default 8 GiB).
+    """
+    root = cache_dir or os.environ.get(CACHE_DIR_ENV)
+    if not root:
+        return None
+
+    max_bytes = DEFAULT_MAX_BYTES
+    env_max = os.environ.get(CACHE_MAX_BYTES_ENV)
+    if env_max:
+        try:
+            max_bytes = int(env_max)
+        except ValueError:
+            print(
+                f"Warning: Ignoring invalid {CACHE_MAX_BYTES_ENV}={env_max!r}", file=sys.stderr,
+            )
+
+    return DepthCache(root, max_bytes=max_bytes)
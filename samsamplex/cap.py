@@ -0,0 +1,234 @@
+"""Single-pass depth capping: keep reads while kept coverage stays within D.
+
+Reads arrive coordinate-sorted, so every read kept so far starts at or
+before the current read, and the coverage of kept reads over the current
+read's span peaks at its start.  That coverage is the number of kept reads
+whose end lies beyond the start, tracked by :class:`CoverageRing`.  Reads
+sharing a start position are decided together: with room for ``k`` more,
+the ``k`` with the smallest read-name hash are kept.  No index, depth
+array or second pass is needed, so the source may be an unindexed BAM/SAM
+or stdin.
+"""
+
+from __future__ import annotations
+
+import sys
+from typing import Iterator, Sequence
+
+import pysam
+
+from .bamio import bam_finalize, header_mark_sorted
+from .depth import READ_FILTER_FLAGS, region_parse, resolve_contig_name
+from .readhash import xxh32_fraction
+from .sample import replicate_out_path
+
+# Initial ring size in positions; doubles whenever a longer read is kept.
+RING_SIZE = 1 << 16
+
+
+class CoverageRing:
+    """Coverage of kept reads at a moving position.
+
+    A ring-buffer difference array of kept read ends: keeping a read adds
+    one at ``end % size`` and advancing subtracts every end passed.  Only
+    ends within ``size`` positions ahead are pending, so the ring stays
+    the size of the longest kept read rather than of the contig.
+    """
+
+    def __init__(self, size: int = RING_SIZE) -> None:
+        self.size = size
+        self.ends = [0] * size
+        self.pos = 0
+        self.active = 0
+
+    def reset(self, pos: int = 0) -> None:
+        """Drop all kept reads and move to *pos* (e.g. on a new contig)."""
+        if self.active:
+            self.ends = [0] * self.size
+            self.active = 0
+        self.pos = pos
+
+    def advance(self, pos: int) -> int:
+        """Move forward to *pos*; return the coverage there."""
+        n = pos - self.pos
+        if n <= 0:
+            return self.active
+        if not self.active or n >= self.size:
+            self.reset(pos)
+            return 0
+        ends, size = self.ends, self.size
+        a = (self.pos + 1) % size
+        passed = [(a, min(a + n, size)), (0, max(0, a + n - size))]
+        for lo, hi in passed:
+            if lo < hi:
+                self.active -= sum(ends[lo:hi])
+                ends[lo:hi] = [0] * (hi - lo)
+        self.pos = pos
+        return self.active
+
+    def add(self, end: int) -> None:
+        """Keep a read covering ``[pos, end)``."""
+        span = end - self.pos
+        if span <= 0:
+            return
+        if span >= self.size:
+            self._grow(span)
+        self.ends[end % self.size] += 1
+        self.active += 1
+
+    def _grow(self, span: int) -> None:
+        size = self.size
+        while size <= span:
+            size *= 2
+        ends = [0] * size
+        for p in range(self.pos + 1, self.pos + self.size):
+            ends[p % size] = self.ends[p % self.size]
+        self.ends, self.size = ends, size
+
+
+def _start_groups(
+    reads: Iterator[pysam.AlignedSegment],
+) -> Iterator[tuple[int, int, list[pysam.AlignedSegment]]]:
+    """Group a coordinate-sorted stream into ``(tid, start, reads)``."""
+    key = None
+    group: list[pysam.AlignedSegment] = []
+    for read in reads:
+        k = (read.reference_id, read.reference_start)
+        if k != key:
+            if key is not None and k < key:
+                raise ValueError(
+                    f"Input is not coordinate-sorted: {read.query_name} at "
+                    f"{read.reference_name}:{read.reference_start + 1}"
+                )
+            if group:
+                yield (*key, group)
+            key, group = k, []
+        group.append(read)
+    if group:
+        yield (*key, group)
+
+
+def cap_keep(
+    group: list[pysam.AlignedSegment], room: int, seed: int,
+) -> list[pysam.AlignedSegment]:
+    """The reads of one start position to keep given *room* for more.
+
+    All fit when there is room; otherwise those with the smallest
+    read-name hash, returned in input order.
+    """
+    if room <= 0:
+        return []
+    if len(group) <= room:
+        return group
+    order = sorted(range(len(group)), key=lambda i: xxh32_fraction(group[i].query_name, seed))
+    return [group[i] for i in sorted(order[:room])]
+
+
+def cap_stream(
+    reads: Iterator[pysam.AlignedSegment],
+    max_depth: int,
+    outs: Sequence[pysam.AlignmentFile],
+    seeds: Sequence[int],
+) -> tuple[int, list[int]]:
+    """Write the reads of a coordinate-sorted stream that fit under *max_depth*.
+
+    One output per seed, each with its own kept coverage.  Unmapped reads
+    and reads matching READ_FILTER_FLAGS are dropped; spans are full
+    reference extents (CIGAR deletions and skips count as covered).
+    Returns the number of reads considered and the number kept per seed.
+    """
+    rings = [CoverageRing() for _ in seeds]
+    tid = None
+    total = 0
+    kept = [0] * len(seeds)
+
+    usable = (
+        r for r in reads
+        if not r.is_unmapped and not r.flag & READ_FILTER_FLAGS and r.reference_end is not None
+    )
+    for group_tid, start, group in _start_groups(usable):
+        if group_tid != tid:
+            tid = group_tid
+            for ring in rings:
+                ring.reset(start)
+        total += len(group)
+        for i, (ring, out, seed) in enumerate(zip(rings, outs, seeds)):
+            for read in cap_keep(group, max_depth - ring.advance(start), seed):
+                ring.add(read.reference_end)
+                out.write(read)
+                kept[i] += 1
+    return total, kept
+
+
+# ── Main capping routine ─────────────────────────────────────────────────────
+
+
+def cap_run(
+    source_bam: str,
+    region_str: str | None,
+    max_depth: int,
+    out_bam: str = "out.bam",
+    seed: int = 42,
+    seeds: Sequence[int] | None = None,
+    no_sort: bool = False,
+) -> int:
+    """Run ``sample --max-depth``. Returns 0 on success.
+
+    *source_bam* may be ``"-"`` for stdin.  Without *region_str* the whole
+    stream is capped; with it, only reads overlapping the region are
+    considered, fetched through the index when the source has one and
+    filtered from the stream otherwise.  Output is written in input order
+    and so is already coordinate-sorted.
+    """
+    log = lambda msg: print(msg, file=sys.stderr)
+
+    if not seeds:
+        seeds = [seed]
+    out_paths = [replicate_out_path(out_bam, s, len(seeds)) for s in seeds]
+
+    log(f"[sample] Source BAM: {'stdin' if source_bam == '-' else source_bam}")
+    log(f"[sample] Max depth: {max_depth}")
+    log(f"[sample] Region: {region_str or 'all'}")
+    for s, p in zip(seeds, out_paths):
+        log(f"[sample] Seed {s}: {p}")
+
+    with pysam.AlignmentFile(source_bam, "r") as src:
+        if region_str is None:
+            reads = src.fetch(until_eof=True)
+        else:
+            region = region_parse(region_str)
+            contig = resolve_contig_name(src.header, region.contig)
+            if contig is None:
+                log(f"Error: Contig '{region.contig}' not found in BAM")
+                return 1
+            start = max(region.start, 0)
+            end = region.end if region.end >= 0 else src.get_reference_length(contig)
+            log(f"[sample] Parsed region: {contig}:{start}-{end}")
+            if src.is_bam and src.has_index():
+                reads = src.fetch(contig, start, end)
+            else:
+                tid = src.get_tid(contig)
+                reads = (
+                    r for r in src.fetch(until_eof=True)
+                    if r.reference_id == tid and r.reference_start < end
+                    and (r.reference_end or r.reference_start + 1) > start
+                )
+
+        header = header_mark_sorted(src.header)
+        outs = [pysam.AlignmentFile(p, "wb", header=header) for p in out_paths]
+        try:
+            total, kept = cap_stream(reads, max_depth, outs, seeds)
+        except ValueError as exc:
+            log(f"Error: {exc}")
+            return 1
+        finally:
+            for out in outs:
+                out.close()
+
+    for s, n in zip(seeds, kept):
+        log(f"[sample] Seed {s}: kept {n} of {total} reads")
+
+    if not no_sort:
+        for p in out_paths:
+            bam_finalize(p, presorted=True, log=log, tag="sample")
+    return 0
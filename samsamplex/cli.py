@@ -4,18 +4,99 @@ from __future__ import annotations
 
 import argparse
 import sys
+from typing import TYPE_CHECKING, Callable, Iterator
 
 from . import __version__
 
+if TYPE_CHECKING:
+    from .depth import DepthArray
+
+
+def _add_depth_arguments(
+    p: argparse.ArgumentParser,
+    threads_help: str = "Worker processes for tiled depth computation",
+) -> None:
+    p.add_argument(
+        "--depth-engine",
+        default="events",
+        choices=("events", "loop"),
+        help="Depth computation engine: batched start/end events or per-read slice loop "
+        "[default: events]",
+    )
+    p.add_argument(
+        "--cigar-aware",
+        action="store_true",
+        help="Count only aligned CIGAR blocks as covered (skip deletions and N ref-skips)",
+    )
+    p.add_argument(
+        "--threads",
+        type=int,
+        default=1,
+        help=f"{threads_help} [default: 1]",
+    )
+    p.add_argument(
+        "--cache-dir",
+        default=None,
+        help="Directory for cached depth arrays [default: $SAMSAMPLEX_CACHE_DIR, else no cache]",
+    )
+
 
 def _add_map_parser(subparsers: argparse._SubParsersAction) -> None:
     p = subparsers.add_parser(
         "map",
         help="Extract depth of coverage from BAM to BED template",
     )
-    p.add_argument("--template-bam", required=True, help="Input BAM file")
+    p.add_argument(
+        "--template-bam",
+        nargs="+",
+        required=True,
+        help="Input BAM file(s); several are mapped in a process pool of --threads workers",
+    )
     p.add_argument("--region", required=True, help="Target region (samtools-style)")
-    p.add_argument("--out-bed", default="out.bed", help="Output BED file [default: out.bed]")
+    p.add_argument(
+        "--out-bed",
+        default=None,
+        help="Output BED file; a .gz name writes bgzipped BED with a tabix index. "
+        "'{sample}' is replaced by the BAM's name (required with several BAMs) "
+        "[default: out.bed, unless --out-template is given]",
+    )
+    p.add_argument(
+        "--out-template",
+        default=None,
+        metavar="FILE.ssxd",
+        help="Also (or only) write a binary .ssxd depth template ('{sample}' as for --out-bed)",
+    )
+    p.add_argument(
+        "--collapse",
+        type=int,
+        default=0,
+        help="Merge consecutive positions with depth diff <= INT [default: 0]",
+    )
+    p.add_argument(
+        "--combine-mode",
+        default=None,
+        choices=("min", "max", "mean", "random"),
+        help="Write only the combined template of all BAMs, using this mode",
+    )
+    p.add_argument(
+        "--random-scheme",
+        default="legacy",
+        choices=("legacy", "v2"),
+        help="Random-number scheme for --combine-mode random [default: legacy]",
+    )
+    p.add_argument(
+        "--seed", type=int, default=42, help="Random seed for --combine-mode random [default: 42]",
+    )
+    _add_depth_arguments(p)
+
+
+def _add_convert_parser(subparsers: argparse._SubParsersAction) -> None:
+    p = subparsers.add_parser(
+        "convert",
+        help="Convert depth templates between BED and binary .ssxd",
+    )
+    p.add_argument("--input", required=True, help="Input template (.bed, .bed.gz or .ssxd)")
+    p.add_argument("--output", required=True, help="Output template (.bed, .bed.gz or .ssxd)")
     p.add_argument(
         "--collapse",
         type=int,
@@ -24,18 +105,139 @@ def _add_map_parser(subparsers: argparse._SubParsersAction) -> None:
     )
 
 
+def _add_combine_parser(subparsers: argparse._SubParsersAction) -> None:
+    p = subparsers.add_parser(
+        "combine",
+        help="Combine template BEDs once into a template with provenance metadata",
+    )
+    p.add_argument(
+        "--template-bed",
+        nargs="+",
+        required=True,
+        help="Template files to combine (.bed, .bed.gz or .ssxd)",
+    )
+    p.add_argument(
+        "--region", required=True, help="Region to combine, with start-end (e.g. chr1:1-60000)",
+    )
+    p.add_argument(
+        "--output", required=True, help="Combined template (.bed, .bed.gz or .ssxd)",
+    )
+    p.add_argument(
+        "--mode",
+        default="random",
+        choices=("min", "max", "mean", "random"),
+        help="How to combine the templates [default: random]",
+    )
+    p.add_argument(
+        "--random-scheme",
+        default="legacy",
+        choices=("legacy", "v2"),
+        help="Random-number scheme for --mode random [default: legacy]",
+    )
+    p.add_argument("--seed", type=int, default=42, help="Random seed [default: 42]")
+
+
+def _add_library_parser(subparsers: argparse._SubParsersAction) -> None:
+    p = subparsers.add_parser(
+        "library",
+        help="Build a template library (chunked templates x positions matrix) from templates",
+    )
+    p.add_argument(
+        "--template-bed",
+        nargs="+",
+        required=True,
+        help="Template files (.bed, .bed.gz or .ssxd), one library row each",
+    )
+    p.add_argument(
+        "--ids",
+        nargs="+",
+        default=None,
+        help="Sample ID per template [default: file name without suffix]",
+    )
+    p.add_argument("--out-dir", required=True, help="Library directory to create")
+    p.add_argument(
+        "--chunk-size",
+        type=int,
+        default=1 << 20,
+        help="Positions per chunk file [default: 1048576]",
+    )
+
+
+def _combine_mode(value: str) -> str:
+    from .library import COMBINE_MODES, combine_percentile
+
+    if value in COMBINE_MODES or combine_percentile(value) is not None:
+        return value
+    raise argparse.ArgumentTypeError(
+        f"invalid mode '{value}' (choose from {', '.join(COMBINE_MODES)} or p0-p100)"
+    )
+
+
 def _add_sample_parser(subparsers: argparse._SubParsersAction) -> None:
     p = subparsers.add_parser(
         "sample",
         help="Sample reads from BAM to match template depth distribution",
     )
-    p.add_argument("--source-bam", required=True, help="Input BAM file to sample from")
+    p.add_argument(
+        "--source-bam",
+        required=True,
+        help="Input BAM file to sample from ('-' for stdin with --max-depth)",
+    )
     p.add_argument(
         "--template-bed",
         nargs="*",
         default=[],
         help="Template BED file(s) with depth values (required unless --uniform)",
     )
+    p.add_argument(
+        "--template-bam",
+        nargs="+",
+        default=[],
+        help="Template BAM file(s); depth is computed in memory (via the depth cache) "
+        "instead of reading BED templates",
+    )
+    p.add_argument(
+        "--target-depth",
+        type=int,
+        default=None,
+        metavar="D",
+        help="Sample to a constant depth D everywhere, with no template file",
+    )
+    p.add_argument(
+        "--max-depth",
+        type=int,
+        default=None,
+        metavar="D",
+        help="Cap coverage at D in one pass over a coordinate-sorted source "
+        "(may be unindexed, or '-' for stdin); no template or depth computation",
+    )
+    p.add_argument(
+        "--template-scale",
+        type=float,
+        default=1.0,
+        metavar="F",
+        help="Multiply the template depth by F [default: 1.0]",
+    )
+    p.add_argument(
+        "--template-library",
+        default=None,
+        metavar="DIR",
+        help="Template library built with 'library' (instead of --template-bed)",
+    )
+    p.add_argument(
+        "--select",
+        nargs="+",
+        default=None,
+        metavar="ID",
+        help="Sample IDs to combine from --template-library [default: all]",
+    )
+    p.add_argument(
+        "--precombined",
+        default=None,
+        metavar="FILE",
+        help="Template written by 'combine'; used instead of combining --template-bed "
+        "when its provenance matches the inputs, mode, seed and region",
+    )
     p.add_argument(
         "--uniform",
         type=float,
@@ -43,13 +245,25 @@ def _add_sample_parser(subparsers: argparse._SubParsersAction) -> None:
         metavar="FRACTION",
         help="Uniform sampling: retain fraction of reads by hash (0-1). Bypasses template/depth logic.",
     )
-    p.add_argument("--region", required=True, help="Target region (samtools-style)")
+    p.add_argument(
+        "--region",
+        default=None,
+        help="Target region (samtools-style); optional with --max-depth",
+    )
     p.add_argument("--out-bam", default="out.bam", help="Output BAM file [default: out.bam]")
     p.add_argument(
         "--mode",
         default="random",
-        choices=("min", "max", "mean", "random"),
-        help="How to combine multiple templates [default: random]",
+        type=_combine_mode,
+        help="How to combine multiple templates: min, max, mean, random, or a "
+        "percentile pQ (e.g. p90; --template-library only) [default: random]",
+    )
+    p.add_argument(
+        "--random-scheme",
+        default="legacy",
+        choices=("legacy", "v2"),
+        help="Random-number scheme for --mode random: legacy (per-position "
+        "random.Random, original outputs) or v2 (bulk numpy Generator) [default: legacy]",
     )
     p.add_argument(
         "--stat",
@@ -57,9 +271,38 @@ def _add_sample_parser(subparsers: argparse._SubParsersAction) -> None:
         choices=("mean", "min", "max", "median"),
         help="Statistic for summarising ratio over read span [default: mean]",
     )
+    p.add_argument(
+        "--index-max-mb",
+        type=int,
+        default=1024,
+        help="Memory cap for the --stat range index in MiB [default: 1024]",
+    )
+    p.add_argument(
+        "--compact-ratios",
+        action="store_true",
+        help="Store sampling ratios as uint16 fixed point to cut memory "
+        "(span ratios within 0.5/65535 of the float64 path)",
+    )
     p.add_argument("--seed", type=int, default=42, help="Random seed [default: 42]")
+    reps = p.add_mutually_exclusive_group()
+    reps.add_argument(
+        "--seeds",
+        default=None,
+        metavar="S1,S2,...",
+        help="Write one replicate per comma-separated seed in a single pass over the source",
+    )
+    reps.add_argument(
+        "--replicates",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Write N replicates with seeds SEED+1..SEED+N in a single pass over the source",
+    )
     p.add_argument("--no-sort", action="store_true", help="Skip sorting/indexing output BAM")
     p.add_argument("--no-metrics", action="store_true", help="Skip metrics calculation")
+    _add_depth_arguments(
+        p, threads_help="Worker processes for tiled depth computation and sharded keep/drop decisions",
+    )
 
 
 def _add_plot_parser(subparsers: argparse._SubParsersAction) -> None:
@@ -78,6 +321,7 @@ def _add_plot_parser(subparsers: argparse._SubParsersAction) -> None:
     out = p.add_mutually_exclusive_group(required=True)
     out.add_argument("--out-png", help="Output PNG plot file")
     out.add_argument("--out-tsv", help="Output TSV data file")
+    _add_depth_arguments(p)
 
 
 def _add_mapback_parser(subparsers: argparse._SubParsersAction) -> None:
@@ -111,27 +355,82 @@ def _add_stats_parser(subparsers: argparse._SubParsersAction) -> None:
     p.add_argument("--bam-a", required=True, help="First BAM file (reference)")
     p.add_argument("--bam-b", required=True, help="Second BAM file (comparison)")
     p.add_argument("--region", required=True, help="Region to compare (samtools-style)")
+    _add_depth_arguments(p)
 
 
 # ── Subcommand handlers ─────────────────────────────────────────────────────
 
 
+def _map_outputs(
+    args: argparse.Namespace, depth: DepthArray, name: str | None, log: Callable[[str], None],
+) -> list[str]:
+    """Write one depth array to the --out-bed / --out-template paths."""
+    from .bed import bed_output, write_bed_output
+    from .ssxd import ssxd_write
+
+    fill = (lambda path: path.replace("{sample}", name)) if name else (lambda path: path)
+    suffix = " (collapsed)" if args.collapse > 0 else ""
+    outputs = []
+    if args.out_bed:
+        out_bed = fill(args.out_bed)
+        log(f"[map] Writing BED file{suffix}: {out_bed}")
+        with bed_output(out_bed) as fp:
+            write_bed_output(fp, depth, collapse=args.collapse)
+        outputs.append(out_bed)
+    if args.out_template:
+        out_template = fill(args.out_template)
+        log(f"[map] Writing binary template{suffix}: {out_template}")
+        ssxd_write(out_template, [depth], collapse=args.collapse)
+        outputs.append(out_template)
+    return outputs
+
+
 def _run_map(args: argparse.Namespace) -> int:
-    from .bed import write_bed_output
-    from .depth import depth_from_bam, get_contig_length, region_parse
+    from pathlib import Path
+
+    from .bed import SSXD_SUFFIX, bed_combine_stream
+    from .cache import open_depth_cache
+    from .depth import depth_dense, depth_from_bams, region_parse
 
     log = lambda msg: print(msg, file=sys.stderr)
 
-    region = region_parse(args.region)
+    if args.out_template and not args.out_template.endswith(SSXD_SUFFIX):
+        log(f"Error: --out-template must end in {SSXD_SUFFIX}: {args.out_template}")
+        return 1
 
-    log(f"[map] Template BAM: {args.template_bam}")
+    region = region_parse(args.region)
+    if args.out_bed is None and args.out_template is None:
+        args.out_bed = "out.bed" if len(args.template_bam) == 1 or args.combine_mode else "{sample}.bed"
+
+    names = [Path(b).name.removesuffix(".bam") for b in args.template_bam]
+    per_sample = len(args.template_bam) > 1 and args.combine_mode is None
+    if per_sample:
+        if len(set(names)) != len(names):
+            log("Error: Template BAM file names must be unique to fill '{sample}'")
+            return 1
+        for opt, path in (("--out-bed", args.out_bed), ("--out-template", args.out_template)):
+            if path and "{sample}" not in path:
+                log(f"Error: {opt} needs a '{{sample}}' placeholder with several BAMs (or use --combine-mode)")
+                return 1
+
+    log(f"[map] Template BAMs: {len(args.template_bam)} file(s)")
+    for i, b in enumerate(args.template_bam):
+        log(f"[map]   {i + 1}: {b}")
     log(f"[map] Region: {args.region}")
     log(f"[map] Collapse: {args.collapse}")
-    log(f"[map] Output BED: {args.out_bed}")
+    log(f"[map] Depth engine: {args.depth_engine}")
+    log(f"[map] CIGAR-aware: {args.cigar_aware}")
+    log(f"[map] Threads: {args.threads}")
+    if args.combine_mode:
+        log(f"[map] Combine mode: {args.combine_mode}")
+    if args.out_bed:
+        log(f"[map] Output BED: {args.out_bed}")
+    if args.out_template:
+        log(f"[map] Output template: {args.out_template}")
 
     import pysam
 
-    with pysam.AlignmentFile(args.template_bam, "rb") as bam:
+    with pysam.AlignmentFile(args.template_bam[0], "rb") as bam:
         from .depth import resolve_contig_name
 
         resolved = resolve_contig_name(bam.header, region.contig)
@@ -147,18 +446,123 @@ def _run_map(args: argparse.Namespace) -> int:
         region.end = contig_len
 
     log(f"[map] Parsed region: {region.contig}:{region.start}-{region.end}")
-    log("[map] Computing depth array (this may take a while)...")
+    log("[map] Computing depth array(s) (this may take a while)...")
 
-    depth = depth_from_bam(args.template_bam, region.contig, region.start, region.end)
-    log(f"[map] Computed depth for {depth.length} positions")
+    depths = depth_from_bams(
+        args.template_bam, region.contig, region.start, region.end,
+        engine=args.depth_engine, cigar_aware=args.cigar_aware, threads=args.threads,
+        cache=open_depth_cache(args.cache_dir),
+    )
 
-    suffix = " (collapsed)" if args.collapse > 0 else ""
-    log(f"[map] Writing BED file{suffix}...")
+    outputs = []
+    try:
+        if args.combine_mode:
+            combined = bed_combine_stream(
+                depths, mode=args.combine_mode, seed=args.seed, scheme=args.random_scheme,
+            )
+            log(f"[map] Combined {len(args.template_bam)} depth arrays using '{args.combine_mode}' mode")
+            outputs += _map_outputs(args, depth_dense(combined), None, log)
+        else:
+            for name, depth in zip(names, depths):
+                log(f"[map] Computed depth for {depth.length} positions ({name})")
+                outputs += _map_outputs(args, depth, name, log)
+    except ValueError as e:
+        log(f"Error: {e}")
+        return 1
+
+    log(f"[map] Done. Output written to: {', '.join(outputs)}")
+    return 0
+
+
+def _run_convert(args: argparse.Namespace) -> int:
+    from .bed import SSXD_SUFFIX, bed_output, bed_read_contigs, write_bed_output
+    from .ssxd import ssxd_to_bed, ssxd_write
+
+    log = lambda msg: print(msg, file=sys.stderr)
+
+    to_ssxd = args.output.endswith(SSXD_SUFFIX)
+    from_ssxd = args.input.endswith(SSXD_SUFFIX)
+    log(f"[convert] Input: {args.input}")
+    log(f"[convert] Output: {args.output}")
+
+    if from_ssxd and to_ssxd:
+        log("Error: Input and output are both .ssxd")
+        return 1
+
+    if from_ssxd:
+        with bed_output(args.output) as fp:
+            ssxd_to_bed(args.input, fp, collapse=args.collapse)
+    else:
+        def logged(arrays: Iterator[DepthArray]) -> Iterator[DepthArray]:
+            for arr in arrays:
+                log(f"[convert] Contig {arr.contig}:{arr.start}-{arr.end}")
+                yield arr
+
+        # One read of the BED, then expanded and written one contig at a time
+        arrays = logged(bed_read_contigs(args.input))
+        if to_ssxd:
+            ssxd_write(args.output, arrays, collapse=args.collapse)
+        else:
+            with bed_output(args.output) as fp:
+                for arr in arrays:
+                    write_bed_output(fp, arr, collapse=args.collapse)
+
+    log(f"[convert] Done. Output written to: {args.output}")
+    return 0
+
+
+def _run_combine(args: argparse.Namespace) -> int:
+    from .combine import combine_write
+    from .depth import region_parse
+
+    log = lambda msg: print(msg, file=sys.stderr)
+
+    region = region_parse(args.region)
+    if region.start < 0 or region.end < 0:
+        # sample resolves a whole contig from the source BAM, which combine
+        # does not see, so the recorded region could never match it.
+        log(f"Error: --region needs explicit start-end bounds, got '{args.region}'")
+        return 1
+
+    log(f"[combine] Templates: {len(args.template_bed)} file(s)")
+    log(f"[combine] Mode: {args.mode}")
+    log(f"[combine] Region: {region.contig}:{region.start}-{region.end}")
+    log(f"[combine] Output: {args.output}")
+
+    try:
+        combine_write(
+            args.output, args.template_bed, region.contig, region.start, region.end,
+            mode=args.mode, seed=args.seed, scheme=args.random_scheme,
+        )
+    except ValueError as e:
+        log(f"Error: {e}")
+        return 1
+
+    log(f"[combine] Done. Output written to: {args.output}")
+    return 0
+
+
+def _run_library(args: argparse.Namespace) -> int:
+    from .library import library_build
+
+    log = lambda msg: print(msg, file=sys.stderr)
 
-    with open(args.out_bed, "w") as fp:
-        write_bed_output(fp, depth, collapse=args.collapse)
+    if args.chunk_size < 1:
+        log(f"Error: --chunk-size must be >= 1, got {args.chunk_size}")
+        return 1
+
+    log(f"[library] Templates: {len(args.template_bed)} file(s)")
+    log(f"[library] Output directory: {args.out_dir}")
+
+    try:
+        lib = library_build(
+            args.out_dir, args.template_bed, ids=args.ids, chunk=args.chunk_size, log=log,
+        )
+    except ValueError as e:
+        log(f"Error: {e}")
+        return 1
 
-    log(f"[map] Done. Output written to: {args.out_bed}")
+    log(f"[library] Done. {len(lib.samples)} templates over {len(lib.contigs)} contig(s)")
     return 0
 
 
@@ -167,8 +571,83 @@ def _run_sample(args: argparse.Namespace) -> int:
 
     log = lambda msg: print(msg, file=sys.stderr)
 
-    if args.uniform is None and not args.template_bed:
-        log("Error: Either --template-bed or --uniform is required")
+    sources = [
+        opt for opt, given in (
+            ("--template-bed", args.template_bed),
+            ("--template-bam", args.template_bam),
+            ("--template-library", args.template_library is not None),
+            ("--target-depth", args.target_depth is not None),
+            ("--max-depth", args.max_depth is not None),
+        ) if given
+    ]
+    if args.uniform is None and not sources:
+        log(
+            "Error: Either --template-bed, --template-bam, --template-library, "
+            "--target-depth, --max-depth or --uniform is required"
+        )
+        return 1
+
+    if args.max_depth is not None and args.uniform is not None:
+        sources.append("--uniform")
+    if len(sources) > 1:
+        log(f"Error: {' and '.join(sources)} are mutually exclusive")
+        return 1
+
+    if args.max_depth is not None and args.max_depth < 1:
+        log(f"Error: --max-depth must be >= 1, got {args.max_depth}")
+        return 1
+
+    if args.max_depth is not None:
+        # Options of the template path that the streaming cap has no use for
+        unused = [
+            opt for opt, given in (
+                ("--mode", args.mode != "random"),
+                ("--random-scheme", args.random_scheme != "legacy"),
+                ("--stat", args.stat != "mean"),
+                ("--template-scale", args.template_scale != 1.0),
+                ("--index-max-mb", args.index_max_mb != 1024),
+                ("--compact-ratios", args.compact_ratios),
+                ("--no-metrics", args.no_metrics),
+                ("--depth-engine", args.depth_engine != "events"),
+                ("--cigar-aware", args.cigar_aware),
+                ("--threads", args.threads != 1),
+                ("--cache-dir", args.cache_dir is not None),
+            ) if given
+        ]
+        if unused:
+            log(f"Error: {', '.join(unused)} cannot be used with --max-depth")
+            return 1
+
+    if args.uniform is not None and args.template_scale != 1.0:
+        log("Error: --template-scale cannot be used with --uniform")
+        return 1
+
+    if args.region is None and args.max_depth is None:
+        log("Error: --region is required unless --max-depth is given")
+        return 1
+
+    if args.target_depth is not None and args.target_depth < 0:
+        log(f"Error: --target-depth must be >= 0, got {args.target_depth}")
+        return 1
+
+    if args.template_scale <= 0:
+        log(f"Error: --template-scale must be > 0, got {args.template_scale}")
+        return 1
+
+    if args.index_max_mb < 0:
+        log(f"Error: --index-max-mb must be >= 0, got {args.index_max_mb}")
+        return 1
+
+    if args.precombined is not None and len(args.template_bed) < 2:
+        log("Error: --precombined requires the (2 or more) --template-bed files it was combined from")
+        return 1
+
+    if args.select and args.template_library is None:
+        log("Error: --select requires --template-library")
+        return 1
+
+    if args.mode.startswith("p") and args.template_library is None:
+        log(f"Error: Percentile mode '{args.mode}' requires --template-library")
         return 1
 
     if args.uniform is not None:
@@ -176,6 +655,35 @@ def _run_sample(args: argparse.Namespace) -> int:
             log(f"Error: --uniform must be in (0, 1], got {args.uniform}")
             return 1
 
+    seeds = None
+    if args.seeds is not None:
+        try:
+            seeds = [int(s) for s in args.seeds.split(",") if s.strip()]
+        except ValueError:
+            log(f"Error: --seeds must be a comma-separated list of integers, got '{args.seeds}'")
+            return 1
+        if not seeds or len(set(seeds)) != len(seeds):
+            log(f"Error: --seeds must list distinct integers, got '{args.seeds}'")
+            return 1
+    elif args.replicates is not None:
+        if args.replicates < 1:
+            log(f"Error: --replicates must be >= 1, got {args.replicates}")
+            return 1
+        seeds = [args.seed + i for i in range(1, args.replicates + 1)]
+
+    if args.max_depth is not None:
+        from .cap import cap_run
+
+        return cap_run(
+            source_bam=args.source_bam,
+            region_str=args.region,
+            max_depth=args.max_depth,
+            out_bam=args.out_bam,
+            seed=args.seed,
+            seeds=seeds,
+            no_sort=args.no_sort,
+        )
+
     return sample_run(
         source_bam=args.source_bam,
         template_beds=args.template_bed if args.template_bed else [],
@@ -187,6 +695,20 @@ def _run_sample(args: argparse.Namespace) -> int:
         no_sort=args.no_sort,
         no_metrics=args.no_metrics,
         uniform_fraction=args.uniform,
+        depth_engine=args.depth_engine,
+        cigar_aware=args.cigar_aware,
+        threads=args.threads,
+        cache_dir=args.cache_dir,
+        seeds=seeds,
+        index_max_bytes=args.index_max_mb * 2**20,
+        compact_ratios=args.compact_ratios,
+        random_scheme=args.random_scheme,
+        template_library=args.template_library,
+        select=args.select,
+        precombined=args.precombined,
+        template_bams=args.template_bam,
+        target_depth=args.target_depth,
+        template_scale=args.template_scale,
     )
 
 
@@ -201,6 +723,10 @@ def _run_plot(args: argparse.Namespace) -> int:
         template_bed=args.template_bed,
         out_png=args.out_png,
         out_tsv=args.out_tsv,
+        depth_engine=args.depth_engine,
+        cigar_aware=args.cigar_aware,
+        threads=args.threads,
+        cache_dir=args.cache_dir,
     )
 
 
@@ -218,6 +744,7 @@ def _run_mapback(args: argparse.Namespace) -> int:
 
 
 def _run_stats(args: argparse.Namespace) -> int:
+    from .cache import open_depth_cache
     from .depth import depth_from_bam, region_parse
     from .metrics import metrics_calculate, metrics_print
 
@@ -244,8 +771,17 @@ def _run_stats(args: argparse.Namespace) -> int:
     log(f"Computing depth for BAM B: {args.bam_b}")
     log(f"Region: {region.contig}:{region.start + 1}-{region.end}")
 
-    depth_a = depth_from_bam(args.bam_a, region.contig, region.start, region.end)
-    depth_b = depth_from_bam(args.bam_b, region.contig, region.start, region.end)
+    cache = open_depth_cache(args.cache_dir)
+    depth_a = depth_from_bam(
+        args.bam_a, region.contig, region.start, region.end,
+        engine=args.depth_engine, cigar_aware=args.cigar_aware, threads=args.threads,
+        cache=cache,
+    )
+    depth_b = depth_from_bam(
+        args.bam_b, region.contig, region.start, region.end,
+        engine=args.depth_engine, cigar_aware=args.cigar_aware, threads=args.threads,
+        cache=cache,
+    )
 
     result = metrics_calculate(depth_a, depth_b)
 
@@ -275,6 +811,9 @@ def main(argv: list[str] | None = None) -> None:
 
     subparsers = parser.add_subparsers(dest="command")
     _add_map_parser(subparsers)
+    _add_convert_parser(subparsers)
+    _add_combine_parser(subparsers)
+    _add_library_parser(subparsers)
     _add_sample_parser(subparsers)
     _add_plot_parser(subparsers)
     _add_mapback_parser(subparsers)
@@ -286,8 +825,16 @@ def main(argv: list[str] | None = None) -> None:
         parser.print_help()
         sys.exit(1)
 
+    # --threads comes with the shared depth arguments (map, sample, plot, stats)
+    if getattr(args, "threads", 1) < 1:
+        print(f"Error: --threads must be >= 1, got {args.threads}", file=sys.stderr)
+        sys.exit(1)
+
     dispatch = {
         "map": _run_map,
+        "convert": _run_convert,
+        "combine": _run_combine,
+        "library": _run_library,
         "sample": _run_sample,
         "plot": _run_plot,
         "mapback": _run_mapback,
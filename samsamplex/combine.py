@@ -0,0 +1,171 @@
+"""Pre-combined templates: combine once, record provenance, reuse in sample.
+
+A pre-combined template carries a provenance record: format version, the
+combine mode, seed and random scheme, the region, and per input its path,
+size, mtime and SHA-256.  BED output stores it as a first comment line
+starting with PROVENANCE_TAG; ``.ssxd`` output stores it in the header
+metadata under ``"provenance"``.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+from typing import Sequence
+
+from .bed import (
+    SSXD_SUFFIX,
+    bed_combine_stream,
+    bed_output,
+    bed_read_template,
+    contig_names_match,
+    write_bed_output,
+)
+from .depth import depth_dense
+
+PROVENANCE_TAG = "#samsamplex-combine "
+PROVENANCE_VERSION = 1
+
+_HASH_BLOCK = 1 << 20
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fp:
+        while block := fp.read(_HASH_BLOCK):
+            h.update(block)
+    return h.hexdigest()
+
+
+def file_fingerprint(path: str) -> dict:
+    """Path, size, mtime (ns) and SHA-256 of one input file."""
+    st = os.stat(path)
+    return {
+        "path": os.path.realpath(path),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "sha256": _sha256(path),
+    }
+
+
+def _same_file(path: str, record: dict) -> bool:
+    """Whether *path* still has the content fingerprinted in *record*.
+
+    Size and mtime decide for the recorded file itself; the checksum is
+    computed when the size matches but the file was touched since, or is
+    a different (e.g. moved) file.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    if st.st_size != record["size"]:
+        return False
+    if st.st_mtime_ns == record["mtime_ns"] and os.path.realpath(path) == record["path"]:
+        return True
+    return _sha256(path) == record["sha256"]
+
+
+def combine_provenance(
+    inputs: Sequence[str], mode: str, seed: int, scheme: str, contig: str, start: int, end: int,
+) -> dict:
+    """Provenance record for combining *inputs* over ``contig:[start, end)``."""
+    return {
+        "version": PROVENANCE_VERSION,
+        "mode": mode,
+        "seed": seed,
+        "scheme": scheme,
+        "region": [contig, start, end],
+        "inputs": [file_fingerprint(p) for p in inputs],
+    }
+
+
+def template_provenance(path: str) -> dict | None:
+    """The provenance record of a pre-combined template, or None."""
+    if path.endswith(SSXD_SUFFIX):
+        from .ssxd import ssxd_read_header
+
+        return ssxd_read_header(path).meta.get("provenance")
+
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt") as fp:
+        first = fp.readline()
+    if not first.startswith(PROVENANCE_TAG):
+        return None
+    return json.loads(first[len(PROVENANCE_TAG) :])
+
+
+def provenance_mismatch(
+    record: dict | None,
+    inputs: Sequence[str],
+    mode: str,
+    seed: int,
+    scheme: str,
+    contig: str,
+    start: int,
+    end: int,
+) -> str | None:
+    """Why a pre-combined template cannot stand in for combining *inputs*
+    over ``contig:[start, end)``; None when it can.
+
+    Seed and scheme only matter for ``"random"``.  Other modes are
+    per-position, so any combined region containing the requested one
+    matches; ``"random"`` draws depend on the region and need it exactly.
+    """
+    if record is None:
+        return "no provenance record"
+    if record.get("version") != PROVENANCE_VERSION:
+        return f"provenance version {record.get('version')}"
+    if record["mode"] != mode:
+        return f"combined with mode '{record['mode']}', not '{mode}'"
+    if mode == "random" and (record["seed"], record["scheme"]) != (seed, scheme):
+        return f"combined with seed {record['seed']} ({record['scheme']}), not {seed} ({scheme})"
+
+    rc, rs, re = record["region"]
+    if not contig_names_match(rc, contig):
+        return f"combined over contig '{rc}', not '{contig}'"
+    if mode == "random" and (rs, re) != (start, end):
+        return f"random mode combined over {rs}-{re}, not {start}-{end}"
+    if rs > start or re < end:
+        return f"combined region {rs}-{re} does not cover {start}-{end}"
+
+    if len(record["inputs"]) != len(inputs):
+        return f"combined from {len(record['inputs'])} templates, not {len(inputs)}"
+    for path, rec in zip(inputs, record["inputs"]):
+        if not _same_file(path, rec):
+            return f"input {path} differs from {rec['path']}"
+    return None
+
+
+def combine_write(
+    out_path: str,
+    inputs: Sequence[str],
+    contig: str,
+    start: int,
+    end: int,
+    mode: str = "random",
+    seed: int = 42,
+    scheme: str = "legacy",
+) -> dict:
+    """Combine *inputs* over a region and write the result with provenance.
+
+    Output is ``.ssxd`` or BED (``.bed.gz`` bgzipped and indexed) by suffix.
+    Returns the provenance record written.
+    """
+    combined = depth_dense(bed_combine_stream(
+        (bed_read_template(p, contig, start, end) for p in inputs),
+        mode=mode, seed=seed, scheme=scheme,
+    ))
+    record = combine_provenance(inputs, mode, seed, scheme, contig, start, end)
+
+    if out_path.endswith(SSXD_SUFFIX):
+        from .ssxd import ssxd_write
+
+        ssxd_write(out_path, [combined], meta={"provenance": record})
+    else:
+        with bed_output(out_path) as fp:
+            fp.write(PROVENANCE_TAG + json.dumps(record) + "\n")
+            write_bed_output(fp, combined)
+    return record
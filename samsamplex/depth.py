@@ -4,11 +4,28 @@ from __future__ import annotations
 
 import re
 import sys
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Iterator, Sequence
 
 import numpy as np
 import pysam
 
+if TYPE_CHECKING:
+    from .cache import DepthCache
+
+# FUNMAP | FSECONDARY | FQCFAIL | FDUP
+READ_FILTER_FLAGS = 0x4 | 0x100 | 0x200 | 0x400
+
+VALID_DEPTH_ENGINES = ("events", "loop")
+
+# Tiles per worker process, so uneven tiles still balance across the pool,
+# and the smallest tile worth shipping to a worker.
+TILES_PER_THREAD = 4
+MIN_TILE_LENGTH = 100_000
+
 
 @dataclass
 class Region:
@@ -33,6 +50,87 @@ class DepthArray:
         return self.end - self.start
 
 
+@dataclass
+class RunLengthDepthArray:
+    """Piecewise-constant depth over a region, stored as runs.
+
+    ``values[i]`` covers ``[breaks[i], breaks[i + 1])`` (the last run ends at
+    *end*); *breaks* are absolute, strictly increasing and start at *start*.
+    Memory scales with the number of runs, not the region length.
+    """
+
+    contig: str
+    start: int
+    end: int
+    breaks: np.ndarray = field(repr=False)  # int64
+    values: np.ndarray = field(repr=False)  # int32
+
+    @property
+    def length(self) -> int:
+        return self.end - self.start
+
+    @property
+    def n_runs(self) -> int:
+        return len(self.breaks)
+
+    @classmethod
+    def from_dense(cls, arr: DepthArray) -> RunLengthDepthArray:
+        """Run-length encode a DepthArray, one run per stretch of equal depth."""
+        d = arr.depths
+        if not len(d):
+            return cls(arr.contig, arr.start, arr.end, np.zeros(0, np.int64), np.zeros(0, np.int32))
+        idx = np.concatenate(([0], np.flatnonzero(d[1:] != d[:-1]) + 1))
+        return cls(arr.contig, arr.start, arr.end, idx + arr.start, np.asarray(d[idx], dtype=np.int32))
+
+    @classmethod
+    def from_intervals(
+        cls, contig: str, start: int, end: int,
+        iv_starts: np.ndarray, iv_ends: np.ndarray, values: np.ndarray,
+    ) -> RunLengthDepthArray:
+        """Runs from sorted, disjoint intervals given as region offsets.
+
+        Gaps between intervals (and before the first / after the last) are
+        depth 0.
+        """
+        n = len(values)
+        # Candidate breaks alternate gap start (previous end) / interval start
+        pts = np.empty(2 * n + 1, dtype=np.int64)
+        pts[0:-1:2] = np.concatenate(([0], iv_ends))[:-1] if n else pts[:0]
+        pts[1::2] = iv_starts
+        pts[-1] = iv_ends[-1] if n else 0
+        vals = np.zeros(2 * n + 1, dtype=np.int32)
+        vals[1::2] = values
+        seg_end = np.append(pts[1:], end - start)
+        keep = pts < seg_end
+        rl = cls(contig, start, end, pts[keep] + start, vals[keep])
+        return rl.compact()
+
+    def slice_dense(self, lo: int, hi: int) -> np.ndarray:
+        """Per-position depths for region offsets ``[lo, hi)``."""
+        lo, hi = lo + self.start, hi + self.start
+        first = int(np.searchsorted(self.breaks, lo, side="right")) - 1
+        last = int(np.searchsorted(self.breaks, hi, side="left"))
+        bounds = np.clip(self.breaks[first:last], lo, hi)
+        return np.repeat(self.values[first:last], np.diff(np.append(bounds, hi)))
+
+    def to_dense(self) -> DepthArray:
+        lengths = np.diff(np.append(self.breaks, self.end))
+        depths = np.repeat(self.values, lengths).astype(np.int32, copy=False)
+        return DepthArray(contig=self.contig, start=self.start, end=self.end, depths=depths)
+
+    def compact(self) -> RunLengthDepthArray:
+        """Merge neighbouring runs with equal values."""
+        if self.n_runs < 2:
+            return self
+        keep = np.concatenate(([True], self.values[1:] != self.values[:-1]))
+        return RunLengthDepthArray(self.contig, self.start, self.end, self.breaks[keep], self.values[keep])
+
+
+def depth_dense(arr: DepthArray | RunLengthDepthArray) -> DepthArray:
+    """*arr* as a per-position DepthArray (expanding runs if needed)."""
+    return arr.to_dense() if isinstance(arr, RunLengthDepthArray) else arr
+
+
 def region_parse(region_str: str) -> Region:
     """Parse a samtools-style region string (e.g. chr1, chr1:1000-2000).
 
@@ -82,48 +180,256 @@ def get_contig_length(header: pysam.AlignmentHeader, contig: str) -> int | None:
     return header.get_reference_length(resolved)
 
 
+class DepthAccumulator:
+    """Collects read spans as +1/-1 events and builds depth with one cumsum.
+
+    Spans are buffered in flat integer arrays and folded into a difference
+    array in batches of *batch_size*, so the per-read cost is two appends
+    instead of a numpy slice update over the whole read length.
+    """
+
+    def __init__(self, start: int, end: int, batch_size: int = 1 << 20) -> None:
+        self.start = start
+        self.end = end
+        self.batch_size = batch_size
+        self._diff = np.zeros(end - start + 1, dtype=np.int32)
+        self._starts = array("q")
+        self._ends = array("q")
+
+    def add(self, r_start: int, r_end: int) -> None:
+        """Record one covered span [r_start, r_end) in reference coordinates."""
+        self._starts.append(r_start)
+        self._ends.append(r_end)
+        if len(self._starts) >= self.batch_size:
+            self._flush()
+
+    def add_many(self, starts: np.ndarray, ends: np.ndarray) -> None:
+        """Record many spans at once from parallel start/end arrays."""
+        self._flush()
+        self._fold(np.asarray(starts, dtype=np.int64), np.asarray(ends, dtype=np.int64))
+
+    def _fold(self, starts: np.ndarray, ends: np.ndarray) -> None:
+        starts = np.maximum(starts, self.start)
+        ends = np.minimum(ends, self.end)
+        keep = starts < ends
+        self._count(starts[keep] - self.start, 1)
+        self._count(ends[keep] - self.start, -1)
+
+    def _count(self, idx: np.ndarray, sign: int) -> None:
+        """Add *sign* at each index, counting over the batch's own extent."""
+        if not len(idx):
+            return
+        lo = int(idx.min())
+        counts = np.bincount(idx - lo)
+        window = self._diff[lo : lo + len(counts)]
+        if sign > 0:
+            window += counts
+        else:
+            window -= counts
+
+    def _flush(self) -> None:
+        if not self._starts:
+            return
+        self._fold(
+            np.frombuffer(self._starts, dtype=np.int64), np.frombuffer(self._ends, dtype=np.int64),
+        )
+        self._starts = array("q")
+        self._ends = array("q")
+
+    def depths(self) -> np.ndarray:
+        """Return the per-position depth over [start, end) as int32."""
+        self._flush()
+        return np.cumsum(self._diff[:-1], dtype=np.int32)
+
+
+def _read_spans(read: pysam.AlignedSegment, cigar_aware: bool) -> list[tuple[int, int]]:
+    """Reference spans a read covers: its aligned blocks, or its full extent."""
+    if cigar_aware:
+        return read.get_blocks()
+    return [(read.reference_start, read.reference_end)]
+
+
+def _depth_loop(
+    bam: pysam.AlignmentFile, contig: str, start: int, end: int, cigar_aware: bool = False,
+) -> np.ndarray:
+    """Per-read slice increment; O(reads x read length)."""
+    depths = np.zeros(end - start, dtype=np.int32)
+
+    for read in bam.fetch(contig, start, end):
+        if read.flag & READ_FILTER_FLAGS:
+            continue
+
+        if read.reference_end is None:
+            continue
+
+        for r_start, r_end in _read_spans(read, cigar_aware):
+            ov_start = max(r_start, start)
+            ov_end = min(r_end, end)
+            if ov_start >= ov_end:
+                continue
+
+            depths[ov_start - start : ov_end - start] += 1
+
+    return depths
+
+
+def _depth_events(
+    bam: pysam.AlignmentFile, contig: str, start: int, end: int, cigar_aware: bool = False,
+) -> np.ndarray:
+    """Batched start/end events folded into a difference array; O(reads + length)."""
+    acc = DepthAccumulator(start, end)
+
+    for read in bam.fetch(contig, start, end):
+        if read.flag & READ_FILTER_FLAGS:
+            continue
+
+        r_end = read.reference_end
+        if r_end is None:
+            continue
+
+        if cigar_aware:
+            for b_start, b_end in read.get_blocks():
+                acc.add(b_start, b_end)
+        else:
+            acc.add(read.reference_start, r_end)
+
+    return acc.depths()
+
+
+def _depth_tile(
+    bam_path: str, contig: str, start: int, end: int, engine: str, cigar_aware: bool,
+) -> np.ndarray:
+    """Depth for one tile, read through a file handle private to the caller."""
+    with pysam.AlignmentFile(bam_path, "rb") as bam:
+        if engine == "events":
+            return _depth_events(bam, contig, start, end, cigar_aware)
+        return _depth_loop(bam, contig, start, end, cigar_aware)
+
+
+def _split_tiles(start: int, end: int, threads: int) -> list[tuple[int, int]]:
+    """Split [start, end) into contiguous tiles for *threads* workers."""
+    n_tiles = min(threads * TILES_PER_THREAD, max(1, (end - start) // MIN_TILE_LENGTH))
+    bounds = np.linspace(start, end, n_tiles + 1).astype(np.int64)
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if a < b]
+
+
 def depth_from_bam(
     bam_path: str,
     contig: str,
     start: int,
     end: int,
+    engine: str = "events",
+    cigar_aware: bool = False,
+    threads: int = 1,
+    cache: DepthCache | None = None,
 ) -> DepthArray:
     """Compute per-position depth for a region from an indexed BAM file.
 
-    Uses a simplified read-iteration approach:
-    for each read overlapping the region, increment depth at every covered
-    position (CIGAR-unaware).
+    Every read overlapping the region (minus unmapped, secondary, QC-fail and
+    duplicate reads) counts as covering each position from its reference
+    start to its reference end.  With *cigar_aware* only the aligned blocks
+    (``M``/``=``/``X``) count, so deletions and ``N`` ref-skips are left
+    uncovered; each block is one start/end event pair, so long introns cost
+    nothing extra.
+
+    *engine* selects how the depth is accumulated: ``"events"`` records
+    read start/end events and builds the array with a single cumsum,
+    ``"loop"`` increments the covered slice once per read.  Both produce
+    identical output.
+
+    With *threads* > 1 the region is split into tiles computed in a process
+    pool, each worker opening its own BAM handle.  A read spanning a tile
+    boundary is fetched by both tiles but each only counts the part inside
+    its own bounds, so every position is still counted once per read.
+
+    When a *cache* is given the array is looked up there first (returned
+    memory-mapped, read-only) and stored after computing on a miss.
     """
+    if engine not in VALID_DEPTH_ENGINES:
+        raise ValueError(f"Unknown depth engine: {engine}")
+
     with pysam.AlignmentFile(bam_path, "rb") as bam:
         resolved = resolve_contig_name(bam.header, contig)
         if resolved is None:
             raise ValueError(f"Contig '{contig}' not found in BAM header")
 
-        tid = bam.get_tid(resolved)
         contig_len = bam.get_reference_length(resolved)
 
-        if start < 0:
-            start = 0
-        if end < 0 or end > contig_len:
-            end = contig_len
-
-        depths = np.zeros(end - start, dtype=np.int32)
-
-        for read in bam.fetch(resolved, start, end):
-            if read.flag & (0x4 | 0x100 | 0x200 | 0x400):
-                # FUNMAP | FSECONDARY | FQCFAIL | FDUP
-                continue
-
-            r_start = read.reference_start
-            r_end = read.reference_end
-            if r_end is None:
-                continue
+    if start < 0:
+        start = 0
+    if end < 0 or end > contig_len:
+        end = contig_len
+
+    key = None
+    if cache is not None:
+        key = cache.key(
+            bam_path, resolved, start, end,
+            filter_flags=READ_FILTER_FLAGS, cigar_aware=cigar_aware,
+        )
+        cached = cache.get(key)
+        if cached is not None:
+            return DepthArray(contig=resolved, start=start, end=end, depths=cached)
+
+    tiles = _split_tiles(start, end, threads) if threads > 1 else [(start, end)]
+
+    if len(tiles) <= 1:
+        depths = _depth_tile(bam_path, resolved, start, end, engine, cigar_aware)
+    else:
+        n = len(tiles)
+        with ProcessPoolExecutor(max_workers=min(threads, n)) as pool:
+            parts = pool.map(
+                _depth_tile,
+                [bam_path] * n,
+                [resolved] * n,
+                [a for a, _ in tiles],
+                [b for _, b in tiles],
+                [engine] * n,
+                [cigar_aware] * n,
+            )
+            depths = np.concatenate(list(parts))
+
+    if cache is not None:
+        cache.put(key, depths)
 
-            ov_start = max(r_start, start)
-            ov_end = min(r_end, end)
-            if ov_start >= ov_end:
-                continue
+    return DepthArray(contig=resolved, start=start, end=end, depths=depths)
 
-            depths[ov_start - start : ov_end - start] += 1
 
-    return DepthArray(contig=resolved, start=start, end=end, depths=depths)
+def depth_from_bams(
+    bam_paths: Sequence[str],
+    contig: str,
+    start: int,
+    end: int,
+    engine: str = "events",
+    cigar_aware: bool = False,
+    threads: int = 1,
+    cache: DepthCache | None = None,
+) -> Iterator[DepthArray]:
+    """Depth arrays for several BAMs over one region, yielded in input order.
+
+    With *threads* > 1 and more than one BAM, each BAM is computed whole by
+    one process of a pool of up to *threads* workers (each with its own
+    BAM handle and cache lookup).  At most *threads* arrays are computed
+    ahead of the consumer, so folding the results as they arrive keeps
+    memory bounded however many BAMs there are.  A single BAM uses the
+    tiled path of :func:`depth_from_bam` instead.
+    """
+    if len(bam_paths) <= 1 or threads <= 1:
+        for path in bam_paths:
+            yield depth_from_bam(
+                path, contig, start, end,
+                engine=engine, cigar_aware=cigar_aware, threads=threads, cache=cache,
+            )
+        return
+
+    paths = iter(bam_paths)
+    with ProcessPoolExecutor(max_workers=min(threads, len(bam_paths))) as pool:
+        submit = lambda p: pool.submit(
+            depth_from_bam, p, contig, start, end, engine, cigar_aware, 1, cache,
+        )
+        pending = deque(submit(p) for _, p in zip(range(threads), paths))
+        while pending:
+            arr = pending.popleft().result()
+            nxt = next(paths, None)
+            if nxt is not None:
+                pending.append(submit(nxt))
+            yield arr
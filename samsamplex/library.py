@@ -0,0 +1,276 @@
+"""Template libraries: many templates stored as one chunked on-disk matrix.
+
+Layout of a library directory::
+
+    manifest.json
+    <c>.<k>.npy         chunk k of contig c: an (n_templates, width) array
+
+The manifest records the sample IDs (matrix rows, in order), the depth
+dtype, the chunk width and per contig its name, covered range
+``[start, end)`` and chunk files.  A chunk holds the depths of every
+template over ``width`` consecutive positions, so combining a region only
+touches the chunks overlapping it and only the selected rows are read.
+Chunks are opened with ``np.load(mmap_mode="r")``.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Iterator, Sequence
+
+import numpy as np
+
+from .bed import (
+    SSXD_SUFFIX,
+    VALID_RANDOM_SCHEMES,
+    find_contig,
+    random_between,
+    template_extents,
+    template_read_contigs,
+)
+from .depth import DepthArray
+
+LIBRARY_MANIFEST = "manifest.json"
+LIBRARY_VERSION = 1
+LIBRARY_DTYPE = "<i4"
+
+# Positions per chunk file, and per block read from a chunk when combining
+# (bounding combine memory to n_templates x LIBRARY_BLOCK depths).
+LIBRARY_CHUNK = 1 << 20
+LIBRARY_BLOCK = 1 << 16
+
+COMBINE_MODES = ("min", "max", "mean", "random")
+
+
+@dataclass
+class LibraryContig:
+    """Manifest entry for one contig: covered range and chunk file names."""
+
+    name: str
+    start: int
+    end: int
+    chunks: list[str] = field(default_factory=list)
+
+    @property
+    def length(self) -> int:
+        return self.end - self.start
+
+
+@dataclass
+class TemplateLibrary:
+    """An opened template library (see module docstring for the layout)."""
+
+    root: Path
+    samples: list[str]
+    chunk: int
+    dtype: str
+    contigs: list[LibraryContig]
+
+    def find(self, contig: str) -> LibraryContig | None:
+        """First contig entry matching *contig* (``chr`` prefix ignored)."""
+        return find_contig(self.contigs, contig)
+
+    def rows(self, select: Sequence[str] | None = None) -> np.ndarray:
+        """Matrix rows of the sample IDs in *select* (all when None)."""
+        if select is None:
+            return np.arange(len(self.samples))
+        index = {s: i for i, s in enumerate(self.samples)}
+        missing = [s for s in select if s not in index]
+        if missing:
+            raise ValueError(f"Unknown template IDs: {', '.join(missing)}")
+        return np.array([index[s] for s in select], dtype=np.int64)
+
+
+def combine_percentile(mode: str) -> float | None:
+    """Percentile requested by a combine mode like ``"p90"``, else None."""
+    if len(mode) < 2 or mode[0] != "p":
+        return None
+    try:
+        q = float(mode[1:])
+    except ValueError:
+        return None
+    return q if 0 <= q <= 100 else None
+
+
+def _template_id(path: str) -> str:
+    name = Path(path).name
+    for suffix in (".bed.gz", ".bed", SSXD_SUFFIX):
+        if name.endswith(suffix):
+            return name[: -len(suffix)]
+    return name
+
+
+# ── Building ─────────────────────────────────────────────────────────────────
+
+
+def library_build(
+    root: str,
+    templates: Sequence[str],
+    ids: Sequence[str] | None = None,
+    chunk: int = LIBRARY_CHUNK,
+    log: Callable[[str], None] | None = None,
+) -> TemplateLibrary:
+    """Build a library in directory *root* from BED / ``.ssxd`` templates.
+
+    Sample IDs default to the file names without their template suffix and
+    must be unique.  Each contig covers the union of its extents over all
+    templates.  Every template is read once and its rows are written one
+    chunk file at a time, so only one contig of one template and one chunk
+    are in memory.  The manifest is written last, so an interrupted build
+    leaves no loadable library behind.
+    """
+    ids = list(ids) if ids is not None else [_template_id(t) for t in templates]
+    if len(ids) != len(templates):
+        raise ValueError(f"Got {len(ids)} IDs for {len(templates)} templates")
+    if len(set(ids)) != len(ids):
+        raise ValueError("Template IDs must be unique")
+    if not templates:
+        raise ValueError("No templates to build a library from")
+
+    out = Path(root)
+    out.mkdir(parents=True, exist_ok=True)
+    if (out / LIBRARY_MANIFEST).exists():
+        raise ValueError(f"Library already exists: {root}")
+
+    contigs: list[LibraryContig] = []
+    for path in templates:
+        for name, (start, end) in template_extents(path).items():
+            entry = find_contig(contigs, name)
+            if entry is None:
+                contigs.append(LibraryContig(name, start, end))
+            else:
+                entry.start, entry.end = min(entry.start, start), max(entry.end, end)
+
+    n = len(templates)
+    for ci, entry in enumerate(contigs):
+        entry.chunks = [f"{ci}.{k}.npy" for k in range(-(-entry.length // chunk))]
+        for k, fname in enumerate(entry.chunks):
+            width = min(chunk, entry.length - k * chunk)
+            # Created zero-filled; rows are written per template below
+            np.lib.format.open_memmap(out / fname, mode="w+", dtype=LIBRARY_DTYPE, shape=(n, width)).flush()
+        if log:
+            log(f"[library] {entry.name}:{entry.start}-{entry.end}, {len(entry.chunks)} chunk(s)")
+
+    for row, path in enumerate(templates):
+        for arr in template_read_contigs(path):
+            entry = find_contig(contigs, arr.contig)
+            for k, fname in enumerate(entry.chunks):
+                a = entry.start + k * chunk
+                lo, hi = max(a, arr.start), min(a + chunk, arr.end)
+                if lo >= hi:
+                    continue
+                mat = np.load(out / fname, mmap_mode="r+")
+                mat[row, lo - a : hi - a] = arr.depths[lo - arr.start : hi - arr.start]
+                mat.flush()
+                del mat
+
+    lib = TemplateLibrary(out, ids, chunk, LIBRARY_DTYPE, contigs)
+    manifest = {
+        "version": LIBRARY_VERSION,
+        "dtype": lib.dtype,
+        "chunk": lib.chunk,
+        "samples": lib.samples,
+        "contigs": [asdict(c) for c in contigs],
+    }
+    tmp = out / (LIBRARY_MANIFEST + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=1))
+    os.replace(tmp, out / LIBRARY_MANIFEST)
+    return lib
+
+
+# ── Reading and combining ────────────────────────────────────────────────────
+
+
+def library_open(root: str) -> TemplateLibrary:
+    """Read and validate the manifest of a library directory."""
+    path = Path(root) / LIBRARY_MANIFEST
+    if not path.exists():
+        raise ValueError(f"Not a template library (no {LIBRARY_MANIFEST}): {root}")
+    meta = json.loads(path.read_text())
+    if meta.get("version") != LIBRARY_VERSION:
+        raise ValueError(f"Unsupported template library version {meta.get('version')}: {root}")
+    return TemplateLibrary(
+        root=Path(root),
+        samples=meta["samples"],
+        chunk=meta["chunk"],
+        dtype=meta["dtype"],
+        contigs=[LibraryContig(**c) for c in meta["contigs"]],
+    )
+
+
+def library_chunks(
+    lib: TemplateLibrary, contig: str, region_start: int, region_end: int, rows: np.ndarray,
+) -> Iterator[tuple[int, int, np.ndarray]]:
+    """Yield ``(lo, hi, matrix)`` blocks of at most LIBRARY_BLOCK positions.
+
+    *lo*/*hi* are region offsets and *matrix* holds the depths of the
+    selected *rows* over them, shape ``(len(rows), hi - lo)``.  Positions
+    the library does not cover are not yielded.
+    """
+    entry = lib.find(contig)
+    if entry is None:
+        return
+    all_rows = len(rows) == len(lib.samples) and (rows == np.arange(len(rows))).all()
+    for k, fname in enumerate(entry.chunks):
+        a = entry.start + k * lib.chunk
+        b = min(a + lib.chunk, entry.end)
+        lo, hi = max(a, region_start), min(b, region_end)
+        if lo >= hi:
+            continue
+        mat = np.load(lib.root / fname, mmap_mode="r")
+        for blo in range(lo, hi, LIBRARY_BLOCK):
+            bhi = min(blo + LIBRARY_BLOCK, hi)
+            cols = slice(blo - a, bhi - a)
+            yield blo - region_start, bhi - region_start, mat[:, cols] if all_rows else mat[rows, cols]
+
+
+def library_combine(
+    lib: TemplateLibrary,
+    contig: str,
+    region_start: int,
+    region_end: int,
+    rows: np.ndarray | None = None,
+    mode: str = "min",
+    seed: int = 42,
+    scheme: str = "legacy",
+) -> DepthArray:
+    """Combine the selected templates of a library over a region, chunk by chunk.
+
+    ``"min"``, ``"max"``, ``"mean"`` and ``"random"`` match
+    :func:`samsamplex.bed.bed_combine_stream` over the same templates.
+    ``"p<Q>"`` (e.g. ``"p90"``) takes the Q-th percentile per position with
+    numpy's ``"lower"`` method, i.e. always one of the template depths, so
+    ``"p0"`` and ``"p100"`` equal min and max.  Only one block of the
+    selected rows is in memory at a time.
+    """
+    q = combine_percentile(mode)
+    if mode not in COMBINE_MODES and q is None:
+        raise ValueError(f"Unknown combine mode: {mode}")
+    if scheme not in VALID_RANDOM_SCHEMES:
+        raise ValueError(f"Unknown random scheme: {scheme}")
+    if rows is None:
+        rows = lib.rows()
+    if not len(rows):
+        raise ValueError("No depth arrays to combine")
+
+    length = region_end - region_start
+    combined = np.zeros(length, dtype=np.int32)
+    hi_all = np.zeros(length, dtype=np.int32) if mode == "random" else None
+
+    for lo, hi, mat in library_chunks(lib, contig, region_start, region_end, rows):
+        if mode in ("min", "random"):
+            combined[lo:hi] = mat.min(axis=0)
+        if mode in ("max", "random"):
+            (hi_all if hi_all is not None else combined)[lo:hi] = mat.max(axis=0)
+        if mode == "mean":
+            combined[lo:hi] = mat.sum(axis=0, dtype=np.int64) // len(rows)
+        if q is not None:
+            combined[lo:hi] = np.percentile(mat, q, axis=0, method="lower")
+
+    if hi_all is not None:
+        combined = random_between(combined, hi_all, seed, scheme)
+
+    return DepthArray(contig=contig, start=region_start, end=region_end, depths=combined)
@@ -3,13 +3,13 @@
 from __future__ import annotations
 
 import csv
-import os
 import sys
 import tempfile
 from pathlib import Path
 
 import pysam
 
+from .bamio import bam_finalize, header_mark_sorted
 from .depth import region_parse, resolve_contig_name
 
 # ── Short PRG haplotype names → GRCh38 alt contig names ─────────────────────
@@ -257,6 +257,23 @@ def _get_prg_contigs(bam: pysam.AlignmentFile) -> list[str]:
     ]
 
 
+def _order_contigs_by_offset(contigs: list[str], offset_table: dict[str, int]) -> list[str]:
+    """Order contigs by the chr6 position their reads are shifted to.
+
+    chr6 itself (offset 0) comes first and unresolvable PRG contigs last.
+    Visiting contigs in this order writes remapped reads close to coordinate
+    order, so the output frequently needs no sort at all.
+    """
+    def _key(c: str) -> tuple[int, int]:
+        if c in ("chr6", "6"):
+            return (0, 0)
+        if c in offset_table:
+            return (1, offset_table[c])
+        return (2, 0)
+
+    return sorted(contigs, key=_key)
+
+
 # ── Main entry point ────────────────────────────────────────────────────────
 
 
@@ -301,8 +318,12 @@ def mapback_run(
     region = region_parse(region_str)
 
     with pysam.AlignmentFile(source_bam, "rb") as src:
-        # Build output header with chr6
-        out_header = modify_header(src.header, genome_build)
+        # Build output header with chr6; SO:coordinate holds whenever the
+        # reads come out in order, and otherwise the output is sorted below.
+        # With no_sort the order is unknown until the end, so claim none.
+        out_header = header_mark_sorted(
+            modify_header(src.header, genome_build), "unsorted" if no_sort else "coordinate",
+        )
         chr6_tid = out_header.get_tid("chr6")
 
         # Resolve region bounds
@@ -313,7 +334,7 @@ def mapback_run(
 
         log(f"[mapback] Target region: chr6:{region.start}-{region.end}")
 
-        prg_contigs = _get_prg_contigs(src)
+        prg_contigs = _order_contigs_by_offset(_get_prg_contigs(src), offset_table)
         log(f"[mapback] PRG/chr6 contigs in source: {len(prg_contigs)}")
 
         total = 0
@@ -321,6 +342,11 @@ def mapback_run(
         kept = 0
         skipped = 0
 
+        # PRG contigs overlap on chr6, so the output is only sorted if every
+        # written read starts at or after the previous one.
+        last_pos = -1
+        in_order = True
+
         with pysam.AlignmentFile(out_bam, "wb", header=out_header) as out:
             for contig in prg_contigs:
                 for read in src.fetch(contig=contig):
@@ -339,6 +365,9 @@ def mapback_run(
                         continue
 
                     if max(r_start, region.start) < min(r_end, region.end):
+                        if r_start < last_pos:
+                            in_order = False
+                        last_pos = r_start
                         out.write(read)
                         kept += 1
 
@@ -351,15 +380,7 @@ def mapback_run(
     log(f"[mapback]   Skipped:   {skipped} (unresolvable contig)")
 
     if not no_sort:
-        log("[mapback] Sorting output BAM...")
-        tmp_sorted = out_bam + ".tmp.sorted.bam"
-        try:
-            pysam.sort("-o", tmp_sorted, out_bam)
-            os.replace(tmp_sorted, out_bam)
-            pysam.index(out_bam)
-            log("[mapback] Sorting and indexing complete.")
-        except Exception as exc:
-            log(f"Warning: Failed to sort/index output BAM: {exc}")
+        bam_finalize(out_bam, presorted=in_order, log=log, tag="mapback")
 
     log(f"[mapback] Done. Output written to: {out_bam}")
     return 0
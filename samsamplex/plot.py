@@ -152,9 +152,14 @@ def plot_run(
     template_bed: str | None = None,
     out_png: str | None = None,
     out_tsv: str | None = None,
+    depth_engine: str = "events",
+    cigar_aware: bool = False,
+    threads: int = 1,
+    cache_dir: str | None = None,
 ) -> int:
     """Run the plot subcommand. Returns 0 on success."""
     from .bed import bed_read_depths
+    from .cache import open_depth_cache
     from .depth import depth_from_bam, region_parse, resolve_contig_name
 
     import pysam
@@ -177,19 +182,29 @@ def plot_run(
 
     log(f"[plot] Region: {region.contig}:{region.start + 1}-{region.end}")
 
-    # Load depth arrays
+    # Load depth arrays (source and template through the depth cache, if any)
+    cache = open_depth_cache(cache_dir)
     log(f"[plot] Loading source depths from: {source_bam}")
-    source_depth = depth_from_bam(source_bam, region.contig, region.start, region.end)
+    source_depth = depth_from_bam(
+        source_bam, region.contig, region.start, region.end,
+        engine=depth_engine, cigar_aware=cigar_aware, threads=threads, cache=cache,
+    )
 
     if template_bam:
         log(f"[plot] Loading template depths from BAM: {template_bam}")
-        template_depth = depth_from_bam(template_bam, region.contig, region.start, region.end)
+        template_depth = depth_from_bam(
+            template_bam, region.contig, region.start, region.end,
+            engine=depth_engine, cigar_aware=cigar_aware, threads=threads, cache=cache,
+        )
     else:
         log(f"[plot] Loading template depths from BED: {template_bed}")
         template_depth = bed_read_depths(template_bed, region.contig, region.start, region.end)
 
     log(f"[plot] Loading output depths from: {out_bam}")
-    output_depth = depth_from_bam(out_bam, region.contig, region.start, region.end)
+    output_depth = depth_from_bam(
+        out_bam, region.contig, region.start, region.end,
+        engine=depth_engine, cigar_aware=cigar_aware, threads=threads,
+    )
 
     if source_depth.length != template_depth.length or source_depth.length != output_depth.length:
         log("Error: Depth array length mismatch")
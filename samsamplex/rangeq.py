@@ -0,0 +1,576 @@
+"""Range-query indexes summarising per-position sampling ratios over read spans.
+
+Every index answers ``query(i1, i2)`` for arrays of half-open spans
+``[i1, i2)`` (0-based offsets into the ratio array, ``i1 < i2``) and returns
+one float64 summary per span, in stored units: dividing by ``index.scale``
+gives ratios (the scale is >1 for fixed-point integer ratio arrays).  Indexes can be saved as ``.npy`` files and
+re-opened memory-mapped, so sharded workers share one copy.
+"""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass, field
+
+import numpy as np
+
+# Most ratio values gathered at once when scanning spans directly.
+WINDOW_BUDGET = 1 << 22
+
+# Default memory cap for the auxiliary arrays of an index.
+DEFAULT_INDEX_MAX_BYTES = 1 << 30
+
+# Largest block size tried by RangeExtremum; past it the cap cannot be met.
+MAX_BLOCK = 256
+
+# Positions per block of RangeMeanFixed; 65535 * 2**16 still fits in uint32.
+FIXED_PREFIX_BLOCK = 1 << 16
+
+# Blocks per chunk when building RangeMeanFixed prefix sums.
+FIXED_PREFIX_CHUNK_BLOCKS = 64
+
+
+# ── Direct window scans ──────────────────────────────────────────────────────
+
+
+def _window_stat(values: np.ndarray, i1: np.ndarray, i2: np.ndarray, stat: str) -> np.ndarray:
+    """min/max/median of ``values[i1:i2]`` per span, gathered as padded windows.
+
+    Spans are processed shortest first in groups of at most WINDOW_BUDGET
+    gathered values.  Medians average the two middle values exactly as
+    ``np.median`` does, so results match a per-span ``np.median`` bit for bit.
+    """
+    out = np.empty(len(i1), dtype=np.float64)
+    lengths = i2 - i1
+    order = np.argsort(lengths, kind="stable")
+    last = len(values) - 1
+
+    pos = 0
+    while pos < len(order):
+        # Shrink the group until its widest (last) span fits the budget.
+        end = min(pos + max(1, WINDOW_BUDGET // max(int(lengths[order[pos]]), 1)), len(order))
+        while end - pos > 1 and (end - pos) * int(lengths[order[end - 1]]) > WINDOW_BUDGET:
+            end = pos + (end - pos) // 2
+        width = int(lengths[order[end - 1]])
+
+        idx = order[pos:end]
+        offs = np.arange(width)
+        mask = offs[None, :] < lengths[idx, None]
+        vals = values[np.minimum(i1[idx, None] + offs[None, :], last)]
+
+        if stat == "min":
+            out[idx] = np.where(mask, vals, np.inf).min(axis=1)
+        elif stat == "max":
+            out[idx] = np.where(mask, vals, -np.inf).max(axis=1)
+        else:
+            vals = np.sort(np.where(mask, vals, np.nan), axis=1)
+            k = lengths[idx]
+            rows = np.arange(len(idx))
+            lo = vals[rows, (k - 1) // 2]
+            hi = vals[rows, k // 2]
+            out[idx] = (lo + hi) / 2
+        pos = end
+
+    return out
+
+
+def _floor_log2(x: np.ndarray) -> np.ndarray:
+    """Exact floor(log2(x)) for positive integers below 2**53."""
+    return np.frexp(x.astype(np.float64))[1] - 1
+
+
+_BYTE_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _popcount64(words: np.ndarray) -> np.ndarray:
+    """Set bits per uint64 word."""
+    if hasattr(np, "bitwise_count"):  # numpy >= 2.0
+        return np.bitwise_count(words)
+    return _BYTE_POPCOUNT[words.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.uint8)
+
+
+# ── Index classes ────────────────────────────────────────────────────────────
+
+
+class RangeIndex:
+    """Base class: a span summary over a ratio array with saveable state."""
+
+    kind = ""
+    scale = 1.0
+
+    def query(self, i1: np.ndarray, i2: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        """Named arrays holding the index state."""
+        raise NotImplementedError
+
+    def meta(self) -> dict:
+        """Scalar parameters needed to rebuild the index from its arrays."""
+        return {}
+
+    @classmethod
+    def from_arrays(cls, meta: dict, arrays: dict[str, np.ndarray]) -> RangeIndex:
+        raise NotImplementedError
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the index on top of the ratio array itself."""
+        return sum(a.nbytes for name, a in self.arrays().items() if name != "values")
+
+    def describe(self) -> str:
+        return f"{self.kind}, {self.nbytes / 2**20:.1f} MiB"
+
+
+class RangeMean(RangeIndex):
+    """Mean over a span in O(1) from a float64 prefix sum."""
+
+    kind = "mean"
+
+    def __init__(self, values: np.ndarray | None = None, cumsum: np.ndarray | None = None) -> None:
+        if cumsum is None:
+            cumsum = np.concatenate(([0.0], np.cumsum(values)))
+        self.cumsum = cumsum
+
+    def query(self, i1: np.ndarray, i2: np.ndarray) -> np.ndarray:
+        return (self.cumsum[i2] - self.cumsum[i1]) / (i2 - i1)
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        return {"cumsum": self.cumsum}
+
+    @classmethod
+    def from_arrays(cls, meta: dict, arrays: dict[str, np.ndarray]) -> RangeMean:
+        return cls(cumsum=arrays["cumsum"])
+
+
+class RangeMeanFixed(RangeIndex):
+    """Mean over a span in O(1) for fixed-point (uint16) values.
+
+    The prefix sum is split into an int64 base per block of
+    FIXED_PREFIX_BLOCK positions plus a uint32 offset within the block,
+    4 bytes per position instead of 8.  Sums are exact integers.
+    """
+
+    kind = "mean-fixed"
+
+    def __init__(self, values: np.ndarray | None = None, _state: dict | None = None) -> None:
+        if _state is not None:
+            self.base = _state["base"]
+            self.inblock = _state["inblock"]
+            return
+
+        n, b = len(values), FIXED_PREFIX_BLOCK
+        nb = -(-n // b)
+        self.base = np.zeros(nb + 1, dtype=np.int64)
+        self.inblock = np.zeros(n + 1, dtype=np.uint32)
+
+        step = b * FIXED_PREFIX_CHUNK_BLOCKS
+        for lo in range(0, n, step):
+            hi = min(lo + step, n)
+            k = -(-(hi - lo) // b)
+            grid = np.zeros(k * b, dtype=np.uint32)
+            grid[: hi - lo] = values[lo:hi]
+            grid = grid.reshape(k, b)
+            inclusive = np.cumsum(grid, axis=1, dtype=np.uint32)
+            self.inblock[lo:hi] = (inclusive - grid).ravel()[: hi - lo]
+            first = lo // b
+            self.base[first + 1 : first + k + 1] = inclusive[:, -1]
+            if hi == n and n % b:
+                self.inblock[n] = inclusive[-1, (n - 1) % b]
+        np.cumsum(self.base, out=self.base)
+        if n % b:
+            self.base[nb] = self.base[nb - 1]  # position n lies inside the last block
+
+    def _prefix(self, i: np.ndarray) -> np.ndarray:
+        return self.base[i // FIXED_PREFIX_BLOCK] + self.inblock[i].astype(np.int64)
+
+    def query(self, i1: np.ndarray, i2: np.ndarray) -> np.ndarray:
+        return (self._prefix(i2) - self._prefix(i1)) / (i2 - i1)
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        return {"base": self.base, "inblock": self.inblock}
+
+    @classmethod
+    def from_arrays(cls, meta: dict, arrays: dict[str, np.ndarray]) -> RangeMeanFixed:
+        return cls(_state={"base": arrays["base"], "inblock": arrays["inblock"]})
+
+
+class RangeWindow(RangeIndex):
+    """Span summary by direct scan of the covered values; O(span length)."""
+
+    kind = "window"
+
+    def __init__(self, values: np.ndarray, stat: str) -> None:
+        self.values = values
+        self.stat = stat
+
+    def query(self, i1: np.ndarray, i2: np.ndarray) -> np.ndarray:
+        return _window_stat(self.values, i1, i2, self.stat)
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        return {"values": self.values}
+
+    def meta(self) -> dict:
+        return {"stat": self.stat}
+
+    @classmethod
+    def from_arrays(cls, meta: dict, arrays: dict[str, np.ndarray]) -> RangeWindow:
+        return cls(arrays["values"], meta["stat"])
+
+    def describe(self) -> str:
+        return f"{self.stat} by direct scan"
+
+
+class RangeExtremum(RangeIndex):
+    """O(1) range minimum or maximum with a memory cap.
+
+    With block size 1 this is a plain sparse table: level *k* holds the
+    extreme of every window of ``2**k`` values, and a span is covered by two
+    overlapping windows.  When that exceeds *max_bytes*, values are grouped
+    into blocks of ``B`` (the smallest power of two that fits): a sparse
+    table over block extremes answers whole blocks, and in-block prefix and
+    suffix extremes answer the partial blocks at either end.  Spans inside
+    a single block (shorter than ``B``) are scanned directly.  If no block
+    size up to MAX_BLOCK fits, ValueError is raised (see
+    :func:`build_range_index`, which then scans spans instead).
+    """
+
+    kind = "extremum"
+
+    def __init__(
+        self,
+        values: np.ndarray,
+        op: str = "min",
+        max_bytes: int = DEFAULT_INDEX_MAX_BYTES,
+        _state: dict | None = None,
+    ) -> None:
+        if op not in ("min", "max"):
+            raise ValueError(f"Unknown extremum op: {op}")
+        self.values = values
+        self.op = op
+        self._ufunc = np.minimum if op == "min" else np.maximum
+
+        if _state is not None:
+            self.block = _state["block"]
+            self.levels = _state["levels"]
+            self.prefix = _state.get("prefix")
+            self.suffix = _state.get("suffix")
+            return
+
+        block = self.pick_block(len(values), values.itemsize, max_bytes)
+        if block is None:
+            raise ValueError(f"Range {op} index does not fit in {max_bytes} bytes")
+        self.block = block
+        if self.block == 1:
+            self.prefix = self.suffix = None
+            self.levels = self._sparse_table(values)
+        else:
+            self._build_blocks()
+
+    @staticmethod
+    def _table_items(n: int) -> int:
+        """Values in sparse-table levels 1.. over *n* items."""
+        return sum(n - (1 << k) + 1 for k in range(1, int(n).bit_length()) if (1 << k) <= n)
+
+    @classmethod
+    def pick_block(cls, n: int, itemsize: int, max_bytes: int) -> int | None:
+        """Smallest block size whose index over *n* values fits *max_bytes*;
+        None when even MAX_BLOCK does not."""
+        if cls._table_items(n) * itemsize <= max_bytes:
+            return 1
+        block = 2
+        while block <= MAX_BLOCK:
+            nb = -(-n // block)
+            if (2 * n + nb + cls._table_items(nb)) * itemsize <= max_bytes:
+                return block
+            block *= 2
+        return None
+
+    def _sparse_table(self, base: np.ndarray) -> list[np.ndarray]:
+        levels = [base]
+        k = 1
+        while (1 << k) <= len(base):
+            prev = levels[-1]
+            half = 1 << (k - 1)
+            levels.append(self._ufunc(prev[:-half], prev[half:]))
+            k += 1
+        return levels
+
+    def _build_blocks(self) -> None:
+        n, b = len(self.values), self.block
+        nb = -(-n // b)
+        if np.issubdtype(self.values.dtype, np.floating):
+            neutral = np.inf if self.op == "min" else -np.inf
+        else:
+            info = np.iinfo(self.values.dtype)
+            neutral = info.max if self.op == "min" else info.min
+
+        padded = np.full(nb * b, neutral, dtype=self.values.dtype)
+        padded[:n] = self.values
+        grid = padded.reshape(nb, b)
+
+        self.prefix = self._ufunc.accumulate(grid, axis=1).ravel()[:n]
+        self.suffix = self._ufunc.accumulate(grid[:, ::-1], axis=1)[:, ::-1].ravel()[:n]
+        block_vals = self.prefix[np.minimum(np.arange(nb) * b + b - 1, n - 1)].copy()
+        del padded, grid
+        self.levels = self._sparse_table(block_vals)
+
+    def _table_query(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        """Extreme over sparse-table items [a, b), b > a."""
+        out = np.empty(len(a), dtype=self.levels[0].dtype)
+        k = _floor_log2(b - a)
+        for kk in np.unique(k):
+            sel = k == kk
+            level = self.levels[kk]
+            out[sel] = self._ufunc(level[a[sel]], level[b[sel] - (1 << int(kk))])
+        return out
+
+    def query(self, i1: np.ndarray, i2: np.ndarray) -> np.ndarray:
+        if self.block == 1:
+            return self._table_query(i1, i2).astype(np.float64)
+
+        b = self.block
+        last = i2 - 1
+        bl = i1 // b
+        br = last // b
+        out = np.empty(len(i1), dtype=np.float64)
+
+        same = bl == br
+        if same.any():
+            out[same] = _window_stat(self.values, i1[same], i2[same], self.op)
+
+        cross = ~same
+        if cross.any():
+            res = self._ufunc(self.suffix[i1[cross]], self.prefix[last[cross]])
+            inner = (br[cross] - bl[cross]) > 1
+            if inner.any():
+                res[inner] = self._ufunc(
+                    res[inner],
+                    self._table_query(bl[cross][inner] + 1, br[cross][inner]),
+                )
+            out[cross] = res
+        return out
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        arrs = {"values": self.values}
+        start = 1 if self.block == 1 else 0  # level 0 is the values themselves
+        for k in range(start, len(self.levels)):
+            arrs[f"level{k}"] = self.levels[k]
+        if self.block > 1:
+            arrs["prefix"] = self.prefix
+            arrs["suffix"] = self.suffix
+        return arrs
+
+    def meta(self) -> dict:
+        return {"op": self.op, "block": self.block, "n_levels": len(self.levels)}
+
+    @classmethod
+    def from_arrays(cls, meta: dict, arrays: dict[str, np.ndarray]) -> RangeExtremum:
+        values = arrays["values"]
+        block = meta["block"]
+        start = 1 if block == 1 else 0
+        levels = ([values] if block == 1 else []) + [
+            arrays[f"level{k}"] for k in range(start, meta["n_levels"])
+        ]
+        state = {
+            "block": block,
+            "levels": levels,
+            "prefix": arrays.get("prefix"),
+            "suffix": arrays.get("suffix"),
+        }
+        return cls(values, meta["op"], _state=state)
+
+    def describe(self) -> str:
+        layout = "sparse table" if self.block == 1 else f"block size {self.block}"
+        return f"range-{self.op} {layout}, {self.nbytes / 2**20:.1f} MiB"
+
+
+class RangeMedian(RangeIndex):
+    """Exact range median in O(log sigma) with a wavelet matrix.
+
+    Values are replaced by their rank among the *sigma* distinct values, and
+    each of the ``ceil(log2(sigma))`` levels stores one bit of every rank as a
+    packed bitvector with per-word popcount prefixes.  A k-th smallest query
+    walks the levels once, so the two middle values of a span cost two walks
+    regardless of span length; they are averaged as ``np.median`` does.
+    """
+
+    kind = "median"
+
+    def __init__(
+        self,
+        values: np.ndarray | None = None,
+        unique: tuple[np.ndarray, np.ndarray] | None = None,
+        _state: dict | None = None,
+    ) -> None:
+        """*unique* is the ``(distinct values, rank of each value)`` pair, as
+        from ``np.unique(values, return_inverse=True)``, when the caller
+        already has it."""
+        if _state is not None:
+            self.distinct = _state["distinct"]
+            self.words = _state["words"]
+            self.counts = _state["counts"]
+            self.zeros = _state["zeros"]
+            return
+
+        self.distinct, ranks = unique if unique is not None else np.unique(values, return_inverse=True)
+        n = len(values)
+        n_bits = max(1, (len(self.distinct) - 1).bit_length())
+        ranks = ranks.astype(np.uint32)
+        count_dtype = np.uint32 if n < 2**32 else np.uint64
+
+        self.words, self.counts = [], []
+        self.zeros = np.empty(n_bits, dtype=np.int64)
+        n_words = n // 64 + 1  # spare word so rank(n) never reads past the end
+        for level in range(n_bits):
+            bits = ((ranks >> np.uint32(n_bits - 1 - level)) & 1).astype(bool)
+            packed = np.zeros(n_words * 8, dtype=np.uint8)
+            packed[: (n + 7) // 8] = np.packbits(bits, bitorder="little")
+            words = packed.view(np.uint64)
+            counts = np.zeros(n_words + 1, dtype=count_dtype)
+            np.cumsum(_popcount64(words), out=counts[1:])
+            self.words.append(words)
+            self.counts.append(counts)
+            self.zeros[level] = n - int(counts[-1])
+            ranks = np.concatenate((ranks[~bits], ranks[bits]))
+
+    @staticmethod
+    def estimate_nbytes(n: int, sigma: int) -> int:
+        """Approximate index size for *n* values with *sigma* distinct ones."""
+        n_bits = max(1, (sigma - 1).bit_length())
+        return n_bits * (n // 64 + 2) * 12 + sigma * 8
+
+    def _rank1(self, level: int, i: np.ndarray) -> np.ndarray:
+        """Set bits among the first *i* positions of *level*."""
+        w = i >> 6
+        below = (np.uint64(1) << (i & 63).astype(np.uint64)) - np.uint64(1)
+        return self.counts[level][w].astype(np.int64) + _popcount64(self.words[level][w] & below)
+
+    def kth(self, i1: np.ndarray, i2: np.ndarray, k: np.ndarray) -> np.ndarray:
+        """k-th smallest (0-based) value in each span ``[i1, i2)``."""
+        lo = i1.astype(np.int64)
+        hi = i2.astype(np.int64)
+        k = k.astype(np.int64)
+        code = np.zeros(len(lo), dtype=np.int64)
+        for level in range(len(self.words)):
+            ones_lo = self._rank1(level, lo)
+            ones_hi = self._rank1(level, hi)
+            zeros_in = (hi - ones_hi) - (lo - ones_lo)
+            right = k >= zeros_in
+            code = (code << 1) | right
+            k = np.where(right, k - zeros_in, k)
+            lo = np.where(right, self.zeros[level] + ones_lo, lo - ones_lo)
+            hi = np.where(right, self.zeros[level] + ones_hi, hi - ones_hi)
+        return self.distinct[code]
+
+    def query(self, i1: np.ndarray, i2: np.ndarray) -> np.ndarray:
+        length = i2 - i1
+        lo = self.kth(i1, i2, (length - 1) // 2).astype(np.float64)
+        hi = self.kth(i1, i2, length // 2).astype(np.float64)
+        return (lo + hi) / 2
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        arrs = {"distinct": self.distinct, "zeros": self.zeros}
+        for level, (words, counts) in enumerate(zip(self.words, self.counts)):
+            arrs[f"words{level}"] = words
+            arrs[f"counts{level}"] = counts
+        return arrs
+
+    def meta(self) -> dict:
+        return {"n_bits": len(self.words)}
+
+    @classmethod
+    def from_arrays(cls, meta: dict, arrays: dict[str, np.ndarray]) -> RangeMedian:
+        n_bits = meta["n_bits"]
+        state = {
+            "distinct": arrays["distinct"],
+            "zeros": arrays["zeros"],
+            "words": [arrays[f"words{level}"] for level in range(n_bits)],
+            "counts": [arrays[f"counts{level}"] for level in range(n_bits)],
+        }
+        return cls(_state=state)
+
+    def describe(self) -> str:
+        return (
+            f"range-median wavelet matrix, {len(self.distinct)} distinct ratios, "
+            f"{self.nbytes / 2**20:.1f} MiB"
+        )
+
+
+INDEX_KINDS: dict[str, type[RangeIndex]] = {
+    cls.kind: cls for cls in (RangeMean, RangeMeanFixed, RangeWindow, RangeExtremum, RangeMedian)
+}
+
+
+def build_range_index(
+    stat: str,
+    ratios: np.ndarray,
+    max_bytes: int = DEFAULT_INDEX_MAX_BYTES,
+    scale: float = 1.0,
+) -> RangeIndex:
+    """Build the index answering *stat* (mean/min/max/median) over *ratios*.
+
+    *scale* is the stored value of a ratio of 1.0 (e.g. 65535 for uint16
+    fixed-point ratios); it is recorded on the index for callers to divide by.
+    """
+    if stat == "mean":
+        if np.issubdtype(ratios.dtype, np.integer):
+            index: RangeIndex = RangeMeanFixed(ratios)
+        else:
+            index = RangeMean(ratios)
+    elif stat in ("min", "max"):
+        # Fall back to scanning spans when no blocked table fits the cap.
+        if RangeExtremum.pick_block(len(ratios), ratios.itemsize, max_bytes) is None:
+            index = RangeWindow(ratios, stat)
+        else:
+            index = RangeExtremum(ratios, stat, max_bytes=max_bytes)
+    elif stat == "median":
+        # Fall back to scanning spans when the wavelet matrix would not fit.
+        # Check the one-level size before sorting anything, and rank the
+        # values only once the index is known to fit.
+        n = len(ratios)
+        distinct = None
+        if RangeMedian.estimate_nbytes(n, 1) <= max_bytes:
+            distinct = np.unique(ratios)
+            if RangeMedian.estimate_nbytes(n, len(distinct)) > max_bytes:
+                distinct = None
+        if distinct is None:
+            index = RangeWindow(ratios, "median")
+        else:
+            ranks = np.searchsorted(distinct, ratios)
+            index = RangeMedian(ratios, unique=(distinct, ranks))
+    else:
+        raise ValueError(f"Unknown stat mode: {stat}")
+    index.scale = scale
+    return index
+
+
+# ── Shipping indexes to worker processes ─────────────────────────────────────
+
+
+@dataclass
+class IndexSpec:
+    """Location of a saved index: its kind, parameters and array files."""
+
+    kind: str
+    meta: dict = field(default_factory=dict)
+    paths: dict[str, str] = field(default_factory=dict)
+    scale: float = 1.0
+
+
+def index_save(index: RangeIndex, directory: str) -> IndexSpec:
+    """Write each index array to ``<directory>/<name>.npy``."""
+    paths = {}
+    for name, arr in index.arrays().items():
+        path = os.path.join(directory, f"{index.kind}.{name}.npy")
+        np.save(path, arr)
+        paths[name] = path
+    return IndexSpec(kind=index.kind, meta=index.meta(), paths=paths, scale=index.scale)
+
+
+def index_load(spec: IndexSpec) -> RangeIndex:
+    """Re-open a saved index with its arrays memory-mapped read-only."""
+    arrays = {name: np.load(path, mmap_mode="r") for name, path in spec.paths.items()}
+    index = INDEX_KINDS[spec.kind].from_arrays(spec.meta, arrays)
+    index.scale = spec.scale
+    return index
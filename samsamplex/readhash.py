@@ -0,0 +1,22 @@
+"""Deterministic per-read hash fractions used for keep/drop decisions."""
+
+from __future__ import annotations
+
+import numpy as np
+import xxhash
+
+UINT32_MAX = 0xFFFFFFFF
+
+
+def xxh32_fraction(qname: str, seed: int) -> float:
+    """Hash a read name to a float in [0, 1)."""
+    h = xxhash.xxh32(qname.encode(), seed=seed).intdigest()
+    return h / UINT32_MAX
+
+
+def xxh32_fractions(qnames: list[bytes], seed: int) -> np.ndarray:
+    """Vectorised :func:`xxh32_fraction` over encoded read names."""
+    hashes = np.fromiter(
+        (xxhash.xxh32_intdigest(q, seed) for q in qnames), dtype=np.float64, count=len(qnames),
+    )
+    return hashes / UINT32_MAX
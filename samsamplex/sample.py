@@ -5,83 +5,363 @@ from __future__ import annotations
 import os
 import sys
 import tempfile
-from typing import Sequence
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Callable, Sequence
 
 import numpy as np
 import pysam
-import xxhash
 
-from .bed import bed_combine_depths, bed_read_depths
-from .depth import DepthArray, depth_from_bam, region_parse, resolve_contig_name
+from .bamio import bam_finalize, header_mark_sorted
+from .bed import bed_combine_stream, bed_read_template
+from .cache import open_depth_cache
+from .combine import provenance_mismatch, template_provenance
+from .depth import (
+    READ_FILTER_FLAGS,
+    DepthAccumulator,
+    DepthArray,
+    RunLengthDepthArray,
+    depth_dense,
+    depth_from_bam,
+    depth_from_bams,
+    region_parse,
+    resolve_contig_name,
+)
+from .library import library_combine, library_open
 from .metrics import metrics_calculate, metrics_print
-
-UINT32_MAX = 0xFFFFFFFF
+from .rangeq import (
+    DEFAULT_INDEX_MAX_BYTES,
+    IndexSpec,
+    RangeIndex,
+    build_range_index,
+    index_load,
+    index_save,
+)
+from .readhash import xxh32_fractions
 
 VALID_STAT_MODES = ("mean", "min", "max", "median")
 VALID_COMBINE_MODES = ("min", "max", "mean", "random")
 
+# Reads per keep/drop decision batch.
+BATCH_SIZE = 100_000
+
+# Fixed-point scale of compact ratios: uint16 value 65535 is a ratio of 1.0.
+RATIO_SCALE = 65535
 
-def _xxh32_fraction(qname: str, seed: int) -> float:
-    """Hash a read name to a float in [0, 1)."""
-    h = xxhash.xxh32(qname.encode(), seed=seed).intdigest()
-    return h / UINT32_MAX
+# Positions per chunk when computing ratios (bounds float64 temporaries).
+RATIO_CHUNK = 1 << 22
 
 
 # ── Ratio helpers ────────────────────────────────────────────────────────────
 
 
-def _compute_ratios(template: DepthArray, source: DepthArray) -> np.ndarray:
-    """ratio[i] = min(1.0, template[i] / source[i]), 0 where source is 0."""
-    with np.errstate(divide="ignore", invalid="ignore"):
-        ratios = np.where(
-            source.depths == 0,
-            0.0,
-            np.minimum(1.0, template.depths.astype(np.float64) / source.depths.astype(np.float64)),
-        )
+def _compute_ratios(
+    template: DepthArray | RunLengthDepthArray,
+    source: DepthArray,
+    compact: bool = False,
+    scale: float = 1.0,
+) -> np.ndarray:
+    """ratio[i] = min(1.0, template[i] / source[i]), 0 where source is 0.
+
+    Computed in chunks of RATIO_CHUNK positions so float64 temporaries stay
+    small.  With *compact*, ratios are returned as uint16 fixed point
+    (``round(ratio * RATIO_SCALE)``), within 0.5 / RATIO_SCALE of the float64
+    value; ratios of exactly 0 and 1 are kept exact.  A run-length template
+    is expanded one chunk at a time, never to its full length.  A *scale*
+    other than 1 multiplies the template depth inside each chunk.
+    """
+    n = len(source.depths)
+    runs = isinstance(template, RunLengthDepthArray)
+    ratios = np.empty(n, dtype=np.uint16 if compact else np.float64)
+    for lo in range(0, n, RATIO_CHUNK):
+        hi = min(lo + RATIO_CHUNK, n)
+        src = source.depths[lo:hi]
+        tpl = template.slice_dense(lo, hi) if runs else template.depths[lo:hi]
+        tpl = tpl.astype(np.float64)
+        if scale != 1.0:
+            tpl *= scale
+        with np.errstate(divide="ignore", invalid="ignore"):
+            chunk = np.where(src == 0, 0.0, np.minimum(1.0, tpl / src.astype(np.float64)))
+        ratios[lo:hi] = np.rint(chunk * RATIO_SCALE) if compact else chunk
     return ratios
 
 
-def _get_mean_ratio(
-    cumsum: np.ndarray, region_start: int, region_end: int, read_start: int, read_end: int,
-) -> float:
-    """O(1) mean ratio over a read span using the precomputed cumulative sum."""
-    cs = max(read_start, region_start)
-    ce = min(read_end, region_end)
-    if cs >= ce:
-        return 0.0
-    i1 = cs - region_start
-    i2 = ce - region_start
-    return float(cumsum[i2] - cumsum[i1]) / (ce - cs)
-
-
-def _get_min_ratio(
-    ratios: np.ndarray, region_start: int, region_end: int, read_start: int, read_end: int,
-) -> float:
-    cs = max(read_start, region_start)
-    ce = min(read_end, region_end)
-    if cs >= ce:
-        return 0.0
-    return float(ratios[cs - region_start : ce - region_start].min())
-
-
-def _get_max_ratio(
-    ratios: np.ndarray, region_start: int, region_end: int, read_start: int, read_end: int,
-) -> float:
-    cs = max(read_start, region_start)
-    ce = min(read_end, region_end)
-    if cs >= ce:
-        return 0.0
-    return float(ratios[cs - region_start : ce - region_start].max())
-
-
-def _get_median_ratio(
-    ratios: np.ndarray, region_start: int, region_end: int, read_start: int, read_end: int,
-) -> float:
-    cs = max(read_start, region_start)
-    ce = min(read_end, region_end)
-    if cs >= ce:
-        return 0.0
-    return float(np.median(ratios[cs - region_start : ce - region_start]))
+# ── Batched ratio lookup ─────────────────────────────────────────────────────
+
+
+def _batch_ratios(
+    index: RangeIndex,
+    region_start: int,
+    region_end: int,
+    read_starts: np.ndarray,
+    read_ends: np.ndarray,
+) -> np.ndarray:
+    """Per-read ratio summaries for a batch of spans; 0.0 outside the region.
+
+    Each read's span is clipped to the region and answered by a range index
+    built for the chosen stat (rescaled for fixed-point ratios).
+    """
+    cs = np.maximum(read_starts, region_start)
+    ce = np.minimum(read_ends, region_end)
+    valid = cs < ce
+
+    out = np.zeros(len(read_starts), dtype=np.float64)
+    if valid.any():
+        out[valid] = index.query(cs[valid] - region_start, ce[valid] - region_start)
+        if index.scale != 1.0:
+            out /= index.scale
+    return out
+
+
+def _record_spans(starts: array, ends: array, read: pysam.AlignedSegment, cigar_aware: bool) -> None:
+    """Append a written read's covered span(s) for output-depth accumulation."""
+    r_end = read.reference_end
+    if r_end is None:
+        return
+    if cigar_aware:
+        for b_start, b_end in read.get_blocks():
+            starts.append(b_start)
+            ends.append(b_end)
+    else:
+        starts.append(read.reference_start)
+        ends.append(r_end)
+
+
+# ── Shards ───────────────────────────────────────────────────────────────────
+
+
+@dataclass
+class _ShardTask:
+    """One slice of the sampling loop: reads *starting* in [start, end).
+
+    The ratio index is passed either directly (in-process) or as an
+    IndexSpec that a worker process re-opens memory-mapped.
+    """
+
+    source_bam: str
+    contig: str
+    region_start: int
+    region_end: int
+    start: int
+    end: int
+    seeds: list[int]
+    out_paths: list[str]
+    uniform_fraction: float | None = None
+    index: RangeIndex | IndexSpec | None = None
+    cigar_aware: bool = False
+    record_spans: bool = False
+    log_progress: bool = False
+
+
+@dataclass
+class _ShardResult:
+    total: int
+    kept: list[int]
+    spans: list[tuple[np.ndarray, np.ndarray]] | None
+
+
+def _open_index(index: RangeIndex | IndexSpec | None) -> RangeIndex | None:
+    return index_load(index) if isinstance(index, IndexSpec) else index
+
+
+def _decide_batch(
+    task: _ShardTask,
+    index: RangeIndex | None,
+    reads: list[pysam.AlignedSegment],
+) -> np.ndarray:
+    """Keep mask of shape (len(reads), len(seeds)) for one batch of reads."""
+    if task.uniform_fraction is not None:
+        read_ratios = task.uniform_fraction
+    else:
+        starts = np.fromiter((r.reference_start for r in reads), dtype=np.int64, count=len(reads))
+        ends = np.fromiter(
+            (r.reference_end if r.reference_end is not None else r.reference_start for r in reads),
+            dtype=np.int64,
+            count=len(reads),
+        )
+        read_ratios = _batch_ratios(index, task.region_start, task.region_end, starts, ends)
+
+    qnames = [r.query_name.encode() for r in reads]
+    keep = np.empty((len(reads), len(task.seeds)), dtype=bool)
+    for i, s in enumerate(task.seeds):
+        keep[:, i] = xxh32_fractions(qnames, s) < read_ratios
+    return keep
+
+
+def _sample_shard(task: _ShardTask) -> _ShardResult:
+    """Hash, look up ratios for and write every read owned by one shard.
+
+    A read is owned by the shard containing its start (clipped to the
+    region), so a read overlapping a shard boundary is fetched by both
+    shards but written exactly once.  Reads are decided in batches of
+    BATCH_SIZE (vectorised hashing fractions and span ratios), then the
+    kept records of the batch are written in their original order.
+    """
+    log = lambda msg: print(msg, file=sys.stderr)
+
+    index = _open_index(task.index)
+
+    seeds = task.seeds
+    owns_leading = task.start == task.region_start
+    total_reads = 0
+    kept_reads = [0] * len(seeds)
+    spans = [(array("q"), array("q")) for _ in seeds] if task.record_spans else None
+    next_report = 1_000_000
+
+    with pysam.AlignmentFile(task.source_bam, "rb") as src:
+        out_header = header_mark_sorted(src.header)
+        outs = [pysam.AlignmentFile(p, "wb", header=out_header) for p in task.out_paths]
+
+        def _flush(batch: list[pysam.AlignedSegment]) -> None:
+            keep = _decide_batch(task, index, batch)
+            for j in np.flatnonzero(keep.any(axis=1)):
+                read = batch[j]
+                counted = spans is not None and not read.flag & READ_FILTER_FLAGS
+                for i in np.flatnonzero(keep[j]):
+                    outs[i].write(read)
+                    if counted:
+                        _record_spans(*spans[i], read, task.cigar_aware)
+            for i, n in enumerate(keep.sum(axis=0)):
+                kept_reads[i] += int(n)
+
+        try:
+            batch = []
+            for read in src.fetch(task.contig, task.start, task.end):
+                if read.is_unmapped:
+                    continue
+                if read.reference_start < task.start and not owns_leading:
+                    continue
+
+                batch.append(read)
+                if len(batch) < BATCH_SIZE:
+                    continue
+
+                _flush(batch)
+                total_reads += len(batch)
+                batch = []
+
+                if task.log_progress and total_reads >= next_report:
+                    next_report += 1_000_000
+                    pct = 100.0 * kept_reads[0] / total_reads
+                    log(f"[sample]   Processed {total_reads} reads, kept {kept_reads[0]} ({pct:.1f}%)")
+
+            if batch:
+                _flush(batch)
+                total_reads += len(batch)
+        finally:
+            for out in outs:
+                out.close()
+
+    return _ShardResult(
+        total=total_reads,
+        kept=kept_reads,
+        spans=None if spans is None else [
+            (np.frombuffer(st, dtype=np.int64), np.frombuffer(en, dtype=np.int64))
+            for st, en in spans
+        ],
+    )
+
+
+def _shard_bounds(
+    start: int, end: int, n_shards: int, weights: np.ndarray | None = None,
+) -> list[tuple[int, int]]:
+    """Split [start, end) into *n_shards* contiguous shards.
+
+    With per-position *weights* (source depth, i.e. read count times read
+    length) the cut points fall at equal quantiles of the cumulative weight,
+    so shards hold roughly equal numbers of reads; otherwise shards have
+    equal length.
+    """
+    if weights is not None and len(weights) and weights.sum() > 0:
+        cum = np.cumsum(weights, dtype=np.float64)
+        targets = cum[-1] * np.arange(1, n_shards) / n_shards
+        cuts = start + np.searchsorted(cum, targets, side="right")
+    else:
+        cuts = np.linspace(start, end, n_shards + 1)[1:-1].astype(np.int64)
+    bounds = [start, *sorted(set(int(c) for c in cuts if start < c < end)), end]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _sample_sharded(
+    task: _ShardTask,
+    threads: int,
+    weights: np.ndarray | None,
+    log: Callable[[str], None],
+) -> list[_ShardResult]:
+    """Run the sampling loop over read-balanced shards in a process pool.
+
+    Each worker writes one BAM per seed for its shard; shards are then
+    concatenated in coordinate order, so the final files need no re-sort.
+    """
+    bounds = _shard_bounds(task.region_start, task.region_end, threads, weights)
+    log(f"[sample] Sampling {len(bounds)} shard(s) with {threads} worker(s)...")
+
+    out_dir = os.path.dirname(os.path.abspath(task.out_paths[0]))
+    with tempfile.TemporaryDirectory(prefix=".samsamplex-shards-", dir=out_dir) as tmp:
+        spec = index_save(task.index, tmp) if task.index is not None else None
+
+        tasks = [
+            replace(
+                task,
+                start=a,
+                end=b,
+                out_paths=[
+                    os.path.join(tmp, f"shard{k}.seed{s}.bam") for s in task.seeds
+                ],
+                index=spec,
+                log_progress=False,
+            )
+            for k, (a, b) in enumerate(bounds)
+        ]
+
+        with ProcessPoolExecutor(max_workers=min(threads, len(tasks))) as pool:
+            results = list(pool.map(_sample_shard, tasks))
+
+        for i, path in enumerate(task.out_paths):
+            shard_bams = [t.out_paths[i] for t in tasks]
+            if len(shard_bams) == 1:
+                os.replace(shard_bams[0], path)
+            else:
+                pysam.cat("-o", path, *shard_bams)
+
+    return results
+
+
+# ── Replicates ───────────────────────────────────────────────────────────────
+
+
+def _peak_rss_report(workers: bool = False) -> str:
+    """Peak resident set size of this process (and of shard *workers*)."""
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return "unavailable"
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    unit = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit / 2**20
+    report = f"{own:.1f} MiB"
+    if workers:
+        largest = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit / 2**20
+        report += f" (largest worker {largest:.1f} MiB)"
+    return report
+
+
+def replicate_out_path(out_bam: str, seed: int, n_seeds: int) -> str:
+    """Output path for the replicate sampled with *seed*.
+
+    A ``{seed}`` placeholder in *out_bam* is filled in; otherwise, when more
+    than one seed is requested, ``.seed<N>`` is inserted before the ``.bam``
+    suffix (``out.bam`` → ``out.seed43.bam``).  A single seed keeps *out_bam*.
+    """
+    if "{seed}" in out_bam:
+        return out_bam.replace("{seed}", str(seed))
+    if n_seeds == 1:
+        return out_bam
+    stem, dot, suffix = out_bam.rpartition(".")
+    if not dot or suffix != "bam":
+        return f"{out_bam}.seed{seed}"
+    return f"{stem}.seed{seed}.bam"
 
 
 # ── Main sampling routine ───────────────────────────────────────────────────
@@ -98,22 +378,68 @@ def sample_run(
     no_sort: bool = False,
     no_metrics: bool = False,
     uniform_fraction: float | None = None,
+    depth_engine: str = "events",
+    cigar_aware: bool = False,
+    threads: int = 1,
+    cache_dir: str | None = None,
+    seeds: Sequence[int] | None = None,
+    index_max_bytes: int = DEFAULT_INDEX_MAX_BYTES,
+    compact_ratios: bool = False,
+    random_scheme: str = "legacy",
+    template_library: str | None = None,
+    select: Sequence[str] | None = None,
+    precombined: str | None = None,
+    template_bams: Sequence[str] = (),
+    target_depth: int | None = None,
+    template_scale: float = 1.0,
 ) -> int:
-    """Run the sample subcommand. Returns 0 on success."""
+    """Run the sample subcommand. Returns 0 on success.
+
+    The template comes from exactly one of *target_depth*, *template_bams*,
+    *template_library* or *template_beds* (optionally *precombined*), and
+    one output BAM is written per entry of *seeds* from a single pass.
+    """
     log = lambda msg: print(msg, file=sys.stderr)
 
+    if not seeds:
+        seeds = [seed]
+    out_paths = [replicate_out_path(out_bam, s, len(seeds)) for s in seeds]
+
     log(f"[sample] Source BAM: {source_bam}")
     if uniform_fraction is not None:
         log(f"[sample] Uniform fraction: {uniform_fraction}")
+    elif target_depth is not None:
+        log(f"[sample] Target depth: {target_depth}")
+    elif template_bams:
+        log(f"[sample] Template BAMs: {len(template_bams)} file(s)")
+        for i, b in enumerate(template_bams):
+            log(f"[sample]   {i + 1}: {b}")
+    elif template_library is not None:
+        log(f"[sample] Template library: {template_library}")
+        if select:
+            log(f"[sample] Selected templates: {', '.join(select)}")
     else:
         log(f"[sample] Template BEDs: {len(template_beds)} file(s)")
         for i, b in enumerate(template_beds):
             log(f"[sample]   {i + 1}: {b}")
+    if uniform_fraction is None:
         log(f"[sample] Stat: {stat}")
         log(f"[sample] Mode: {mode}")
+        n_templates = len(template_beds) + len(template_bams)
+        if mode == "random" and (n_templates > 1 or template_library is not None):
+            log(f"[sample] Random scheme: {random_scheme}")
+        if template_scale != 1.0:
+            log(f"[sample] Template scale: {template_scale}")
+        if compact_ratios:
+            log(f"[sample] Ratios: uint16 fixed point (1/{RATIO_SCALE} steps)")
     log(f"[sample] Region: {region_str}")
-    log(f"[sample] Seed: {seed}")
-    log(f"[sample] Output BAM: {out_bam}")
+    if len(seeds) == 1:
+        log(f"[sample] Seed: {seeds[0]}")
+        log(f"[sample] Output BAM: {out_paths[0]}")
+    else:
+        log(f"[sample] Replicates: {len(seeds)}")
+        for s, p in zip(seeds, out_paths):
+            log(f"[sample]   seed {s}: {p}")
 
     region = region_parse(region_str)
 
@@ -132,99 +458,176 @@ def sample_run(
 
     log(f"[sample] Parsed region: {region.contig}:{region.start}-{region.end}")
 
+    index: RangeIndex | None = None
     if uniform_fraction is None:
-        if not template_beds:
-            log("Error: Template BED(s) required when not using --uniform")
+        if (
+            not template_beds and not template_bams
+            and template_library is None and target_depth is None
+        ):
+            log("Error: Template BED(s) or BAM(s) required when not using --uniform")
+            return 1
+        if stat not in VALID_STAT_MODES:
+            log(f"Error: Unknown stat mode '{stat}'")
             return 1
 
-        # Load template depth(s)
-        log("[sample] Loading template BED file(s)...")
-        template_arrays = [
-            bed_read_depths(bp, region.contig, region.start, region.end)
-            for bp in template_beds
-        ]
+        cache = open_depth_cache(cache_dir)
 
-        if len(template_arrays) == 1:
-            template_depth = template_arrays[0]
+        # Load template depth(s)
+        if target_depth is not None:
+            template_depth = DepthArray(
+                contig=region.contig, start=region.start, end=region.end,
+                depths=np.broadcast_to(np.int32(target_depth), (region.end - region.start,)),
+            )
+        elif template_bams:
+            log("[sample] Computing template depth array(s)...")
+            template_arrays = depth_from_bams(
+                template_bams, region.contig, region.start, region.end,
+                engine=depth_engine, cigar_aware=cigar_aware, threads=threads, cache=cache,
+            )
+            try:
+                if len(template_bams) == 1:
+                    template_depth = next(template_arrays)
+                else:
+                    log(f"[sample] Combining {len(template_bams)} templates using '{mode}' mode...")
+                    template_depth = bed_combine_stream(
+                        template_arrays, mode=mode, seed=seed, scheme=random_scheme,
+                    )
+            except ValueError as e:
+                log(f"Error: {e}")
+                return 1
+        elif template_library is not None:
+            try:
+                library = library_open(template_library)
+                rows = library.rows(select)
+            except ValueError as e:
+                log(f"Error: {e}")
+                return 1
+            log(
+                f"[sample] Combining {len(rows)} of {len(library.samples)} library "
+                f"templates using '{mode}' mode..."
+            )
+            template_depth = library_combine(
+                library, region.contig, region.start, region.end, rows,
+                mode=mode, seed=seed, scheme=random_scheme,
+            )
         else:
-            log(f"[sample] Combining {len(template_arrays)} templates using '{mode}' mode...")
-            template_depth = bed_combine_depths(template_arrays, mode=mode, seed=seed)
+            log("[sample] Loading template BED file(s)...")
+            # Loaded lazily, so only one template is in memory while combining
+            template_arrays = (
+                bed_read_template(bp, region.contig, region.start, region.end)
+                for bp in template_beds
+            )
+            use_precombined = False
+            if precombined is not None and len(template_beds) == 1:
+                log(f"[sample] Not using pre-combined template {precombined}: only one template")
+            elif precombined is not None:
+                try:
+                    reason = provenance_mismatch(
+                        template_provenance(precombined), template_beds, mode, seed, random_scheme,
+                        region.contig, region.start, region.end,
+                    )
+                except (OSError, ValueError, KeyError) as e:
+                    reason = f"unreadable provenance ({e})"
+                use_precombined = reason is None
+                if use_precombined:
+                    log(f"[sample] Using pre-combined template: {precombined}")
+                else:
+                    log(f"[sample] Not using pre-combined template {precombined}: {reason}")
+            if use_precombined:
+                template_depth = bed_read_template(precombined, region.contig, region.start, region.end)
+            elif len(template_beds) == 1:
+                template_depth = next(template_arrays)
+            else:
+                log(f"[sample] Combining {len(template_beds)} templates using '{mode}' mode...")
+                template_depth = bed_combine_stream(
+                    template_arrays, mode=mode, seed=seed, scheme=random_scheme,
+                )
+        if isinstance(template_depth, RunLengthDepthArray):
+            log(
+                f"[sample] Template: {template_depth.n_runs} runs over "
+                f"{template_depth.length} positions"
+            )
 
         # Compute source depth
         log("[sample] Computing source depth array...")
-        source_depth = depth_from_bam(source_bam, region.contig, region.start, region.end)
+        source_depth = depth_from_bam(
+            source_bam, region.contig, region.start, region.end,
+            engine=depth_engine, cigar_aware=cigar_aware, threads=threads,
+            cache=cache,
+        )
 
         # Compute ratios
         log("[sample] Computing sampling ratios...")
-        ratios = _compute_ratios(template_depth, source_depth)
-
-        # Precompute cumulative sum (used by mean stat mode, always needed for default)
-        cumsum = np.concatenate(([0.0], np.cumsum(ratios)))
-
-        # Choose ratio-lookup function based on stat mode
-        if stat == "mean":
-            get_ratio = lambda rs, re: _get_mean_ratio(cumsum, region.start, region.end, rs, re)
-        elif stat == "min":
-            get_ratio = lambda rs, re: _get_min_ratio(ratios, region.start, region.end, rs, re)
-        elif stat == "max":
-            get_ratio = lambda rs, re: _get_max_ratio(ratios, region.start, region.end, rs, re)
-        elif stat == "median":
-            get_ratio = lambda rs, re: _get_median_ratio(ratios, region.start, region.end, rs, re)
-        else:
-            log(f"Error: Unknown stat mode '{stat}'")
-            return 1
+        ratios = _compute_ratios(
+            template_depth, source_depth, compact=compact_ratios, scale=template_scale,
+        )
+
+        # Range index answering the per-read stat (prefix sum for mean,
+        # sparse table for min/max, wavelet matrix for median)
+        index = build_range_index(
+            stat,
+            ratios,
+            max_bytes=index_max_bytes,
+            scale=RATIO_SCALE if compact_ratios else 1.0,
+        )
+        log(f"[sample] Ratio index: {index.describe()}")
 
     # Sampling loop
     log("[sample] Sampling reads...")
-    total_reads = 0
-    kept_reads = 0
-
-    with pysam.AlignmentFile(source_bam, "rb") as src:
-        with pysam.AlignmentFile(out_bam, "wb", header=src.header) as out:
-            for read in src.fetch(region.contig, region.start, region.end):
-                if read.is_unmapped:
-                    continue
-
-                total_reads += 1
-
-                hash_frac = _xxh32_fraction(read.query_name, seed)
-                if uniform_fraction is not None:
-                    read_ratio = uniform_fraction
-                else:
-                    read_ratio = get_ratio(read.reference_start, read.reference_end)
-
-                if hash_frac < read_ratio:
-                    out.write(read)
-                    kept_reads += 1
-
-                if total_reads % 1_000_000 == 0:
-                    pct = 100.0 * kept_reads / total_reads
-                    log(f"[sample]   Processed {total_reads} reads, kept {kept_reads} ({pct:.1f}%)")
-
-    pct = 100.0 * kept_reads / total_reads if total_reads else 0.0
-    log(f"[sample] Processed {total_reads} reads, kept {kept_reads} ({pct:.1f}%)")
-
-    # Sort and index
-    if not no_sort:
-        log("[sample] Sorting output BAM...")
-        tmp_sorted = out_bam + ".tmp.sorted.bam"
-        try:
-            pysam.sort("-o", tmp_sorted, out_bam)
-            os.replace(tmp_sorted, out_bam)
-            pysam.index(out_bam)
-            log("[sample] Sorting and indexing complete.")
-        except Exception as exc:
-            log(f"Warning: Failed to sort/index output BAM: {exc}")
-
-    # Metrics (skip in uniform mode; no template to compare)
-    if not no_metrics and uniform_fraction is None:
-        log("[sample] Computing metrics...")
-        try:
-            output_depth = depth_from_bam(out_bam, region.contig, region.start, region.end)
-            result = metrics_calculate(template_depth, output_depth)
+    want_metrics = not no_metrics and uniform_fraction is None
+    task = _ShardTask(
+        source_bam=source_bam,
+        contig=region.contig,
+        region_start=region.start,
+        region_end=region.end,
+        start=region.start,
+        end=region.end,
+        seeds=list(seeds),
+        out_paths=out_paths,
+        uniform_fraction=uniform_fraction,
+        index=index,
+        cigar_aware=cigar_aware,
+        record_spans=want_metrics,
+        log_progress=True,
+    )
+
+    if threads > 1:
+        weights = source_depth.depths if uniform_fraction is None else None
+        results = _sample_sharded(task, threads, weights, log)
+    else:
+        results = [_sample_shard(task)]
+
+    total_reads = sum(r.total for r in results)
+    kept_reads = [sum(r.kept[i] for r in results) for i in range(len(seeds))]
+
+    for s, kept in zip(seeds, kept_reads):
+        pct = 100.0 * kept / total_reads if total_reads else 0.0
+        label = "" if len(seeds) == 1 else f" [seed {s}]"
+        log(f"[sample] Processed {total_reads} reads, kept {kept} ({pct:.1f}%){label}")
+
+    for i, path in enumerate(out_paths):
+        # Index (reads were fetched, and shards concatenated, in coordinate order)
+        if not no_sort:
+            bam_finalize(path, presorted=True, log=log, tag="sample")
+
+        # Metrics (skip in uniform mode; no template to compare)
+        if want_metrics:
+            log(f"[sample] Computing metrics for {path}...")
+            acc = DepthAccumulator(region.start, region.end)
+            for r in results:
+                acc.add_many(*r.spans[i])
+            output_depth = DepthArray(
+                contig=region.contig, start=region.start, end=region.end, depths=acc.depths(),
+            )
+            target = depth_dense(template_depth)
+            if template_scale != 1.0:
+                target = DepthArray(
+                    contig=target.contig, start=target.start, end=target.end,
+                    depths=target.depths * template_scale,
+                )
+            result = metrics_calculate(target, output_depth)
             metrics_print(result, label_a="Template", label_b="Output")
-        except Exception as exc:
-            log(f"Warning: Could not compute metrics: {exc}")
 
-    log(f"[sample] Done. Output written to: {out_bam}")
+    log(f"[sample] Peak RSS: {_peak_rss_report(workers=threads > 1)}")
+    log(f"[sample] Done. Output written to: {', '.join(out_paths)}")
     return 0
@@ -0,0 +1,275 @@
+"""Binary depth templates (``.ssxd``): per-contig raw or run-length blocks.
+
+Layout (all integers little-endian)::
+
+    magic     4 bytes   b"SSXD"
+    version   uint32
+    hlen      uint64    length of the JSON header
+    header    hlen bytes of UTF-8 JSON
+    padding   to a multiple of DATA_ALIGN
+    data      one block per contig
+
+The header records the depth dtype, the collapse level the template was
+written with, optional free-form metadata (e.g. combine provenance), and per
+contig its name, covered range ``[start, end)``,
+encoding and block offset (relative to the start of the data section).  A
+``raw`` block holds ``end - start`` depth values; an ``rle`` block holds
+``n_runs`` int64 run starts (relative to ``start``) followed by ``n_runs``
+depth values.  Blocks are read with :class:`numpy.memmap`, so a region inside
+a raw block is returned without copying.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import struct
+import tempfile
+from dataclasses import asdict, dataclass, field
+from typing import Iterable, Iterator, TextIO
+
+import numpy as np
+
+from .bed import collapse_starts, find_contig, write_bed_intervals, write_bed_output
+from .depth import DepthArray, RunLengthDepthArray
+
+SSXD_MAGIC = b"SSXD"
+SSXD_VERSION = 1
+SSXD_DTYPE = "<i4"
+
+# Data section (and every block) starts on a multiple of this many bytes.
+DATA_ALIGN = 64
+
+VALID_ENCODINGS = ("auto", "raw", "rle")
+
+_PREAMBLE = struct.Struct("<4sIQ")
+
+_COPY_BLOCK = 1 << 20
+
+
+@dataclass
+class SsxdContig:
+    """Header entry for one contig block."""
+
+    name: str
+    start: int
+    end: int
+    encoding: str
+    offset: int
+    n_runs: int = 0
+
+    @property
+    def length(self) -> int:
+        return self.end - self.start
+
+
+@dataclass
+class SsxdHeader:
+    """Parsed ``.ssxd`` header plus the absolute offset of the data section."""
+
+    dtype: str
+    collapse: int
+    contigs: list[SsxdContig]
+    data_offset: int
+    meta: dict = field(default_factory=dict)
+
+    def find(self, contig: str) -> SsxdContig | None:
+        """First contig entry matching *contig* (``chr`` prefix ignored)."""
+        return find_contig(self.contigs, contig)
+
+
+def _align(n: int) -> int:
+    return -(-n // DATA_ALIGN) * DATA_ALIGN
+
+
+# ── Writing ──────────────────────────────────────────────────────────────────
+
+
+def _encode(arr: DepthArray, collapse: int, encoding: str) -> tuple[str, list[np.ndarray]]:
+    """Pick the block encoding for one contig and return its arrays."""
+    depths = np.asarray(arr.depths, dtype=SSXD_DTYPE)
+    if not len(depths):
+        return "raw", [depths]
+    if collapse > 0:
+        starts = collapse_starts(depths, collapse)
+    elif encoding != "raw":
+        starts = np.concatenate(([0], np.flatnonzero(depths[1:] != depths[:-1]) + 1)).astype(np.int64)
+    if collapse > 0 or encoding == "rle" or (
+        encoding == "auto" and len(starts) * (8 + depths.itemsize) < depths.nbytes
+    ):
+        return "rle", [starts.astype("<i8"), depths[starts]]
+    return "raw", [depths]
+
+
+def ssxd_write(
+    path: str,
+    arrays: Iterable[DepthArray],
+    collapse: int = 0,
+    encoding: str = "auto",
+    meta: dict | None = None,
+) -> None:
+    """Write depth arrays (one per contig) to a ``.ssxd`` template.
+
+    With *collapse* > 0 each contig is stored as the collapsed intervals
+    :func:`samsamplex.bed.write_bed_output` would write.  Otherwise
+    *encoding* ``"auto"`` stores runs of equal depth when that is smaller
+    than the raw values.  *meta* is stored in the header as-is (JSON).
+
+    *arrays* may be a generator: each block is encoded and spooled to a
+    temporary file as it arrives, so only one contig is in memory at a
+    time, and copied behind the header once all offsets are known.
+    """
+    if encoding not in VALID_ENCODINGS:
+        raise ValueError(f"Unknown ssxd encoding: {encoding}")
+
+    entries = []
+    offset = 0
+    with tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(path))) as data:
+        for arr in arrays:
+            kind, parts = _encode(arr, collapse, encoding)
+            n_runs = len(parts[0]) if kind == "rle" else 0
+            entries.append(SsxdContig(arr.contig, arr.start, arr.end, kind, offset, n_runs))
+            for part in parts:
+                data.seek(offset)
+                part.tofile(data)
+                offset = _align(offset + part.nbytes)
+
+        header = json.dumps({
+            "dtype": SSXD_DTYPE,
+            "collapse": collapse,
+            "contigs": [asdict(e) for e in entries],
+            "meta": meta or {},
+        }).encode()
+        data_offset = _align(_PREAMBLE.size + len(header))
+
+        with open(path, "wb") as fp:
+            fp.write(_PREAMBLE.pack(SSXD_MAGIC, SSXD_VERSION, len(header)))
+            fp.write(header)
+            fp.seek(data_offset)
+            data.seek(0)
+            shutil.copyfileobj(data, fp, _COPY_BLOCK)
+            fp.truncate(data_offset + offset)
+
+
+# ── Reading ──────────────────────────────────────────────────────────────────
+
+
+def ssxd_read_header(path: str) -> SsxdHeader:
+    """Read and validate the header of a ``.ssxd`` file."""
+    with open(path, "rb") as fp:
+        preamble = fp.read(_PREAMBLE.size)
+        if len(preamble) < _PREAMBLE.size:
+            raise ValueError(f"Not an ssxd template (truncated): {path}")
+        magic, version, hlen = _PREAMBLE.unpack(preamble)
+        if magic != SSXD_MAGIC:
+            raise ValueError(f"Not an ssxd template (bad magic): {path}")
+        if version != SSXD_VERSION:
+            raise ValueError(f"Unsupported ssxd version {version}: {path}")
+        meta = json.loads(fp.read(hlen))
+
+    return SsxdHeader(
+        dtype=meta["dtype"],
+        collapse=meta["collapse"],
+        contigs=[SsxdContig(**c) for c in meta["contigs"]],
+        data_offset=_align(_PREAMBLE.size + hlen),
+        meta=meta.get("meta", {}),
+    )
+
+
+def _block(path: str, header: SsxdHeader, entry: SsxdContig) -> tuple[np.ndarray, ...]:
+    """Memory-mapped arrays of one contig block: (depths,) or (run starts, values)."""
+    base = header.data_offset + entry.offset
+    if entry.encoding == "raw":
+        if not entry.length:
+            return (np.zeros(0, dtype=header.dtype),)
+        return (np.memmap(path, dtype=header.dtype, mode="r", offset=base, shape=(entry.length,)),)
+    starts = np.memmap(path, dtype="<i8", mode="r", offset=base, shape=(entry.n_runs,))
+    values = np.memmap(
+        path, dtype=header.dtype, mode="r", offset=base + _align(entry.n_runs * 8), shape=(entry.n_runs,),
+    )
+    return starts, values
+
+
+def ssxd_read_depths(path: str, contig: str, region_start: int, region_end: int) -> DepthArray:
+    """Depths for a region from a ``.ssxd`` template; 0 where not covered.
+
+    A region lying inside a raw block is returned as a read-only memmap
+    view (no copy); otherwise the overlap is copied or expanded from runs.
+    """
+    header = ssxd_read_header(path)
+    entry = header.find(contig)
+
+    ov_start = max(region_start, entry.start) if entry else region_end
+    ov_end = min(region_end, entry.end) if entry else region_end
+    if entry and entry.encoding == "raw" and ov_start == region_start and ov_end == region_end:
+        (values,) = _block(path, header, entry)
+        depths = values[region_start - entry.start : region_end - entry.start]
+        return DepthArray(contig=contig, start=region_start, end=region_end, depths=depths)
+
+    depths = np.zeros(region_end - region_start, dtype=np.int32)
+    if ov_start < ov_end:
+        lo, hi = ov_start - entry.start, ov_end - entry.start
+        out = depths[ov_start - region_start : ov_end - region_start]
+        if entry.encoding == "raw":
+            out[:] = _block(path, header, entry)[0][lo:hi]
+        else:
+            starts, values = _block(path, header, entry)
+            first = int(np.searchsorted(starts, lo, side="right")) - 1
+            last = int(np.searchsorted(starts, hi, side="left"))
+            bounds = np.clip(starts[first:last], lo, hi)
+            out[:] = np.repeat(values[first:last], np.diff(np.append(bounds, hi)))
+
+    return DepthArray(contig=contig, start=region_start, end=region_end, depths=depths)
+
+
+def ssxd_read_template(
+    path: str, contig: str, region_start: int, region_end: int,
+) -> DepthArray | RunLengthDepthArray:
+    """A region of a ``.ssxd`` template, as runs if the contig block is
+    run-length encoded and as :func:`ssxd_read_depths` otherwise."""
+    header = ssxd_read_header(path)
+    entry = header.find(contig)
+    if entry is None or entry.encoding != "rle":
+        return ssxd_read_depths(path, contig, region_start, region_end)
+
+    ov_start, ov_end = max(region_start, entry.start), min(region_end, entry.end)
+    run_starts = run_ends = values = np.zeros(0, dtype=np.int64)
+    if ov_start < ov_end:
+        starts, block_values = _block(path, header, entry)
+        lo, hi = ov_start - entry.start, ov_end - entry.start
+        first = int(np.searchsorted(starts, lo, side="right")) - 1
+        last = int(np.searchsorted(starts, hi, side="left"))
+        # Run bounds as region offsets
+        run_starts = np.clip(starts[first:last], lo, hi) + (entry.start - region_start)
+        run_ends = np.append(run_starts[1:], ov_end - region_start)
+        values = np.asarray(block_values[first:last])
+    return RunLengthDepthArray.from_intervals(
+        contig, region_start, region_end, run_starts, run_ends, values,
+    )
+
+
+def ssxd_intervals(path: str) -> Iterator[tuple[str, np.ndarray, np.ndarray, np.ndarray]]:
+    """Yield (contig, starts, ends, depths) intervals per contig, as stored:
+    one per position for raw blocks, one per run for run-length blocks."""
+    header = ssxd_read_header(path)
+    for entry in header.contigs:
+        block = _block(path, header, entry)
+        if entry.encoding == "raw":
+            starts = np.arange(entry.start, entry.end, dtype=np.int64)
+            yield entry.name, starts, starts + 1, block[0]
+        else:
+            starts = block[0] + entry.start
+            ends = np.append(starts[1:], entry.end)
+            yield entry.name, starts, ends, block[1]
+
+
+def ssxd_to_bed(path: str, fp: TextIO, collapse: int = 0) -> None:
+    """Write a ``.ssxd`` template as BED4; *collapse* > 0 re-collapses depths."""
+    if collapse > 0:
+        for entry in ssxd_read_header(path).contigs:
+            write_bed_output(fp, ssxd_read_depths(path, entry.name, entry.start, entry.end), collapse)
+        return
+    for name, starts, ends, depths in ssxd_intervals(path):
+        if len(starts):
+            write_bed_intervals(fp, name, starts, ends, depths)
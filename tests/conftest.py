@@ -0,0 +1,50 @@
+"""Shared fixtures: small synthetic BAM files built with pysam."""
+
+import pysam
+import pytest
+
+
+def write_bam(path, reads, contigs=(("chr1", 10_000),), index=True):
+    """Write *reads* to a coordinate-sorted BAM at *path*.
+
+    Each read is a tuple ``(name, contig, start, cigar)`` or
+    ``(name, contig, start, cigar, flag)``.
+    """
+    header = {
+        "HD": {"VN": "1.6", "SO": "coordinate"},
+        "SQ": [{"SN": name, "LN": length} for name, length in contigs],
+    }
+    tids = {name: i for i, (name, _) in enumerate(contigs)}
+    rows = sorted(reads, key=lambda r: (tids[r[1]], r[2]))
+
+    with pysam.AlignmentFile(str(path), "wb", header=header) as out:
+        for row in rows:
+            name, contig, start, cigar = row[:4]
+            flag = row[4] if len(row) > 4 else 0
+            seg = pysam.AlignedSegment(out.header)
+            seg.query_name = name
+            seg.reference_id = tids[contig]
+            seg.reference_start = start
+            seg.cigarstring = cigar
+            seg.flag = flag
+            seg.mapping_quality = 60
+            qlen = seg.query_length
+            seg.query_sequence = "A" * qlen
+            seg.query_qualities = pysam.qualitystring_to_array("I" * qlen)
+            out.write(seg)
+
+    if index:
+        pysam.index(str(path))
+    return str(path)
+
+
+@pytest.fixture
+def make_bam(tmp_path):
+    """Factory fixture returning ``write_bam`` bound to a temporary directory."""
+    counter = iter(range(1_000_000))
+
+    def _make(reads, name=None, **kwargs):
+        path = tmp_path / (name or f"reads{next(counter)}.bam")
+        return write_bam(path, reads, **kwargs)
+
+    return _make
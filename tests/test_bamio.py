@@ -0,0 +1,56 @@
+"""Tests for bamio.py: sort-order header tags, sort/index finalisation."""
+
+import os
+
+import pysam
+
+from samsamplex.bamio import bam_finalize, header_mark_sorted
+
+from .conftest import write_bam
+
+
+def _positions(path):
+    with pysam.AlignmentFile(path, "rb") as bam:
+        return [r.reference_start for r in bam.fetch(until_eof=True)]
+
+
+class TestHeaderMarkSorted:
+    def test_sets_coordinate(self):
+        header = pysam.AlignmentHeader.from_dict(
+            {"HD": {"VN": "1.6", "SO": "unsorted"}, "SQ": [{"SN": "chr1", "LN": 100}]}
+        )
+        assert header_mark_sorted(header).to_dict()["HD"]["SO"] == "coordinate"
+
+    def test_adds_missing_hd(self):
+        header = pysam.AlignmentHeader.from_dict({"SQ": [{"SN": "chr1", "LN": 100}]})
+        out = header_mark_sorted(header).to_dict()
+        assert out["HD"]["SO"] == "coordinate"
+        assert out["SQ"] == [{"SN": "chr1", "LN": 100}]
+
+
+class TestBamFinalize:
+    def _unsorted_bam(self, tmp_path):
+        sorted_path = write_bam(
+            tmp_path / "in.bam", [("a", "chr1", 50, "5M"), ("b", "chr1", 10, "5M")], index=False,
+        )
+        out = str(tmp_path / "unsorted.bam")
+        with pysam.AlignmentFile(sorted_path, "rb") as src:
+            reads = list(src.fetch(until_eof=True))
+            with pysam.AlignmentFile(out, "wb", header=src.header) as dst:
+                for r in reversed(reads):
+                    dst.write(r)
+        return out
+
+    def test_presorted_only_indexes(self, tmp_path):
+        path = write_bam(tmp_path / "s.bam", [("a", "chr1", 10, "5M")], index=False)
+        before = os.stat(path).st_mtime_ns
+        bam_finalize(path, presorted=True, log=lambda m: None, tag="t")
+        assert os.path.exists(path + ".bai")
+        assert os.stat(path).st_mtime_ns == before
+
+    def test_unsorted_is_sorted(self, tmp_path):
+        path = self._unsorted_bam(tmp_path)
+        assert _positions(path) == [50, 10]
+        bam_finalize(path, presorted=False, log=lambda m: None, tag="t")
+        assert _positions(path) == [10, 50]
+        assert os.path.exists(path + ".bai")
@@ -1,18 +1,27 @@
 """Tests for bed.py: contig matching, BED I/O, depth combining."""
 
 import io
+from types import SimpleNamespace
 
 import numpy as np
 import pytest
 
+from samsamplex import bed as bed_mod
 from samsamplex.bed import (
     bed_combine_depths,
+    bed_combine_stream,
+    bed_compress_index,
+    bed_contig_extents,
+    bed_has_index,
+    bed_read_contigs,
     bed_read_depths,
+    bed_read_template,
     contig_names_match,
+    find_contig,
     write_bed_entry,
     write_bed_output,
 )
-from samsamplex.depth import DepthArray
+from samsamplex.depth import DepthArray, RunLengthDepthArray, depth_dense
 
 
 # ── contig_names_match ───────────────────────────────────────────────────────
@@ -37,6 +46,11 @@ class TestContigNamesMatch:
     def test_chrX_vs_X(self):
         assert contig_names_match("chrX", "X") is True
 
+    def test_find_contig(self):
+        entries = [SimpleNamespace(name="chr2"), SimpleNamespace(name="1")]
+        assert find_contig(entries, "chr1") is entries[1]
+        assert find_contig(entries, "3") is None
+
 
 # ── write_bed_entry ──────────────────────────────────────────────────────────
 
@@ -99,6 +113,54 @@ class TestWriteBedOutput:
         lines = buf.getvalue().strip().split("\n")
         assert len(lines) == 1
 
+    def test_collapse_uses_first_depth(self):
+        """Drift within threshold of each neighbour still breaks vs first depth."""
+        arr = self._make_arr([10, 13, 16, 19, 19], start=0)
+        buf = io.StringIO()
+        write_bed_output(buf, arr, collapse=5)
+        assert buf.getvalue() == "chr1\t0\t2\t10\nchr1\t2\t5\t16\n"
+
+
+class TestWriteBedOutputBulk:
+    """The bulk writer must match one write_bed_entry call per interval."""
+
+    @staticmethod
+    def _reference(arr, collapse):
+        buf = io.StringIO()
+        if collapse == 0:
+            for i in range(arr.length):
+                write_bed_entry(buf, arr.contig, arr.start + i, arr.start + i + 1, int(arr.depths[i]))
+            return buf.getvalue()
+        start, ref = 0, int(arr.depths[0])
+        for i in range(1, arr.length):
+            if abs(int(arr.depths[i]) - ref) > collapse:
+                write_bed_entry(buf, arr.contig, arr.start + start, arr.start + i, ref)
+                start, ref = i, int(arr.depths[i])
+        write_bed_entry(buf, arr.contig, arr.start + start, arr.end, ref)
+        return buf.getvalue()
+
+    @pytest.mark.parametrize("start", [0, 9_999, 123_456_789, 5_000_000_000])
+    @pytest.mark.parametrize("collapse", [0, 1, 4])
+    def test_byte_identical(self, start, collapse, monkeypatch):
+        monkeypatch.setattr(bed_mod, "BED_WRITE_CHUNK", 97)
+        rng = np.random.default_rng(start % 1000 + collapse)
+        depths = np.concatenate([
+            rng.integers(0, 12, 300),
+            np.repeat(rng.integers(0, 100_000, 20), 15),
+            [0, 10**9, 2**31 - 1, 0],
+        ]).astype(np.int32)
+        arr = DepthArray(contig="chr10", start=start, end=start + len(depths), depths=depths)
+        buf = io.StringIO()
+        write_bed_output(buf, arr, collapse=collapse)
+        assert buf.getvalue() == self._reference(arr, collapse)
+
+    def test_negative_depths_fall_back(self):
+        d = np.array([3, -2, 0], dtype=np.int32)
+        arr = DepthArray(contig="1", start=5, end=8, depths=d)
+        buf = io.StringIO()
+        write_bed_output(buf, arr)
+        assert buf.getvalue() == "1\t5\t6\t3\n1\t6\t7\t-2\n1\t7\t8\t0\n"
+
 
 # ── bed_read_depths ──────────────────────────────────────────────────────────
 
@@ -149,6 +211,147 @@ class TestBedReadDepths:
         np.testing.assert_array_equal(arr.depths, np.zeros(10, dtype=np.int32))
 
 
+class TestBedReadDepthsBulk:
+    """Chunked numpy parsing must match the per-line parser."""
+
+    @staticmethod
+    def _per_line(text, contig, start, end):
+        depths = np.zeros(end - start, dtype=np.int32)
+        bed_mod._fill_bed_lines(depths, text, contig, start, end)
+        return depths
+
+    @staticmethod
+    def _per_base(contig, lo, hi, seed=0, extra=""):
+        d = np.random.default_rng(seed).integers(0, 300, hi - lo)
+        return "".join(f"{contig}\t{i}\t{i + 1}\t{v}{extra}\n" for i, v in zip(range(lo, hi), d))
+
+    @pytest.mark.parametrize("chunk", [50, 1 << 24])
+    @pytest.mark.parametrize("case", ["per_base", "extra_cols", "multi_contig", "comments", "crlf", "overlap"])
+    def test_matches_per_line(self, tmp_path, monkeypatch, chunk, case):
+        monkeypatch.setattr(bed_mod, "BED_READ_CHUNK", chunk)
+        text = {
+            "per_base": self._per_base("chr1", 0, 600),
+            "extra_cols": self._per_base("chr1", 0, 300, extra="\tname\t0"),
+            "multi_contig": self._per_base("chr2", 0, 50) + self._per_base("1", 0, 400, 1) + "chr3\t0\t9\t4\n",
+            "comments": "#c\ts\te\td\n" + self._per_base("chr1", 0, 200) + "\ntrack x\n" + "chr1 200 300 +7\n",
+            "crlf": self._per_base("chr1", 0, 300).replace("\n", "\r\n"),
+            "overlap": "chr1\t0\t100\t5\nchr1\t50\t60\t9\nchr1\t55\t200\t3\nchr1\t10\t20\t1\n",
+        }[case]
+        bed = tmp_path / "test.bed"
+        bed.write_bytes(text.encode())
+
+        for start, end in [(0, 600), (37, 250), (590, 700)]:
+            arr = bed_read_depths(str(bed), "chr1", start, end)
+            expected = self._per_line(text.replace("\r", ""), "chr1", start, end)
+            np.testing.assert_array_equal(arr.depths, expected)
+
+    def test_no_trailing_newline(self, tmp_path):
+        bed = tmp_path / "test.bed"
+        bed.write_text("chr1\t0\t2\t4\nchr1\t2\t4\t7")
+        arr = bed_read_depths(str(bed), "chr1", 0, 4)
+        np.testing.assert_array_equal(arr.depths, [4, 4, 7, 7])
+
+    def test_irregular_chunk_rejected(self):
+        assert bed_mod._split_bed_chunk(b"chr1\t0\t1\t5\nchr1\t1\t2\n") is None
+        assert bed_mod._split_bed_chunk(b"chr1\t0\t1\t-5\n") is None
+        cols = bed_mod._split_bed_chunk(b"chr1\t0\t1\t5\nchr1\t1\t2\t60\n")
+        assert cols[0] == [b"chr1"]
+        assert cols[3].tolist() == [5, 60]
+
+
+class TestBedReadContigs:
+    @pytest.mark.parametrize("chunk", [50, 1 << 24])
+    def test_matches_per_contig_reads(self, tmp_path, monkeypatch, chunk):
+        monkeypatch.setattr(bed_mod, "BED_READ_CHUNK", chunk)
+        bed = tmp_path / "test.bed"
+        bed.write_text(
+            "chr2\t10\t20\t1\nchr1\t5\t60\t2\n# x\nchr2\t0\t5\t3\nchr1 40 90 4\n"
+            + TestBedReadDepthsBulk._per_base("chr3", 100, 400)
+            + "chr1\t50\t55\t9\nchr1\t70\t70\t8\n"
+        )
+        arrays = list(bed_read_contigs(str(bed)))
+        extents = bed_contig_extents(str(bed))
+        assert [(a.contig, a.start, a.end) for a in arrays] == [(n, *e) for n, e in extents.items()]
+        for arr in arrays:
+            expected = bed_read_depths(str(bed), arr.contig, arr.start, arr.end)
+            np.testing.assert_array_equal(arr.depths, expected.depths)
+
+
+class TestBedReadTemplate:
+    @pytest.fixture
+    def steps(self):
+        rng = np.random.default_rng(4)
+        d = np.repeat(rng.integers(0, 60, 300), rng.integers(5, 40, 300)).astype(np.int32)
+        d[100:400] = 0
+        return DepthArray(contig="chr1", start=0, end=len(d), depths=d)
+
+    def _write(self, path, arr, collapse):
+        with open(path, "w") as fp:
+            write_bed_output(fp, arr, collapse=collapse)
+        return str(path)
+
+    @pytest.mark.parametrize("region", [(0, None), (57, 3_000), (2_000, 20_000)])
+    def test_collapsed_bed_read_as_runs(self, tmp_path, steps, region):
+        bed = self._write(tmp_path / "t.bed", steps, collapse=1)
+        start, end = region[0], region[1] or steps.end
+        got = bed_read_template(bed, "chr1", start, end)
+        assert isinstance(got, RunLengthDepthArray)
+        np.testing.assert_array_equal(
+            got.to_dense().depths, bed_read_depths(bed, "chr1", start, end).depths,
+        )
+
+    def test_per_base_bed_read_dense(self, tmp_path, steps, monkeypatch):
+        monkeypatch.setattr(bed_mod, "BED_READ_CHUNK", 64)
+        text = "".join(f"chr1\t{i}\t{i + 1}\t{v}\n" for i, v in enumerate(steps.depths[:2_000]))
+        (tmp_path / "p.bed").write_text(text)
+        got = bed_read_template(str(tmp_path / "p.bed"), "chr1", 0, 2_000)
+        assert isinstance(got, DepthArray)
+        np.testing.assert_array_equal(got.depths, steps.depths[:2_000])
+
+    def test_overlapping_intervals_read_dense(self, tmp_path):
+        bed = tmp_path / "t.bed"
+        bed.write_text("chr1\t0\t100\t5\nchr1\t50\t60\t9\n")
+        got = bed_read_template(str(bed), "chr1", 0, 1_000)
+        assert isinstance(got, DepthArray)
+        np.testing.assert_array_equal(got.depths, bed_read_depths(str(bed), "chr1", 0, 1_000).depths)
+
+
+class TestTabixBed:
+    @pytest.fixture
+    def beds(self, tmp_path):
+        rng = np.random.default_rng(3)
+        plain = tmp_path / "t.bed"
+        with open(plain, "w") as fp:
+            for contig in ("chr1", "chr2"):
+                d = rng.integers(0, 50, 5_000).astype(np.int32)
+                write_bed_output(fp, DepthArray(contig=contig, start=0, end=5_000, depths=d), collapse=2)
+        gz = tmp_path / "t.bed.gz"
+        bed_compress_index(str(plain), str(gz))
+        return plain, gz
+
+    def test_index_written(self, beds):
+        _, gz = beds
+        assert bed_has_index(str(gz))
+        assert (gz.parent / "t.bed.gz.tbi").exists()
+
+    @pytest.mark.parametrize("contig", ["chr1", "2"])
+    @pytest.mark.parametrize("start,end", [(0, 5_000), (1_234, 1_300), (4_990, 6_000)])
+    def test_region_fetch_matches_scan(self, beds, contig, start, end):
+        plain, gz = beds
+        fetched = bed_read_depths(str(gz), contig, start, end)
+        scanned = bed_read_depths(str(plain), contig, start, end)
+        np.testing.assert_array_equal(fetched.depths, scanned.depths)
+
+    def test_gzip_without_index_is_scanned(self, beds):
+        plain, gz = beds
+        (gz.parent / "t.bed.gz.tbi").unlink()
+        assert not bed_has_index(str(gz))
+        np.testing.assert_array_equal(
+            bed_read_depths(str(gz), "chr2", 100, 900).depths,
+            bed_read_depths(str(plain), "chr2", 100, 900).depths,
+        )
+
+
 # ── bed_combine_depths ───────────────────────────────────────────────────────
 
 
@@ -200,3 +403,107 @@ class TestBedCombineDepths:
         b = self._make([4, 5, 6])
         with pytest.raises(ValueError, match="Unknown combine mode"):
             bed_combine_depths([a, b], mode="bogus")
+
+
+class TestBedCombineStream:
+    def _arrays(self, n, seed=0):
+        rng = np.random.default_rng(seed)
+        return [
+            DepthArray(contig="chr1", start=0, end=500, depths=rng.integers(0, 40, 500).astype(np.int32))
+            for _ in range(n)
+        ]
+
+    @staticmethod
+    def _stacked(arrays, mode):
+        stacked = np.stack([a.depths for a in arrays])
+        if mode == "min":
+            return stacked.min(axis=0)
+        if mode == "max":
+            return stacked.max(axis=0)
+        return stacked.sum(axis=0) // len(arrays)
+
+    @pytest.mark.parametrize("mode", ["min", "max", "mean"])
+    def test_matches_stacked_reduction(self, mode):
+        arrays = self._arrays(7)
+        result = bed_combine_stream(iter(arrays), mode=mode)
+        np.testing.assert_array_equal(result.depths, self._stacked(arrays, mode))
+        assert result.depths.dtype == np.int32
+
+    def test_random_matches_per_position_draws(self):
+        import random
+
+        arrays = self._arrays(4, seed=1)
+        arrays[0].depths[:50] = 5
+        for a in arrays:
+            a.depths[:25] = 5  # agreeing positions draw nothing
+        rng = random.Random(9)
+        lo, hi = self._stacked(arrays, "min"), self._stacked(arrays, "max")
+        expected = [v if mn == mx else rng.randint(mn, mx) for mn, mx, v in zip(lo, hi, lo)]
+        result = bed_combine_stream((a for a in arrays), mode="random", seed=9)
+        assert result.depths.tolist() == expected
+
+    def test_consumes_lazily(self):
+        arrays = self._arrays(3)
+        seen = []
+
+        def gen():
+            for i, a in enumerate(arrays):
+                seen.append(i)
+                yield a
+
+        bed_combine_stream(gen(), mode="max")
+        assert seen == [0, 1, 2]
+
+    def test_empty_raises(self):
+        with pytest.raises(ValueError, match="No depth arrays"):
+            bed_combine_stream(iter([]))
+
+    def test_random_v2_reproducible_and_in_range(self):
+        arrays = self._arrays(3, seed=2)
+        for a in arrays:
+            a.depths[:20] = 11
+        r1 = bed_combine_stream(arrays, mode="random", seed=5, scheme="v2")
+        r2 = bed_combine_stream(iter(arrays), mode="random", seed=5, scheme="v2")
+        np.testing.assert_array_equal(r1.depths, r2.depths)
+        assert r1.depths.dtype == np.int32
+        lo, hi = self._stacked(arrays, "min"), self._stacked(arrays, "max")
+        assert ((r1.depths >= lo) & (r1.depths <= hi)).all()
+        assert (r1.depths[:20] == 11).all()
+
+    def test_random_v2_is_a_separate_scheme(self):
+        arrays = self._arrays(2, seed=3)
+        legacy = bed_combine_stream(arrays, mode="random", seed=5)
+        assert legacy.depths.tolist() == bed_combine_depths(arrays, mode="random", seed=5).depths.tolist()
+        v2 = bed_combine_stream(arrays, mode="random", seed=5, scheme="v2")
+        assert v2.depths.tolist() != legacy.depths.tolist()
+
+    @staticmethod
+    def _runs(n, seed=0):
+        rng = np.random.default_rng(seed)
+        out = []
+        for _ in range(n):
+            d = np.repeat(rng.integers(0, 40, 50), 10).astype(np.int32)
+            rl = RunLengthDepthArray.from_dense(DepthArray(contig="chr1", start=0, end=500, depths=d))
+            out.append(rl)
+        return out
+
+    @pytest.mark.parametrize("mode", ["min", "max", "mean"])
+    def test_runs_match_dense(self, mode):
+        runs = self._runs(5)
+        result = bed_combine_stream(iter(runs), mode=mode)
+        assert isinstance(result, RunLengthDepthArray)
+        dense = [r.to_dense() for r in runs]
+        np.testing.assert_array_equal(result.to_dense().depths, self._stacked(dense, mode))
+
+    @pytest.mark.parametrize("mode", ["min", "mean", "random"])
+    def test_runs_mixed_with_dense(self, mode):
+        inputs = self._runs(2, seed=1) + self._arrays(2) + self._runs(1, seed=2)
+        dense = [depth_dense(a) for a in inputs]
+        result = bed_combine_stream(inputs, mode=mode, seed=3)
+        expected = bed_combine_stream(dense, mode=mode, seed=3)
+        np.testing.assert_array_equal(depth_dense(result).depths, expected.depths)
+
+    def test_unknown_scheme_raises(self):
+        with pytest.raises(ValueError, match="Unknown random scheme"):
+            bed_combine_stream(self._arrays(2), mode="random", scheme="v9")
+
@@ -0,0 +1,82 @@
+"""Tests for cache.py: keying, round-trips, LRU eviction, depth read-through."""
+
+import os
+
+import numpy as np
+
+from samsamplex.cache import CACHE_DIR_ENV, CACHE_MAX_BYTES_ENV, DepthCache, open_depth_cache
+from samsamplex.depth import depth_from_bam
+
+
+class TestDepthCache:
+    def test_round_trip_is_memmapped(self, tmp_path):
+        cache = DepthCache(str(tmp_path / "c"))
+        cache.put("k", np.arange(5, dtype=np.int32))
+        got = cache.get("k")
+        assert isinstance(got, np.memmap)
+        assert got.dtype == np.int32
+        np.testing.assert_array_equal(got, [0, 1, 2, 3, 4])
+
+    def test_miss_returns_none(self, tmp_path):
+        assert DepthCache(str(tmp_path)).get("absent") is None
+
+    def test_key_depends_on_region_flags_and_mtime(self, tmp_path):
+        bam = tmp_path / "x.bam"
+        bam.write_bytes(b"data")
+        cache = DepthCache(str(tmp_path / "c"))
+        k = cache.key(str(bam), "chr1", 0, 10, cigar_aware=False)
+        assert k == cache.key(str(bam), "chr1", 0, 10, cigar_aware=False)
+        assert k != cache.key(str(bam), "chr1", 0, 11, cigar_aware=False)
+        assert k != cache.key(str(bam), "chr1", 0, 10, cigar_aware=True)
+        st = bam.stat()
+        os.utime(bam, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        assert k != cache.key(str(bam), "chr1", 0, 10, cigar_aware=False)
+
+    def test_key_depends_on_index_mtime(self, tmp_path):
+        bam = tmp_path / "x.bam"
+        bam.write_bytes(b"data")
+        cache = DepthCache(str(tmp_path / "c"))
+        before = cache.key(str(bam), "chr1", 0, 10)
+        (tmp_path / "x.bam.bai").write_bytes(b"idx")
+        assert before != cache.key(str(bam), "chr1", 0, 10)
+
+    def test_lru_eviction(self, tmp_path):
+        entry = np.zeros(1_000, dtype=np.int32)
+        cache = DepthCache(str(tmp_path), max_bytes=2 * entry.nbytes + 500)
+        cache.put("a", entry)
+        cache.put("b", entry)
+        for name, t in (("a", 1), ("b", 2)):
+            os.utime(tmp_path / f"{name}.npy", (t, t))
+        assert cache.get("a") is not None  # "a" is now most recently used
+        cache.put("c", entry)
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+
+
+class TestOpenDepthCache:
+    def test_disabled_by_default(self, monkeypatch):
+        monkeypatch.delenv(CACHE_DIR_ENV, raising=False)
+        assert open_depth_cache(None) is None
+
+    def test_env_var(self, tmp_path, monkeypatch):
+        monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / "env"))
+        monkeypatch.setenv(CACHE_MAX_BYTES_ENV, "1234")
+        cache = open_depth_cache(None)
+        assert cache.root == tmp_path / "env"
+        assert cache.max_bytes == 1234
+
+    def test_explicit_dir_wins(self, tmp_path, monkeypatch):
+        monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / "env"))
+        assert open_depth_cache(str(tmp_path / "cli")).root == tmp_path / "cli"
+
+
+class TestDepthReadThrough:
+    def test_hit_matches_computed(self, make_bam, tmp_path):
+        bam = make_bam([("a", "chr1", 2, "5M"), ("b", "chr1", 4, "5M")], contigs=(("chr1", 20),))
+        cache = DepthCache(str(tmp_path / "c"))
+        first = depth_from_bam(bam, "chr1", 0, 12, cache=cache)
+        assert len(list(cache.root.glob("*.npy"))) == 1
+        second = depth_from_bam(bam, "chr1", 0, 12, cache=cache)
+        assert isinstance(second.depths, np.memmap)
+        np.testing.assert_array_equal(second.depths, first.depths)
@@ -0,0 +1,150 @@
+"""Tests for cap.py: the coverage ring and single-pass depth capping."""
+
+import subprocess
+import sys
+
+import numpy as np
+import pysam
+import pytest
+
+from samsamplex.cap import CoverageRing, cap_keep, cap_run
+from samsamplex.depth import depth_from_bam
+from samsamplex.readhash import xxh32_fraction
+
+
+def _names(path):
+    with pysam.AlignmentFile(path, "rb") as fp:
+        return [r.query_name for r in fp.fetch(until_eof=True)]
+
+
+@pytest.fixture
+def deep_bam(make_bam):
+    """4000 reads of 30-300 bp piled onto chr1:0-5000, many sharing starts."""
+    rng = np.random.default_rng(3)
+    starts = rng.integers(0, 4_700, 4_000) // 7 * 7
+    lengths = rng.integers(30, 300, 4_000)
+    reads = [(f"r{i}", "chr1", int(s), f"{n}M") for i, (s, n) in enumerate(zip(starts, lengths))]
+    reads += [("dup", "chr1", 10, "50M", 0x400), ("unmapped", "chr1", 20, "50M", 0x4)]
+    return make_bam(reads, contigs=(("chr1", 5_000), ("chr2", 1_000)))
+
+
+# ── Coverage ring ────────────────────────────────────────────────────────────
+
+
+class TestCoverageRing:
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(0)
+        ring = CoverageRing(size=8)
+        spans = []
+        pos = 0
+        for _ in range(500):
+            pos += int(rng.integers(0, 12))
+            covered = sum(1 for s, e in spans if s <= pos < e)
+            assert ring.advance(pos) == covered
+            end = pos + int(rng.integers(1, 40))
+            ring.add(end)
+            spans.append((pos, end))
+        assert ring.size >= 32
+
+    def test_reset(self):
+        ring = CoverageRing(size=4)
+        ring.add(3)
+        ring.reset(100)
+        assert ring.advance(101) == 0
+
+
+class TestCapKeep:
+    def test_room_for_all(self, deep_bam):
+        with pysam.AlignmentFile(deep_bam) as fp:
+            group = list(fp.fetch(until_eof=True))[:5]
+        assert cap_keep(group, 5, seed=1) == group
+        assert cap_keep(group, 0, seed=1) == []
+
+    def test_smallest_hashes_in_input_order(self, deep_bam):
+        with pysam.AlignmentFile(deep_bam) as fp:
+            group = list(fp.fetch(until_eof=True))[:8]
+        kept = cap_keep(group, 3, seed=5)
+        best = sorted(group, key=lambda r: xxh32_fraction(r.query_name, 5))[:3]
+        assert {r.query_name for r in kept} == {r.query_name for r in best}
+        assert kept == [r for r in group if r in kept]
+
+
+# ── cap_run ──────────────────────────────────────────────────────────────────
+
+
+class TestCapRun:
+    @pytest.mark.parametrize("max_depth", [1, 20, 100])
+    def test_depth_capped_and_greedy(self, deep_bam, tmp_path, max_depth):
+        out = str(tmp_path / "capped.bam")
+        assert cap_run(deep_bam, None, max_depth, out_bam=out) == 0
+        depth = depth_from_bam(out, "chr1", 0, 5_000).depths
+        source = depth_from_bam(deep_bam, "chr1", 0, 5_000).depths
+        assert depth.max() == min(max_depth, source.max())
+        # A read is only dropped where the cap was reached at its start.
+        kept = set(_names(out))
+        with pysam.AlignmentFile(deep_bam) as fp:
+            for r in fp.fetch(until_eof=True):
+                if r.query_name.startswith("r") and r.query_name not in kept:
+                    assert depth[r.reference_start] == max_depth
+        assert "dup" not in kept and "unmapped" not in kept
+
+    def test_deterministic_and_seeded(self, deep_bam, tmp_path):
+        outs = [str(tmp_path / f"o{i}.bam") for i in range(3)]
+        for out, seed in zip(outs, (1, 1, 2)):
+            cap_run(deep_bam, None, 10, out_bam=out, seed=seed)
+        assert _names(outs[0]) == _names(outs[1])
+        assert _names(outs[0]) != _names(outs[2])
+
+    def test_seeds_match_single_runs(self, deep_bam, tmp_path):
+        cap_run(deep_bam, None, 10, out_bam=str(tmp_path / "s{seed}.bam"), seeds=[3, 4])
+        for seed in (3, 4):
+            single = str(tmp_path / f"single{seed}.bam")
+            cap_run(deep_bam, None, 10, out_bam=single, seed=seed)
+            assert _names(str(tmp_path / f"s{seed}.bam")) == _names(single)
+
+    def test_region_unindexed_matches_indexed(self, make_bam, deep_bam, tmp_path):
+        with pysam.AlignmentFile(deep_bam) as fp:
+            rows = [
+                (r.query_name, "chr1", r.reference_start, r.cigarstring)
+                for r in fp.fetch(until_eof=True) if r.query_name.startswith("r")
+            ]
+        plain = make_bam(rows, contigs=(("chr1", 5_000),), index=False)
+        a, b = str(tmp_path / "a.bam"), str(tmp_path / "b.bam")
+        assert cap_run(deep_bam, "chr1:1000-2000", 15, out_bam=a) == 0
+        assert cap_run(plain, "chr1:1000-2000", 15, out_bam=b) == 0
+        assert _names(a) == _names(b)
+        with pysam.AlignmentFile(a) as fp:
+            assert all(r.reference_end > 999 and r.reference_start < 2000 for r in fp)
+
+    def test_stdin(self, deep_bam, tmp_path):
+        out = str(tmp_path / "stdin.bam")
+        expected = str(tmp_path / "file.bam")
+        cap_run(deep_bam, None, 8, out_bam=expected)
+        with open(deep_bam, "rb") as fp:
+            subprocess.run(
+                [sys.executable, "-m", "samsamplex.cli", "sample", "--source-bam", "-",
+                 "--max-depth", "8", "--out-bam", out],
+                stdin=fp, check=True, capture_output=True,
+            )
+        assert _names(out) == _names(expected)
+
+    @pytest.mark.parametrize("extra", [["--stat", "max"], ["--threads", "2"], ["--no-metrics"]])
+    def test_unused_options_rejected(self, deep_bam, tmp_path, extra):
+        proc = subprocess.run(
+            [sys.executable, "-m", "samsamplex.cli", "sample", "--source-bam", deep_bam,
+             "--max-depth", "8", "--out-bam", str(tmp_path / "o.bam"), *extra],
+            capture_output=True, text=True,
+        )
+        assert proc.returncode == 1
+        assert f"{extra[0]} cannot be used with --max-depth" in proc.stderr
+
+    def test_unsorted_input(self, tmp_path):
+        path = str(tmp_path / "unsorted.sam")
+        with open(path, "w") as fp:
+            fp.write("@SQ\tSN:chr1\tLN:1000\n")
+            for name, pos in (("a", 500), ("b", 100)):
+                fp.write(f"{name}\t0\tchr1\t{pos}\t60\t10M\t*\t0\t0\tAAAAAAAAAA\t*\n")
+        assert cap_run(path, None, 5, out_bam=str(tmp_path / "o.bam")) == 1
+
+    def test_unknown_contig(self, deep_bam, tmp_path):
+        assert cap_run(deep_bam, "chr9:1-10", 5, out_bam=str(tmp_path / "o.bam")) == 1
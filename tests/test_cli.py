@@ -0,0 +1,141 @@
+"""Tests for cli.py: argument checks and output naming, run as subprocesses."""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import samsamplex
+from samsamplex.bed import bed_read_depths
+
+from .conftest import write_bam
+
+REGION = ("--region", "chr1:101-300")
+
+
+def _cli(*args, cwd=None):
+    # Keep the package importable when running from another directory.
+    root = str(Path(samsamplex.__file__).resolve().parents[1])
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")]))}
+    return subprocess.run(
+        [sys.executable, "-m", "samsamplex.cli", *args],
+        capture_output=True, text=True, cwd=cwd, env=env,
+    )
+
+
+def _depths(path):
+    return bed_read_depths(str(path), "chr1", 100, 300).depths
+
+
+@pytest.fixture
+def template_bam(make_bam):
+    return make_bam([("a", "chr1", 100, "50M"), ("b", "chr1", 120, "50M")], name="t1.bam")
+
+
+@pytest.fixture
+def template_bams(template_bam, make_bam):
+    """Two template BAMs with their expected depths over chr1:100-300."""
+    t2 = make_bam([("c", "chr1", 200, "10M")], name="t2.bam")
+    d1 = np.zeros(200, dtype=np.int32)
+    d1[0:50] += 1
+    d1[20:70] += 1
+    d2 = np.zeros(200, dtype=np.int32)
+    d2[100:110] = 1
+    return [template_bam, t2], [d1, d2]
+
+
+# ── map ──────────────────────────────────────────────────────────────────────
+
+
+class TestMap:
+    def test_out_template_needs_ssxd_suffix(self, template_bam, tmp_path):
+        out = tmp_path / "x.bed"
+        proc = _cli("map", "--template-bam", template_bam, "--region", "chr1",
+                    "--out-template", str(out))
+        assert proc.returncode == 1
+        assert "--out-template must end in .ssxd" in proc.stderr
+        assert not out.exists()
+
+    def test_sample_placeholder_single_bam(self, template_bams, tmp_path):
+        (t1, _), (d1, _) = template_bams
+        proc = _cli("map", "--template-bam", t1, *REGION, "--out-bed", str(tmp_path / "{sample}.out.bed"))
+        assert proc.returncode == 0, proc.stderr
+        assert _depths(tmp_path / "t1.out.bed").tolist() == d1.tolist()
+
+    def test_sample_placeholder_several_bams(self, template_bams, tmp_path):
+        bams, expected = template_bams
+        proc = _cli("map", "--template-bam", *bams, *REGION,
+                    "--out-bed", str(tmp_path / "{sample}.out.bed"),
+                    "--out-template", str(tmp_path / "{sample}.ssxd"))
+        assert proc.returncode == 0, proc.stderr
+        for name, depth in zip(("t1", "t2"), expected):
+            assert _depths(tmp_path / f"{name}.out.bed").tolist() == depth.tolist()
+            assert _depths(tmp_path / f"{name}.ssxd").tolist() == depth.tolist()
+
+    def test_default_names_per_sample(self, template_bams, tmp_path):
+        bams, expected = template_bams
+        proc = _cli("map", "--template-bam", *bams, *REGION, cwd=tmp_path)
+        assert proc.returncode == 0, proc.stderr
+        assert not (tmp_path / "out.bed").exists()
+        for name, depth in zip(("t1", "t2"), expected):
+            assert _depths(tmp_path / f"{name}.bed").tolist() == depth.tolist()
+
+    def test_duplicate_sample_names(self, template_bam, tmp_path):
+        (tmp_path / "other").mkdir()
+        twin = write_bam(tmp_path / "other" / "t1.bam", [("c", "chr1", 200, "10M")])
+        proc = _cli("map", "--template-bam", template_bam, twin, *REGION, cwd=tmp_path)
+        assert proc.returncode == 1
+        assert "file names must be unique" in proc.stderr
+        assert not (tmp_path / "t1.bed").exists()
+
+    @pytest.mark.parametrize("opt, path", [("--out-bed", "all.bed"), ("--out-template", "all.ssxd")])
+    def test_several_bams_need_placeholder(self, template_bams, tmp_path, opt, path):
+        bams, _ = template_bams
+        proc = _cli("map", "--template-bam", *bams, *REGION, opt, path, cwd=tmp_path)
+        assert proc.returncode == 1
+        assert f"{opt} needs a '{{sample}}' placeholder" in proc.stderr
+        assert not (tmp_path / path).exists()
+
+    def test_combine_mode_writes_combined_only(self, template_bams, tmp_path):
+        bams, (d1, d2) = template_bams
+        proc = _cli("map", "--template-bam", *bams, *REGION, "--combine-mode", "max",
+                    "--out-template", "combined.ssxd", cwd=tmp_path)
+        assert proc.returncode == 0, proc.stderr
+        assert sorted(p.name for p in tmp_path.glob("*.ssxd")) == ["combined.ssxd"]
+        assert not list(tmp_path.glob("*.bed"))
+        assert _depths(tmp_path / "combined.ssxd").tolist() == np.maximum(d1, d2).tolist()
+
+
+# ── sample ───────────────────────────────────────────────────────────────────
+
+
+class TestSample:
+    def test_negative_index_max_mb(self, tmp_path):
+        proc = _cli("sample", "--source-bam", "s.bam", "--template-bed", "t.bed",
+                    "--region", "chr1", "--stat", "median", "--index-max-mb", "-1", cwd=tmp_path)
+        assert proc.returncode == 1
+        assert "Error: --index-max-mb must be >= 0, got -1" in proc.stderr
+
+
+# ── Shared options ───────────────────────────────────────────────────────────
+
+
+class TestThreads:
+    @pytest.mark.parametrize(
+        "command",
+        [
+            ["map", "--template-bam", "t.bam", "--region", "chr1"],
+            ["sample", "--source-bam", "s.bam", "--template-bed", "t.bed", "--region", "chr1"],
+            ["plot", "--source-bam", "s.bam", "--out-bam", "o.bam", "--region", "chr1",
+             "--template-bed", "t.bed", "--out-tsv", "o.tsv"],
+            ["stats", "--bam-a", "a.bam", "--bam-b", "b.bam", "--region", "chr1"],
+        ],
+    )
+    @pytest.mark.parametrize("threads", ["0", "-2"])
+    def test_rejects_below_one(self, tmp_path, command, threads):
+        proc = _cli(*command, "--threads", threads, cwd=tmp_path)
+        assert proc.returncode == 1
+        assert f"Error: --threads must be >= 1, got {threads}" in proc.stderr
@@ -0,0 +1,118 @@
+"""Tests for combine.py: provenance records and pre-combined template reuse."""
+
+import os
+
+import numpy as np
+import pytest
+
+from samsamplex import bed as bed_mod
+from samsamplex.bed import bed_combine_stream, bed_read_depths, write_bed_output
+from samsamplex.combine import (
+    PROVENANCE_TAG,
+    combine_write,
+    provenance_mismatch,
+    template_provenance,
+)
+from samsamplex.depth import DepthArray
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(3):
+        d = np.repeat(rng.integers(0, 50, 80), rng.integers(1, 30, 80)).astype(np.int32)
+        path = tmp_path / f"t{i}.bed"
+        with open(path, "w") as fp:
+            write_bed_output(fp, DepthArray(contig="chr1", start=0, end=len(d), depths=d), collapse=i)
+        paths.append(str(path))
+    return paths
+
+
+# ── Writing and reading provenance ───────────────────────────────────────────
+
+
+class TestCombineWrite:
+    @pytest.mark.parametrize("suffix", [".bed", ".bed.gz", ".ssxd"])
+    @pytest.mark.parametrize("mode", ["mean", "random"])
+    def test_depths_and_provenance(self, tmp_path, inputs, suffix, mode):
+        out = str(tmp_path / f"combined{suffix}")
+        record = combine_write(out, inputs, "chr1", 10, 900, mode=mode, seed=3)
+        expected = bed_combine_stream(
+            (bed_read_depths(p, "chr1", 10, 900) for p in inputs), mode=mode, seed=3,
+        )
+        np.testing.assert_array_equal(bed_read_depths(out, "chr1", 10, 900).depths, expected.depths)
+
+        assert template_provenance(out) == record
+        assert record["region"] == ["chr1", 10, 900]
+        assert [r["path"] for r in record["inputs"]] == [os.path.realpath(p) for p in inputs]
+
+    def test_header_line_keeps_vectorised_parse(self, tmp_path, inputs):
+        out = str(tmp_path / "combined.bed")
+        combine_write(out, inputs, "chr1", 0, 500, mode="max")
+        with open(out, "rb") as fp:
+            chunk = fp.read()
+        assert chunk.startswith(PROVENANCE_TAG.encode())
+        assert bed_mod._split_bed_chunk(chunk) is not None
+
+    def test_plain_template_has_no_provenance(self, inputs):
+        assert template_provenance(inputs[0]) is None
+
+
+# ── Matching ─────────────────────────────────────────────────────────────────
+
+
+class TestProvenanceMismatch:
+    @pytest.fixture
+    def record(self, tmp_path, inputs):
+        return combine_write(str(tmp_path / "c.ssxd"), inputs, "chr1", 0, 800, mode="min", seed=1)
+
+    def test_match(self, record, inputs):
+        assert provenance_mismatch(record, inputs, "min", 1, "legacy", "chr1", 0, 800) is None
+
+    def test_subregion_and_seed_ignored_for_min(self, record, inputs):
+        assert provenance_mismatch(record, inputs, "min", 9, "v2", "1", 100, 200) is None
+
+    @pytest.mark.parametrize("change, reason", [
+        (dict(mode="max"), "mode"),
+        (dict(contig="chr2"), "contig"),
+        (dict(end=900), "does not cover"),
+    ])
+    def test_mismatch(self, record, inputs, change, reason):
+        args = dict(mode="min", seed=1, scheme="legacy", contig="chr1", start=0, end=800) | change
+        assert reason in provenance_mismatch(record, inputs, **args)
+
+    def test_random_needs_exact_region_and_seed(self, tmp_path, inputs):
+        record = combine_write(str(tmp_path / "r.bed"), inputs, "chr1", 0, 800, mode="random", seed=1)
+        assert provenance_mismatch(record, inputs, "random", 1, "legacy", "chr1", 0, 800) is None
+        assert "seed" in provenance_mismatch(record, inputs, "random", 2, "legacy", "chr1", 0, 800)
+        assert "random mode" in provenance_mismatch(record, inputs, "random", 1, "legacy", "chr1", 0, 700)
+
+    def test_changed_input(self, record, inputs):
+        with open(inputs[1], "a") as fp:
+            fp.write("chr1\t5000\t5001\t3\n")
+        assert "differs" in provenance_mismatch(record, inputs, "min", 1, "legacy", "chr1", 0, 800)
+
+    def test_touched_input_checked_by_content(self, record, inputs):
+        os.utime(inputs[0], ns=(0, 0))
+        assert provenance_mismatch(record, inputs, "min", 1, "legacy", "chr1", 0, 800) is None
+
+    def test_other_file_checked_by_content(self, tmp_path, record, inputs):
+        st = os.stat(inputs[0])
+        same = tmp_path / "moved.bed"
+        same.write_bytes(open(inputs[0], "rb").read())
+        other = tmp_path / "other.bed"
+        other.write_bytes(open(inputs[0], "rb").read().replace(b"\t1", b"\t2", 1))
+        assert other.read_bytes() != same.read_bytes()
+        for path in (same, other):
+            os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+        moved = [str(same)] + inputs[1:]
+        assert provenance_mismatch(record, moved, "min", 1, "legacy", "chr1", 0, 800) is None
+        swapped = [str(other)] + inputs[1:]
+        assert "differs" in provenance_mismatch(record, swapped, "min", 1, "legacy", "chr1", 0, 800)
+
+    def test_input_count(self, record, inputs):
+        assert "templates" in provenance_mismatch(record, inputs[:2], "min", 1, "legacy", "chr1", 0, 800)
+
+    def test_no_record(self, inputs):
+        assert provenance_mismatch(None, inputs, "min", 1, "legacy", "chr1", 0, 800)
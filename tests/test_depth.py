@@ -1,8 +1,19 @@
-"""Tests for depth.py: region_parse."""
+"""Tests for depth.py: region_parse, depth accumulation engines."""
 
+import numpy as np
 import pytest
 
-from samsamplex.depth import Region, region_parse
+from samsamplex import depth as depth_mod
+from samsamplex.depth import (
+    DepthAccumulator,
+    DepthArray,
+    Region,
+    RunLengthDepthArray,
+    _split_tiles,
+    depth_from_bam,
+    depth_from_bams,
+    region_parse,
+)
 
 
 class TestRegionParse:
@@ -53,3 +64,169 @@ class TestRegionParse:
     def test_invalid_no_contig(self):
         with pytest.raises(ValueError, match="Invalid region format"):
             region_parse(":1000-2000")
+
+
+# ── RunLengthDepthArray ─────────────────────────────────────────────────────
+
+
+class TestRunLengthDepthArray:
+    @staticmethod
+    def _dense(seed=0):
+        rng = np.random.default_rng(seed)
+        d = np.repeat(rng.integers(0, 5, 60), rng.integers(1, 9, 60)).astype(np.int32)
+        return DepthArray(contig="chr1", start=300, end=300 + len(d), depths=d)
+
+    def test_dense_round_trip(self):
+        arr = self._dense()
+        rl = RunLengthDepthArray.from_dense(arr)
+        assert rl.n_runs < arr.length
+        assert rl.breaks[0] == arr.start
+        np.testing.assert_array_equal(rl.to_dense().depths, arr.depths)
+
+    def test_slice_dense(self):
+        arr = self._dense(1)
+        rl = RunLengthDepthArray.from_dense(arr)
+        for lo, hi in [(0, arr.length), (3, 4), (17, 120), (arr.length - 5, arr.length)]:
+            np.testing.assert_array_equal(rl.slice_dense(lo, hi), arr.depths[lo:hi])
+
+    def test_from_intervals_fills_gaps_with_zero(self):
+        rl = RunLengthDepthArray.from_intervals(
+            "chr1", 100, 120, np.array([0, 5, 6, 15]), np.array([3, 6, 10, 20]), np.array([2, 4, 4, 1]),
+        )
+        assert rl.breaks.tolist() == [100, 103, 105, 110, 115]
+        assert rl.values.tolist() == [2, 0, 4, 0, 1]
+
+    def test_from_intervals_empty(self):
+        empty = np.zeros(0, dtype=np.int64)
+        rl = RunLengthDepthArray.from_intervals("chr1", 0, 8, empty, empty, empty)
+        np.testing.assert_array_equal(rl.to_dense().depths, np.zeros(8))
+
+
+# ── depth engines ────────────────────────────────────────────────────────────
+
+
+def _random_reads(n, contig_len=2_000, seed=0):
+    rng = np.random.default_rng(seed)
+    reads = []
+    for i in range(n):
+        start = int(rng.integers(0, contig_len - 50))
+        length = int(rng.integers(20, 150))
+        flag = int(rng.choice([0, 0, 0, 0x400, 0x100]))
+        reads.append((f"r{i}", "chr1", start, f"{length}M", flag))
+    return reads
+
+
+class TestDepthAccumulator:
+    def test_single_span(self):
+        acc = DepthAccumulator(0, 5)
+        acc.add(1, 3)
+        np.testing.assert_array_equal(acc.depths(), [0, 1, 1, 0, 0])
+
+    def test_spans_clipped_to_region(self):
+        acc = DepthAccumulator(10, 15)
+        acc.add(5, 12)
+        acc.add(14, 40)
+        acc.add(0, 5)
+        np.testing.assert_array_equal(acc.depths(), [1, 1, 0, 0, 1])
+
+    def test_small_batches_match_single_batch(self):
+        spans = [(0, 4), (2, 9), (3, 3), (7, 20), (1, 2)]
+        a = DepthAccumulator(0, 10, batch_size=2)
+        b = DepthAccumulator(0, 10)
+        for s, e in spans:
+            a.add(s, e)
+            b.add(s, e)
+        np.testing.assert_array_equal(a.depths(), b.depths())
+
+
+class TestDepthFromBam:
+    def test_engines_identical(self, make_bam):
+        bam = make_bam(_random_reads(500), contigs=(("chr1", 2_000),))
+        loop = depth_from_bam(bam, "chr1", 100, 1_900, engine="loop")
+        events = depth_from_bam(bam, "chr1", 100, 1_900, engine="events")
+        assert events.depths.dtype == np.int32
+        np.testing.assert_array_equal(events.depths, loop.depths)
+
+    def test_filtered_flags_ignored(self, make_bam):
+        bam = make_bam(
+            [("a", "chr1", 0, "5M"), ("b", "chr1", 0, "5M", 0x400), ("c", "chr1", 2, "5M", 0x4)],
+            contigs=(("chr1", 20),),
+        )
+        arr = depth_from_bam(bam, "chr1", 0, 10)
+        np.testing.assert_array_equal(arr.depths, [1, 1, 1, 1, 1, 0, 0, 0, 0, 0])
+
+    def test_whole_contig_and_prefix(self, make_bam):
+        bam = make_bam([("a", "chr1", 3, "4M")], contigs=(("chr1", 10),))
+        arr = depth_from_bam(bam, "1", -1, -1)
+        assert (arr.contig, arr.start, arr.end) == ("chr1", 0, 10)
+        assert arr.depths.sum() == 4
+
+    def test_cigar_unaware_counts_deletions_and_skips(self, make_bam):
+        bam = make_bam([("a", "chr1", 0, "2M2D2M"), ("b", "chr1", 0, "1M5N1M")], contigs=(("chr1", 10),))
+        arr = depth_from_bam(bam, "chr1", 0, 8)
+        np.testing.assert_array_equal(arr.depths, [2, 2, 2, 2, 2, 2, 1, 0])
+
+    @pytest.mark.parametrize("engine", ["events", "loop"])
+    def test_cigar_aware_counts_blocks_only(self, make_bam, engine):
+        bam = make_bam([("a", "chr1", 0, "2M2D2M"), ("b", "chr1", 0, "1M5N1M")], contigs=(("chr1", 10),))
+        arr = depth_from_bam(bam, "chr1", 0, 8, engine=engine, cigar_aware=True)
+        np.testing.assert_array_equal(arr.depths, [2, 1, 0, 0, 1, 1, 1, 0])
+
+    def test_cigar_aware_engines_identical(self, make_bam):
+        rng = np.random.default_rng(3)
+        reads = [
+            (f"r{i}", "chr1", int(rng.integers(0, 1_500)),
+             f"{rng.integers(5, 40)}M{rng.integers(1, 300)}N{rng.integers(5, 40)}M3I10M2D8M")
+            for i in range(300)
+        ]
+        bam = make_bam(reads, contigs=(("chr1", 2_000),))
+        loop = depth_from_bam(bam, "chr1", 50, 1_950, engine="loop", cigar_aware=True)
+        events = depth_from_bam(bam, "chr1", 50, 1_950, engine="events", cigar_aware=True)
+        np.testing.assert_array_equal(events.depths, loop.depths)
+
+    def test_unknown_engine_raises(self, make_bam):
+        bam = make_bam([("a", "chr1", 0, "4M")])
+        with pytest.raises(ValueError, match="Unknown depth engine"):
+            depth_from_bam(bam, "chr1", 0, 10, engine="bogus")
+
+
+# ── tiled depth ──────────────────────────────────────────────────────────────
+
+
+class TestSplitTiles:
+    def test_covers_region_contiguously(self, monkeypatch):
+        monkeypatch.setattr(depth_mod, "MIN_TILE_LENGTH", 10)
+        tiles = _split_tiles(5, 1_000, threads=3)
+        assert tiles[0][0] == 5
+        assert tiles[-1][1] == 1_000
+        assert all(a[1] == b[0] for a, b in zip(tiles, tiles[1:]))
+        assert len(tiles) == 3 * depth_mod.TILES_PER_THREAD
+
+    def test_small_region_single_tile(self):
+        assert _split_tiles(0, 1_000, threads=8) == [(0, 1_000)]
+
+
+class TestTiledDepth:
+    @pytest.mark.parametrize("cigar_aware", [False, True])
+    def test_tiled_matches_single(self, make_bam, monkeypatch, cigar_aware):
+        monkeypatch.setattr(depth_mod, "MIN_TILE_LENGTH", 50)
+        reads = [
+            (f"r{i}", "chr1", s, "30M40N30M") for i, s in enumerate(range(0, 1_900, 7))
+        ]
+        bam = make_bam(reads, contigs=(("chr1", 2_000),))
+        single = depth_from_bam(bam, "chr1", 0, 2_000, cigar_aware=cigar_aware)
+        tiled = depth_from_bam(bam, "chr1", 0, 2_000, cigar_aware=cigar_aware, threads=3)
+        np.testing.assert_array_equal(tiled.depths, single.depths)
+
+
+class TestDepthFromBams:
+    @pytest.mark.parametrize("threads", [1, 2])
+    def test_matches_per_bam_in_order(self, make_bam, threads):
+        bams = [
+            make_bam(_random_reads(200, seed=i), name=f"s{i}.bam", contigs=(("chr1", 2_000),))
+            for i in range(4)
+        ]
+        got = list(depth_from_bams(bams, "chr1", 100, 1_900, threads=threads))
+        assert len(got) == 4
+        for bam, arr in zip(bams, got):
+            np.testing.assert_array_equal(arr.depths, depth_from_bam(bam, "chr1", 100, 1_900).depths)
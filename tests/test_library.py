@@ -0,0 +1,131 @@
+"""Tests for library.py: building, selecting rows, chunked combine modes."""
+
+import json
+
+import numpy as np
+import pytest
+
+from samsamplex import library as library_mod
+from samsamplex.bed import bed_combine_stream, bed_read_depths, template_extents, write_bed_output
+from samsamplex.depth import DepthArray
+from samsamplex.library import (
+    combine_percentile,
+    library_build,
+    library_combine,
+    library_open,
+)
+from samsamplex.ssxd import ssxd_write
+
+
+@pytest.fixture
+def templates(tmp_path):
+    """Five templates on chr1 with differing extents; the last one is .ssxd."""
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(5):
+        start = 100 * i
+        d = np.repeat(rng.integers(0, 50, 100), rng.integers(1, 20, 100)).astype(np.int32)
+        arr = DepthArray(contig="chr1", start=start, end=start + len(d), depths=d)
+        if i == 4:
+            path = tmp_path / f"s{i}.ssxd"
+            ssxd_write(str(path), [arr])
+        else:
+            path = tmp_path / f"s{i}.bed"
+            with open(path, "w") as fp:
+                write_bed_output(fp, arr, collapse=i % 2)
+        paths.append(str(path))
+    return paths
+
+
+@pytest.fixture
+def lib(tmp_path, templates):
+    library_build(str(tmp_path / "lib"), templates, chunk=97)
+    return library_open(str(tmp_path / "lib"))
+
+
+# ── Building ─────────────────────────────────────────────────────────────────
+
+
+class TestLibraryBuild:
+    def test_manifest(self, lib, templates):
+        assert lib.samples == ["s0", "s1", "s2", "s3", "s4"]
+        (entry,) = lib.contigs
+        assert entry.start == 0
+        assert entry.end == max(template_extents(t)["chr1"][1] for t in templates)
+        assert len(entry.chunks) == -(-entry.length // 97)
+
+    def test_rows_hold_template_depths(self, lib, templates):
+        entry = lib.contigs[0]
+        rows = np.concatenate([np.load(lib.root / f) for f in entry.chunks], axis=1)
+        for row, path in zip(rows, templates):
+            np.testing.assert_array_equal(row, bed_read_depths(path, "chr1", entry.start, entry.end).depths)
+
+    def test_existing_library_rejected(self, lib, templates):
+        with pytest.raises(ValueError, match="already exists"):
+            library_build(str(lib.root), templates)
+
+    def test_duplicate_ids_rejected(self, tmp_path, templates):
+        with pytest.raises(ValueError, match="unique"):
+            library_build(str(tmp_path / "dup"), templates[:2], ids=["a", "a"])
+
+    def test_bad_version(self, lib):
+        manifest = lib.root / library_mod.LIBRARY_MANIFEST
+        meta = json.loads(manifest.read_text())
+        meta["version"] = 99
+        manifest.write_text(json.dumps(meta))
+        with pytest.raises(ValueError, match="Unsupported template library version"):
+            library_open(str(lib.root))
+
+
+# ── Combining ────────────────────────────────────────────────────────────────
+
+
+class TestLibraryCombine:
+    REGIONS = [(0, 2_000), (150, 420), (1_000, 5_000)]
+
+    @pytest.mark.parametrize("mode", ["min", "max", "mean", "random"])
+    @pytest.mark.parametrize("region", REGIONS)
+    def test_matches_bed_combine(self, lib, templates, monkeypatch, mode, region):
+        monkeypatch.setattr(library_mod, "LIBRARY_BLOCK", 31)
+        start, end = region
+        got = library_combine(lib, "chr1", start, end, mode=mode, seed=7)
+        expected = bed_combine_stream(
+            (bed_read_depths(t, "chr1", start, end) for t in templates), mode=mode, seed=7,
+        )
+        np.testing.assert_array_equal(got.depths, expected.depths)
+        assert got.depths.dtype == np.int32
+
+    def test_select_subset_in_order(self, lib, templates):
+        rows = lib.rows(["s3", "s1"])
+        assert rows.tolist() == [3, 1]
+        got = library_combine(lib, "1", 0, 2_000, rows, mode="max")
+        expected = bed_combine_stream(
+            [bed_read_depths(templates[i], "chr1", 0, 2_000) for i in (3, 1)], mode="max",
+        )
+        np.testing.assert_array_equal(got.depths, expected.depths)
+
+    def test_unknown_ids(self, lib):
+        with pytest.raises(ValueError, match="Unknown template IDs: nope"):
+            lib.rows(["s1", "nope"])
+
+    @pytest.mark.parametrize("q", [0, 25, 50, 90, 100])
+    def test_percentile(self, lib, templates, q):
+        got = library_combine(lib, "chr1", 0, 2_000, mode=f"p{q}")
+        stacked = np.stack([bed_read_depths(t, "chr1", 0, 2_000).depths for t in templates])
+        np.testing.assert_array_equal(got.depths, np.percentile(stacked, q, axis=0, method="lower"))
+
+    def test_uncovered_contig_is_zero(self, lib):
+        assert not library_combine(lib, "chr9", 0, 100, mode="max").depths.any()
+
+    def test_unknown_mode(self, lib):
+        with pytest.raises(ValueError, match="Unknown combine mode"):
+            library_combine(lib, "chr1", 0, 10, mode="median")
+
+
+class TestCombinePercentile:
+    def test_parse(self):
+        assert combine_percentile("p90") == 90
+        assert combine_percentile("p2.5") == 2.5
+        assert combine_percentile("p101") is None
+        assert combine_percentile("max") is None
+        assert combine_percentile("p") is None
@@ -0,0 +1,88 @@
+"""Tests for mapback.py: contig ordering and the presorted output path."""
+
+import pysam
+import pytest
+
+from samsamplex.mapback import _order_contigs_by_offset, mapback_run
+
+# Offsets of HLA-A and HLA-B on GRCh38 chr6 (GENE_MAPS_GRCH38)
+A_START = 29941260
+B_START = 31353872
+
+CONTIGS = (("chr6", 170_805_979), ("PRG_1", 5_000), ("PRG_2", 5_000), ("PRG_3", 5_000))
+
+
+@pytest.fixture
+def prg_seq(tmp_path):
+    path = tmp_path / "sequences.txt"
+    rows = [("1", "B*07:02", "PRG_1"), ("2", "A*01:01", "PRG_2"), ("3", "A*02:01", "PRG_3")]
+    path.write_text(
+        "SequenceID\tName\tFASTAID\tChr\tStart_1based\tStop_1based\n"
+        + "".join(f"{i}\t{name}\t{fid}\t6\t1\t5000\n" for i, name, fid in rows)
+    )
+    return str(path)
+
+
+def _run(source, prg_seq, out, **kwargs):
+    return mapback_run(source, "chr6:29000000-34000000", str(out), "GRCh38", prg_seq, **kwargs)
+
+
+def _read(path):
+    with pysam.AlignmentFile(str(path), "rb") as fp:
+        return fp.header.to_dict()["HD"].get("SO"), [r.reference_start for r in fp.fetch(until_eof=True)]
+
+
+class TestOrderContigsByOffset:
+    def test_chr6_first_unresolved_last(self):
+        table = {"PRG_1": 300, "PRG_2": 100}
+        assert _order_contigs_by_offset(["PRG_9", "PRG_1", "6", "PRG_2"], table) == [
+            "6", "PRG_2", "PRG_1", "PRG_9",
+        ]
+
+
+class TestMapbackRun:
+    def test_ordered_input_is_presorted(self, make_bam, prg_seq, tmp_path, capsys):
+        # PRG_1 (HLA-B) lies after PRG_2 (HLA-A) on chr6 despite its name
+        source = make_bam(
+            [(f"b{i}", "PRG_1", 10 * i, "50M") for i in range(20)]
+            + [(f"a{i}", "PRG_2", 10 * i, "50M") for i in range(20)],
+            contigs=CONTIGS,
+        )
+        out = tmp_path / "out.bam"
+        assert _run(source, prg_seq, out) == 0
+        assert "already coordinate-sorted, indexing only" in capsys.readouterr().err
+
+        so, starts = _read(out)
+        assert so == "coordinate"
+        assert starts == sorted(starts)
+        assert starts[0] == A_START and starts[-1] == B_START + 190
+        with pysam.AlignmentFile(str(out), "rb") as fp:
+            assert fp.has_index()
+            assert fp.count("chr6", B_START, B_START + 1_000) == 20
+
+    def test_overlapping_contigs_get_sorted(self, make_bam, prg_seq, tmp_path, capsys):
+        # Two HLA-A alleles map onto the same chr6 span, interleaving reads
+        source = make_bam(
+            [(f"x{i}", "PRG_2", 100 + 10 * i, "50M") for i in range(10)]
+            + [(f"y{i}", "PRG_3", 10 * i, "50M") for i in range(10)],
+            contigs=CONTIGS,
+        )
+        out = tmp_path / "out.bam"
+        assert _run(source, prg_seq, out) == 0
+        assert "Sorting output BAM" in capsys.readouterr().err
+
+        so, starts = _read(out)
+        assert so == "coordinate"
+        assert starts == sorted(starts) and len(starts) == 20
+        with pysam.AlignmentFile(str(out), "rb") as fp:
+            assert fp.has_index()
+
+    def test_unsorted_output_not_marked_sorted(self, make_bam, prg_seq, tmp_path):
+        source = make_bam(
+            [("x", "PRG_2", 500, "50M"), ("y", "PRG_3", 0, "50M")], contigs=CONTIGS,
+        )
+        out = tmp_path / "out.bam"
+        assert _run(source, prg_seq, out, no_sort=True) == 0
+        so, starts = _read(out)
+        assert so == "unsorted"
+        assert starts == [A_START + 500, A_START]
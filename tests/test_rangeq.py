@@ -0,0 +1,160 @@
+"""Tests for rangeq.py: range mean/min/max/median indexes, save/load round-trips."""
+
+import numpy as np
+import pytest
+
+from samsamplex import rangeq
+from samsamplex.rangeq import (
+    RangeExtremum,
+    RangeMean,
+    RangeMeanFixed,
+    RangeMedian,
+    RangeWindow,
+    build_range_index,
+    index_load,
+    index_save,
+)
+
+
+def _spans(n, count, max_len, seed=0):
+    rng = np.random.default_rng(seed)
+    i1 = rng.integers(0, n, count)
+    i2 = np.minimum(i1 + rng.integers(1, max_len, count), n)
+    return i1, i2
+
+
+def _reference(values, i1, i2, fn):
+    return np.array([fn(values[a:b]) for a, b in zip(i1, i2)], dtype=np.float64)
+
+
+class TestRangeMean:
+    def test_matches_slices(self):
+        values = np.random.default_rng(1).random(100)
+        i1, i2 = _spans(100, 200, 40)
+        got = RangeMean(values).query(i1, i2)
+        np.testing.assert_allclose(got, _reference(values, i1, i2, np.mean))
+
+
+class TestRangeMeanFixed:
+    @pytest.mark.parametrize("n", [1, 100, 1_000])
+    def test_exact_integer_sums(self, monkeypatch, n):
+        monkeypatch.setattr(rangeq, "FIXED_PREFIX_BLOCK", 16)
+        monkeypatch.setattr(rangeq, "FIXED_PREFIX_CHUNK_BLOCKS", 3)
+        values = np.random.default_rng(13).integers(0, 65_536, n).astype(np.uint16)
+        index = RangeMeanFixed(values)
+        expected = np.concatenate(([0], np.cumsum(values, dtype=np.int64)))
+        assert index._prefix(np.arange(n + 1)).tolist() == expected.tolist()
+
+    def test_selected_for_integer_ratios(self):
+        values = np.full(10, 65_535, dtype=np.uint16)
+        index = build_range_index("mean", values, scale=65_535)
+        assert isinstance(index, RangeMeanFixed)
+        assert index.query(np.array([2]), np.array([7])).tolist() == [65_535.0]
+        assert index.scale == 65_535
+
+
+class TestRangeExtremum:
+    @pytest.mark.parametrize("op", ["min", "max"])
+    @pytest.mark.parametrize("max_bytes", [1 << 30, 20_000, 17_000])
+    def test_matches_slices(self, op, max_bytes):
+        values = np.random.default_rng(2).random(1_000)
+        i1, i2 = _spans(1_000, 2_000, 300, seed=3)
+        index = RangeExtremum(values, op, max_bytes=max_bytes)
+        expected = _reference(values, i1, i2, np.min if op == "min" else np.max)
+        assert index.query(i1, i2).tolist() == expected.tolist()
+
+    def test_block_size_follows_cap(self):
+        values = np.zeros(10_000)
+        assert RangeExtremum(values, "min").block == 1
+        capped = RangeExtremum(values, "min", max_bytes=400_000)
+        assert 1 < capped.block <= rangeq.MAX_BLOCK
+        assert capped.nbytes <= 400_000
+
+    def test_integer_values(self):
+        values = np.random.default_rng(4).integers(0, 65_535, 500).astype(np.uint16)
+        i1, i2 = _spans(500, 300, 100, seed=5)
+        index = RangeExtremum(values, "max", max_bytes=2_200)
+        assert index.block > 1
+        assert index.query(i1, i2).tolist() == _reference(values, i1, i2, np.max).tolist()
+
+    def test_unmet_cap(self):
+        values = np.random.default_rng(2).random(1_000)
+        with pytest.raises(ValueError, match="does not fit"):
+            RangeExtremum(values, "min", max_bytes=0)
+        index = build_range_index("min", values, max_bytes=0)
+        assert isinstance(index, RangeWindow)
+        i1, i2 = _spans(1_000, 200, 300)
+        assert index.query(i1, i2).tolist() == _reference(values, i1, i2, np.min).tolist()
+
+    def test_single_position_spans(self):
+        values = np.array([0.3, 0.1, 0.7])
+        got = RangeExtremum(values, "min").query(np.arange(3), np.arange(1, 4))
+        assert got.tolist() == [0.3, 0.1, 0.7]
+
+    def test_unknown_op(self):
+        with pytest.raises(ValueError, match="Unknown extremum op"):
+            RangeExtremum(np.zeros(3), "mean")
+
+
+class TestRangeMedian:
+    @pytest.mark.parametrize("decimals", [None, 2])
+    def test_matches_np_median(self, decimals):
+        values = np.random.default_rng(8).random(2_000)
+        if decimals is not None:
+            values = np.round(values, decimals)  # many repeated ratios
+        i1, i2 = _spans(2_000, 1_500, 500, seed=9)
+        got = RangeMedian(values).query(i1, i2)
+        assert got.tolist() == _reference(values, i1, i2, np.median).tolist()
+
+    def test_kth_matches_sorted_slice(self):
+        values = np.random.default_rng(10).integers(0, 7, 300).astype(np.uint16)
+        i1, i2 = _spans(300, 200, 60, seed=11)
+        k = (i2 - i1) - 1
+        got = RangeMedian(values).kth(i1, i2, k)
+        assert got.tolist() == [values[a:b].max() for a, b in zip(i1, i2)]
+
+    def test_constant_values(self):
+        index = RangeMedian(np.full(50, 0.25))
+        assert index.query(np.array([0, 10]), np.array([50, 11])).tolist() == [0.25, 0.25]
+
+    def test_build_sorts_once(self, monkeypatch):
+        calls = []
+        unique = np.unique
+        monkeypatch.setattr(np, "unique", lambda *a, **k: calls.append(1) or unique(*a, **k))
+        values = np.random.default_rng(12).random(1_000)
+        index = build_range_index("median", values)
+        assert isinstance(index, RangeMedian) and len(calls) == 1
+        i1, i2 = _spans(1_000, 100, 50)
+        assert index.query(i1, i2).tolist() == _reference(values, i1, i2, np.median).tolist()
+
+    def test_falls_back_to_scan_over_cap(self):
+        values = np.random.default_rng(12).random(1_000)
+        assert isinstance(build_range_index("median", values), RangeMedian)
+        assert isinstance(build_range_index("median", values, max_bytes=0), RangeWindow)
+
+    def test_no_sort_when_cap_too_small(self, monkeypatch):
+        monkeypatch.setattr(np, "unique", lambda *a, **k: pytest.fail("sorted over cap"))
+        values = np.random.default_rng(12).random(100_000)
+        assert isinstance(build_range_index("median", values, max_bytes=1_000), RangeWindow)
+
+
+class TestIndexSaveLoad:
+    @pytest.mark.parametrize("stat", ["mean", "min", "max", "median"])
+    @pytest.mark.parametrize("max_bytes", [1 << 30, 0])
+    def test_round_trip(self, tmp_path, stat, max_bytes):
+        values = np.random.default_rng(6).random(700)
+        i1, i2 = _spans(700, 400, 90, seed=7)
+        index = build_range_index(stat, values, max_bytes=max_bytes)
+        loaded = index_load(index_save(index, str(tmp_path)))
+        assert loaded.query(i1, i2).tolist() == index.query(i1, i2).tolist()
+
+    def test_round_trip_keeps_scale(self, tmp_path):
+        values = np.arange(50, dtype=np.uint16)
+        index = build_range_index("mean", values, scale=65_535)
+        loaded = index_load(index_save(index, str(tmp_path)))
+        assert loaded.scale == 65_535
+        assert isinstance(loaded, RangeMeanFixed)
+
+    def test_unknown_stat(self):
+        with pytest.raises(ValueError, match="Unknown stat mode"):
+            build_range_index("mode", np.zeros(3))
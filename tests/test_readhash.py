@@ -0,0 +1,32 @@
+"""Tests for readhash.py: read-name hash fractions."""
+
+from samsamplex.readhash import xxh32_fraction, xxh32_fractions
+
+
+# ── xxh32_fraction ───────────────────────────────────────────────────────────
+
+
+class TestXxh32Fraction:
+    def test_in_range(self):
+        f = xxh32_fraction("read1", seed=42)
+        assert 0.0 <= f < 1.0
+
+    def test_deterministic(self):
+        assert xxh32_fraction("readA", 42) == xxh32_fraction("readA", 42)
+
+    def test_different_names_differ(self):
+        assert xxh32_fraction("readA", 42) != xxh32_fraction("readB", 42)
+
+    def test_different_seeds_differ(self):
+        assert xxh32_fraction("readA", 1) != xxh32_fraction("readA", 2)
+
+    def test_many_values_in_range(self):
+        fractions = [xxh32_fraction(f"read_{i}", seed=0) for i in range(1000)]
+        assert all(0.0 <= f < 1.0 for f in fractions)
+
+
+class TestXxh32Fractions:
+    def test_matches_scalar(self):
+        names = [f"read_{i}" for i in range(200)]
+        got = xxh32_fractions([n.encode() for n in names], 11)
+        assert got.tolist() == [xxh32_fraction(n, 11) for n in names]
@@ -1,16 +1,20 @@
-"""Tests for sample.py: hashing, ratio computation, ratio lookup helpers."""
+"""Tests for sample.py: ratio computation, batched ratio lookup, sampling runs."""
 
 import numpy as np
+import pysam
 import pytest
 
-from samsamplex.depth import DepthArray
+from samsamplex import rangeq
+from samsamplex import sample as sample_mod
+from samsamplex.depth import DepthArray, RunLengthDepthArray, depth_from_bam
+from samsamplex.rangeq import build_range_index
 from samsamplex.sample import (
+    _batch_ratios,
+    RATIO_SCALE,
     _compute_ratios,
-    _get_max_ratio,
-    _get_mean_ratio,
-    _get_median_ratio,
-    _get_min_ratio,
-    _xxh32_fraction,
+    _shard_bounds,
+    replicate_out_path,
+    sample_run,
 )
 
 
@@ -19,28 +23,6 @@ def _make(depths, start=0):
     return DepthArray(contig="chr1", start=start, end=start + len(d), depths=d)
 
 
-# ── _xxh32_fraction ──────────────────────────────────────────────────────────
-
-
-class TestXxh32Fraction:
-    def test_in_range(self):
-        f = _xxh32_fraction("read1", seed=42)
-        assert 0.0 <= f < 1.0
-
-    def test_deterministic(self):
-        assert _xxh32_fraction("readA", 42) == _xxh32_fraction("readA", 42)
-
-    def test_different_names_differ(self):
-        assert _xxh32_fraction("readA", 42) != _xxh32_fraction("readB", 42)
-
-    def test_different_seeds_differ(self):
-        assert _xxh32_fraction("readA", 1) != _xxh32_fraction("readA", 2)
-
-    def test_many_values_in_range(self):
-        fractions = [_xxh32_fraction(f"read_{i}", seed=0) for i in range(1000)]
-        assert all(0.0 <= f < 1.0 for f in fractions)
-
-
 # ── _compute_ratios ──────────────────────────────────────────────────────────
 
 
@@ -75,99 +57,321 @@ class TestComputeRatios:
         ratios = _compute_ratios(t, s)
         np.testing.assert_array_almost_equal(ratios, [0.5, 0.0, 1.0])
 
-
-# ── _get_mean_ratio ──────────────────────────────────────────────────────────
-
-
-class TestGetMeanRatio:
-    def _setup_cumsum(self, ratios, start=0):
-        """Build cumsum from a ratio list, return (cumsum, region_start, region_end)."""
-        r = np.array(ratios, dtype=np.float64)
-        cumsum = np.concatenate(([0.0], np.cumsum(r)))
-        return cumsum, start, start + len(ratios)
-
-    def test_full_span(self):
-        cumsum, rs, re = self._setup_cumsum([0.5, 0.5, 0.5])
-        assert _get_mean_ratio(cumsum, rs, re, rs, re) == pytest.approx(0.5)
-
-    def test_partial_span(self):
-        cumsum, rs, re = self._setup_cumsum([0.2, 0.4, 0.6, 0.8])
-        # Read covers positions 1-3 (indices 1,2 → values 0.4, 0.6)
-        assert _get_mean_ratio(cumsum, rs, re, 1, 3) == pytest.approx(0.5)
-
-    def test_no_overlap_returns_zero(self):
-        cumsum, rs, re = self._setup_cumsum([0.5, 0.5])
-        assert _get_mean_ratio(cumsum, rs, re, 10, 20) == pytest.approx(0.0)
-
-    def test_read_extends_beyond_region(self):
-        """Read that extends past region end should be clipped."""
-        cumsum, rs, re = self._setup_cumsum([1.0, 1.0, 1.0])  # region 0-3
-        assert _get_mean_ratio(cumsum, rs, re, 1, 100) == pytest.approx(1.0)
-
-    def test_single_position(self):
-        cumsum, rs, re = self._setup_cumsum([0.3, 0.7, 0.5])
-        assert _get_mean_ratio(cumsum, rs, re, 1, 2) == pytest.approx(0.7)
-
-
-# ── _get_min_ratio ───────────────────────────────────────────────────────────
-
-
-class TestGetMinRatio:
-    def test_uniform(self):
-        ratios = np.array([0.5, 0.5, 0.5])
-        assert _get_min_ratio(ratios, 0, 3, 0, 3) == pytest.approx(0.5)
-
-    def test_varying(self):
-        ratios = np.array([0.1, 0.9, 0.3, 0.7])
-        assert _get_min_ratio(ratios, 0, 4, 0, 4) == pytest.approx(0.1)
-
-    def test_partial(self):
-        ratios = np.array([0.1, 0.9, 0.3, 0.7])
-        assert _get_min_ratio(ratios, 0, 4, 1, 3) == pytest.approx(0.3)
-
-    def test_no_overlap(self):
-        ratios = np.array([0.5, 0.5])
-        assert _get_min_ratio(ratios, 0, 2, 5, 10) == pytest.approx(0.0)
-
-
-# ── _get_max_ratio ───────────────────────────────────────────────────────────
-
-
-class TestGetMaxRatio:
-    def test_uniform(self):
-        ratios = np.array([0.5, 0.5, 0.5])
-        assert _get_max_ratio(ratios, 0, 3, 0, 3) == pytest.approx(0.5)
-
-    def test_varying(self):
-        ratios = np.array([0.1, 0.9, 0.3, 0.7])
-        assert _get_max_ratio(ratios, 0, 4, 0, 4) == pytest.approx(0.9)
-
-    def test_partial(self):
-        ratios = np.array([0.1, 0.9, 0.3, 0.7])
-        assert _get_max_ratio(ratios, 0, 4, 2, 4) == pytest.approx(0.7)
-
-    def test_no_overlap(self):
-        ratios = np.array([0.5, 0.5])
-        assert _get_max_ratio(ratios, 0, 2, 5, 10) == pytest.approx(0.0)
-
-
-# ── _get_median_ratio ────────────────────────────────────────────────────────
-
-
-class TestGetMedianRatio:
-    def test_odd_count(self):
-        ratios = np.array([0.1, 0.5, 0.9])
-        assert _get_median_ratio(ratios, 0, 3, 0, 3) == pytest.approx(0.5)
-
-    def test_even_count(self):
-        ratios = np.array([0.1, 0.3, 0.7, 0.9])
-        # median of [0.1, 0.3, 0.7, 0.9] = (0.3 + 0.7) / 2 = 0.5
-        assert _get_median_ratio(ratios, 0, 4, 0, 4) == pytest.approx(0.5)
-
-    def test_single_position(self):
-        ratios = np.array([0.2, 0.8, 0.4])
-        assert _get_median_ratio(ratios, 0, 3, 1, 2) == pytest.approx(0.8)
-
-    def test_no_overlap(self):
-        ratios = np.array([0.5, 0.5])
-        assert _get_median_ratio(ratios, 0, 2, 5, 10) == pytest.approx(0.0)
+    def test_chunked_matches_single_pass(self, monkeypatch):
+        rng = np.random.default_rng(0)
+        t = _make(rng.integers(0, 40, 1_000).tolist())
+        s = _make(rng.integers(0, 40, 1_000).tolist())
+        whole = _compute_ratios(t, s)
+        monkeypatch.setattr(sample_mod, "RATIO_CHUNK", 7)
+        assert _compute_ratios(t, s).tolist() == whole.tolist()
+
+    def test_compact_fixed_point(self):
+        t = _make([5, 0, 50, 1])
+        s = _make([10, 0, 25, 3])
+        ratios = _compute_ratios(t, s, compact=True)
+        assert ratios.dtype == np.uint16
+        assert ratios.tolist() == [32768, 0, RATIO_SCALE, 21845]
+
+    def test_run_length_template_matches_dense(self, monkeypatch):
+        rng = np.random.default_rng(2)
+        t = _make(np.repeat(rng.integers(0, 40, 100), 10).tolist())
+        s = _make(rng.integers(0, 40, 1_000).tolist())
+        monkeypatch.setattr(sample_mod, "RATIO_CHUNK", 64)
+        rl = RunLengthDepthArray.from_dense(t)
+        assert _compute_ratios(rl, s).tolist() == _compute_ratios(t, s).tolist()
+
+    def test_scale(self):
+        t = _make([5, 0, 50, 3])
+        s = _make([10, 0, 25, 9])
+        np.testing.assert_array_almost_equal(_compute_ratios(t, s, scale=0.5), [0.25, 0.0, 1.0, 1 / 6])
+
+    def test_broadcast_template(self):
+        s = _make([10, 0, 25, 4])
+        t = DepthArray(contig="chr1", start=0, end=4, depths=np.broadcast_to(np.int32(5), (4,)))
+        np.testing.assert_array_almost_equal(_compute_ratios(t, s), [0.5, 0.0, 0.2, 1.0])
+
+    def test_compact_within_tolerance(self):
+        rng = np.random.default_rng(1)
+        t = _make(rng.integers(0, 60, 5_000).tolist())
+        s = _make(rng.integers(0, 60, 5_000).tolist())
+        exact = _compute_ratios(t, s)
+        compact = _compute_ratios(t, s, compact=True) / RATIO_SCALE
+        assert np.abs(compact - exact).max() <= 0.5 / RATIO_SCALE
+
+
+# ── _batch_ratios ────────────────────────────────────────────────────────────
+
+
+def _span_ratio(ratios, stat, region_start, region_end, read_start, read_end):
+    """Brute-force summary of one read span, clipped to the region."""
+    cs, ce = max(read_start, region_start), min(read_end, region_end)
+    if cs >= ce:
+        return 0.0
+    if stat == "mean":
+        cumsum = np.concatenate(([0.0], np.cumsum(ratios)))
+        return float(cumsum[ce - region_start] - cumsum[cs - region_start]) / (ce - cs)
+    reduce = {"min": np.min, "max": np.max, "median": np.median}[stat]
+    return float(reduce(ratios[cs - region_start : ce - region_start]))
+
+
+class TestBatchRatios:
+    @pytest.mark.parametrize(
+        "stat, ratios, span, expected",
+        [
+            ("mean", [0.2, 0.4, 0.6, 0.8], (1, 3), 0.5),
+            ("mean", [1.0, 1.0, 1.0], (1, 100), 1.0),
+            ("min", [0.1, 0.9, 0.3, 0.7], (1, 3), 0.3),
+            ("max", [0.1, 0.9, 0.3, 0.7], (2, 4), 0.7),
+            ("median", [0.1, 0.3, 0.7, 0.9], (0, 4), 0.5),
+            ("median", [0.2, 0.8, 0.4], (1, 2), 0.8),
+            ("median", [0.5, 0.5], (5, 10), 0.0),
+        ],
+    )
+    def test_small_spans(self, stat, ratios, span, expected):
+        index = build_range_index(stat, np.array(ratios))
+        got = _batch_ratios(index, 0, len(ratios), np.array([span[0]]), np.array([span[1]]))
+        assert got[0] == pytest.approx(expected)
+
+    @pytest.mark.parametrize("stat", ["mean", "min", "max", "median"])
+    @pytest.mark.parametrize("max_bytes", [1 << 30, 0])
+    def test_bit_identical_to_brute_force(self, stat, max_bytes, monkeypatch):
+        monkeypatch.setattr(rangeq, "WINDOW_BUDGET", 64)  # force many scan groups
+        rng = np.random.default_rng(5)
+        ratios = rng.random(300)
+        ratios[rng.random(300) < 0.2] = 1.0
+        rs, re = 1_000, 1_300
+        starts = rng.integers(900, 1_350, 500)
+        ends = starts + rng.integers(0, 120, 500)
+
+        index = build_range_index(stat, ratios, max_bytes=max_bytes)
+        got = _batch_ratios(index, rs, re, starts, ends)
+
+        expected = [_span_ratio(ratios, stat, rs, re, int(a), int(b)) for a, b in zip(starts, ends)]
+        assert got.tolist() == expected
+
+    @pytest.mark.parametrize("stat", ["mean", "min", "max", "median"])
+    def test_compact_within_tolerance(self, stat):
+        rng = np.random.default_rng(6)
+        t = _make(rng.integers(0, 30, 400).tolist())
+        s = _make(rng.integers(1, 30, 400).tolist())
+        starts = rng.integers(0, 400, 500)
+        ends = starts + rng.integers(1, 80, 500)
+
+        exact = _batch_ratios(build_range_index(stat, _compute_ratios(t, s)), 0, 400, starts, ends)
+        compact_index = build_range_index(
+            stat, _compute_ratios(t, s, compact=True), scale=RATIO_SCALE,
+        )
+        got = _batch_ratios(compact_index, 0, 400, starts, ends)
+        assert np.abs(got - exact).max() <= 0.5 / RATIO_SCALE + 1e-12
+
+
+# ── replicate_out_path ───────────────────────────────────────────────────────
+
+
+class TestReplicateOutPath:
+    def test_single_seed_unchanged(self):
+        assert replicate_out_path("out.bam", 42, 1) == "out.bam"
+
+    def test_suffix_inserted(self):
+        assert replicate_out_path("dir/out.bam", 43, 3) == "dir/out.seed43.bam"
+
+    def test_placeholder(self):
+        assert replicate_out_path("x.{seed}.bam", 7, 1) == "x.7.bam"
+
+    def test_non_bam_suffix(self):
+        assert replicate_out_path("out", 5, 2) == "out.seed5"
+
+
+# ── _shard_bounds ────────────────────────────────────────────────────────────
+
+
+class TestShardBounds:
+    def test_equal_length_without_weights(self):
+        assert _shard_bounds(0, 100, 4) == [(0, 25), (25, 50), (50, 75), (75, 100)]
+
+    def test_weighted_balances_mass(self):
+        w = np.zeros(100)
+        w[90:] = 1.0  # all reads in the last 10 positions
+        bounds = _shard_bounds(1_000, 1_100, 2, weights=w)
+        assert bounds[0][0] == 1_000 and bounds[-1][1] == 1_100
+        assert 1_090 <= bounds[0][1] <= 1_100
+
+    def test_contiguous_and_deduplicated(self):
+        bounds = _shard_bounds(0, 3, 8)
+        assert bounds[0][0] == 0 and bounds[-1][1] == 3
+        assert all(a[1] == b[0] and a[0] < a[1] for a, b in zip(bounds, bounds[1:]))
+
+
+# ── sample_run end to end ────────────────────────────────────────────────────
+
+
+def _kept_names(path):
+    with pysam.AlignmentFile(path, "rb") as bam:
+        return [r.query_name for r in bam.fetch(until_eof=True)]
+
+
+@pytest.fixture
+def sample_inputs(make_bam, tmp_path):
+    rng = np.random.default_rng(7)
+    reads = [
+        (f"r{i}", "chr1", int(rng.integers(0, 4_800)), f"{int(rng.integers(50, 200))}M")
+        for i in range(3_000)
+    ]
+    source = make_bam(reads, name="source.bam", contigs=(("chr1", 5_000),))
+    bed = tmp_path / "template.bed"
+    bed.write_text("chr1\t0\t2000\t20\nchr1\t2000\t3500\t60\nchr1\t3500\t5000\t5\n")
+    return source, str(bed), tmp_path
+
+
+class TestSampleRun:
+    @pytest.mark.parametrize("stat", ["mean", "min", "max", "median"])
+    def test_replicates_match_separate_runs(self, sample_inputs, stat):
+        source, bed, tmp = sample_inputs
+        for s in (43, 44):
+            assert sample_run(
+                source, [bed], "chr1", out_bam=str(tmp / f"single.{s}.bam"), stat=stat, seed=s,
+                no_metrics=True,
+            ) == 0
+        assert sample_run(
+            source, [bed], "chr1", out_bam=str(tmp / "multi.bam"), stat=stat, seeds=[43, 44],
+            no_metrics=True,
+        ) == 0
+        for s in (43, 44):
+            expected = _kept_names(tmp / f"single.{s}.bam")
+            assert expected
+            assert _kept_names(tmp / f"multi.seed{s}.bam") == expected
+
+    @pytest.mark.parametrize("cigar_aware", [False, True])
+    def test_metrics_use_accumulated_output_depth(self, sample_inputs, monkeypatch, cigar_aware):
+        source, bed, tmp = sample_inputs
+        seen = []
+        real = sample_mod.metrics_calculate
+        monkeypatch.setattr(
+            sample_mod, "metrics_calculate", lambda a, b: seen.append(b) or real(a, b),
+        )
+        out = str(tmp / "acc.bam")
+        assert sample_run(source, [bed], "chr1", out_bam=out, no_sort=True, cigar_aware=cigar_aware) == 0
+        assert len(seen) == 1
+        pysam.index(out)
+        expected = depth_from_bam(out, "chr1", 0, 5_000, cigar_aware=cigar_aware)
+        np.testing.assert_array_equal(seen[0].depths, expected.depths)
+
+    @pytest.mark.parametrize("mode", ["min", "mean"])
+    def test_interval_template_matches_per_base(self, sample_inputs, mode):
+        source, bed, tmp = sample_inputs
+        per_base = tmp / "per_base.bed"
+        depths = np.repeat([20, 60, 5], [2_000, 1_500, 1_500])
+        per_base.write_text("".join(f"chr1\t{i}\t{i + 1}\t{d}\n" for i, d in enumerate(depths)))
+        for name, beds in (("runs", [bed, bed]), ("dense", [str(per_base)] * 2)):
+            assert sample_run(
+                source, beds, "chr1", out_bam=str(tmp / f"{name}.bam"), mode=mode, no_metrics=True,
+            ) == 0
+        assert _kept_names(tmp / "runs.bam") == _kept_names(tmp / "dense.bam")
+
+    def test_template_library_matches_beds(self, sample_inputs):
+        from samsamplex.library import library_build
+
+        source, bed, tmp = sample_inputs
+        other = tmp / "other.bed"
+        other.write_text("chr1\t0\t3000\t35\nchr1\t3000\t5000\t10\n")
+        library_build(str(tmp / "lib"), [bed, str(other)], ids=["a", "b"])
+        assert sample_run(
+            source, [bed, str(other)], "chr1", out_bam=str(tmp / "beds.bam"), mode="min",
+            no_metrics=True,
+        ) == 0
+        assert sample_run(
+            source, [], "chr1", out_bam=str(tmp / "lib.bam"), mode="min", no_metrics=True,
+            template_library=str(tmp / "lib"), select=["b", "a"],
+        ) == 0
+        assert _kept_names(tmp / "lib.bam") == _kept_names(tmp / "beds.bam")
+
+    def test_precombined_used_only_when_matching(self, sample_inputs, capsys):
+        from samsamplex.combine import combine_write
+
+        source, bed, tmp = sample_inputs
+        other = tmp / "other.bed"
+        other.write_text("chr1\t0\t3000\t35\nchr1\t3000\t5000\t10\n")
+        beds = [bed, str(other)]
+        pre = str(tmp / "pre.bed")
+        combine_write(pre, beds, "chr1", 0, 5_000, mode="random", seed=42)
+
+        assert sample_run(source, beds, "chr1", out_bam=str(tmp / "a.bam"), no_metrics=True) == 0
+        capsys.readouterr()
+        assert sample_run(
+            source, beds, "chr1", out_bam=str(tmp / "b.bam"), no_metrics=True, precombined=pre,
+        ) == 0
+        assert "Using pre-combined template" in capsys.readouterr().err
+        assert _kept_names(tmp / "b.bam") == _kept_names(tmp / "a.bam")
+
+        assert sample_run(
+            source, beds, "chr1", out_bam=str(tmp / "c.bam"), no_metrics=True, precombined=pre, seed=7,
+        ) == 0
+        assert "Not using pre-combined template" in capsys.readouterr().err
+
+    @pytest.mark.parametrize("content", [None, "#samsamplex-combine {not json\n", "#samsamplex-combine {}\n"])
+    def test_precombined_unreadable_falls_back(self, sample_inputs, capsys, content):
+        source, bed, tmp = sample_inputs
+        other = tmp / "other.bed"
+        other.write_text("chr1\t0\t5000\t20\n")
+        beds = [bed, str(other)]
+        pre = tmp / "pre.bed"
+        if content is not None:
+            pre.write_text(content + "chr1\t0\t5000\t1\n")
+
+        assert sample_run(source, beds, "chr1", out_bam=str(tmp / "a.bam"), no_metrics=True) == 0
+        capsys.readouterr()
+        assert sample_run(
+            source, beds, "chr1", out_bam=str(tmp / "b.bam"), no_metrics=True, precombined=str(pre),
+        ) == 0
+        assert "Not using pre-combined template" in capsys.readouterr().err
+        assert _kept_names(tmp / "b.bam") == _kept_names(tmp / "a.bam")
+
+    @pytest.mark.parametrize("n_templates", [1, 2])
+    def test_template_bams_match_mapped_beds(self, sample_inputs, make_bam, n_templates):
+        from samsamplex.bed import write_bed_output
+
+        source, _, tmp = sample_inputs
+        rng = np.random.default_rng(11)
+        bams, beds = [], []
+        for t in range(n_templates):
+            reads = [
+                (f"t{i}", "chr1", int(rng.integers(0, 4_900)), "100M") for i in range(400 + 300 * t)
+            ]
+            bams.append(make_bam(reads, name=f"tpl{t}.bam", contigs=(("chr1", 5_000),)))
+            beds.append(str(tmp / f"tpl{t}.bed"))
+            with open(beds[-1], "w") as fp:
+                write_bed_output(fp, depth_from_bam(bams[-1], "chr1", 0, 5_000))
+
+        kwargs = dict(mode="max", no_metrics=True, cache_dir=str(tmp / "cache"))
+        assert sample_run(source, beds, "chr1", out_bam=str(tmp / "beds.bam"), **kwargs) == 0
+        assert sample_run(
+            source, [], "chr1", out_bam=str(tmp / "bams.bam"), template_bams=bams, **kwargs,
+        ) == 0
+        assert _kept_names(tmp / "bams.bam") == _kept_names(tmp / "beds.bam")
+
+    def test_target_depth_matches_constant_bed(self, sample_inputs):
+        source, _, tmp = sample_inputs
+        const = tmp / "const.bed"
+        const.write_text("chr1\t0\t5000\t30\n")
+        assert sample_run(source, [str(const)], "chr1", out_bam=str(tmp / "bed.bam"), no_metrics=True) == 0
+        assert sample_run(
+            source, [], "chr1", out_bam=str(tmp / "target.bam"), target_depth=60, template_scale=0.5,
+        ) == 0
+        assert _kept_names(tmp / "target.bam") == _kept_names(tmp / "bed.bam")
+
+    @pytest.mark.parametrize("uniform", [None, 0.3])
+    def test_sharded_matches_serial(self, sample_inputs, uniform):
+        source, bed, tmp = sample_inputs
+        serial, sharded = str(tmp / "serial.bam"), str(tmp / "sharded.bam")
+        kwargs = dict(seeds=[1, 2], no_metrics=True, uniform_fraction=uniform)
+        assert sample_run(source, [bed], "chr1:101-4900", out_bam=serial, **kwargs) == 0
+        assert sample_run(source, [bed], "chr1:101-4900", out_bam=sharded, threads=3, **kwargs) == 0
+        for s in (1, 2):
+            expected = _kept_names(tmp / f"serial.seed{s}.bam")
+            got = _kept_names(tmp / f"sharded.seed{s}.bam")
+            assert got == expected
+            assert len(got) == len(set(got))
+            with pysam.AlignmentFile(str(tmp / f"sharded.seed{s}.bam")) as bam:
+                pos = [r.reference_start for r in bam.fetch("chr1")]
+            assert pos == sorted(pos)
+        assert not list(tmp.glob(".samsamplex-shards-*"))
@@ -0,0 +1,131 @@
+"""Tests for ssxd.py: binary template round-trips, region loads, BED conversion."""
+
+import io
+
+import numpy as np
+import pytest
+
+from samsamplex.bed import bed_contig_extents, bed_read_depths, write_bed_output
+from samsamplex.depth import DepthArray, RunLengthDepthArray
+from samsamplex.ssxd import (
+    ssxd_read_depths,
+    ssxd_read_header,
+    ssxd_read_template,
+    ssxd_to_bed,
+    ssxd_write,
+)
+
+
+def _arr(depths, contig="chr1", start=0):
+    d = np.asarray(depths, dtype=np.int32)
+    return DepthArray(contig=contig, start=start, end=start + len(d), depths=d)
+
+
+@pytest.fixture
+def steps():
+    rng = np.random.default_rng(0)
+    return _arr(np.repeat(rng.integers(0, 60, 200), rng.integers(1, 30, 200)), start=1_000)
+
+
+# ── Round trips ──────────────────────────────────────────────────────────────
+
+
+class TestSsxdRoundTrip:
+    @pytest.mark.parametrize("encoding", ["raw", "rle", "auto"])
+    def test_whole_contig(self, tmp_path, steps, encoding):
+        path = str(tmp_path / "t.ssxd")
+        ssxd_write(path, [steps], encoding=encoding)
+        got = ssxd_read_depths(path, "chr1", steps.start, steps.end)
+        np.testing.assert_array_equal(got.depths, steps.depths)
+
+    def test_auto_picks_smaller_encoding(self, tmp_path, steps):
+        noisy = _arr(np.random.default_rng(1).integers(0, 100, 1_000), contig="chr2")
+        path = str(tmp_path / "t.ssxd")
+        ssxd_write(path, [steps, noisy])
+        encodings = [c.encoding for c in ssxd_read_header(path).contigs]
+        assert encodings == ["rle", "raw"]
+
+    @pytest.mark.parametrize("encoding", ["raw", "rle"])
+    @pytest.mark.parametrize("offset", [(-50, 10), (5, 40), (100, 10_000), (-500, -400)])
+    def test_partial_regions(self, tmp_path, steps, encoding, offset):
+        path = str(tmp_path / "t.ssxd")
+        ssxd_write(path, [steps], encoding=encoding)
+        start, end = steps.start + offset[0], steps.start + offset[1]
+
+        expected = np.zeros(end - start, dtype=np.int32)
+        lo, hi = max(start, steps.start), min(end, steps.end)
+        if lo < hi:
+            expected[lo - start : hi - start] = steps.depths[lo - steps.start : hi - steps.start]
+        np.testing.assert_array_equal(ssxd_read_depths(path, "chr1", start, end).depths, expected)
+
+    @pytest.mark.parametrize("offset", [(-50, 10), (5, 40), (100, 10_000), (-500, -400), (6_000, 6_100)])
+    def test_template_runs_match_depths(self, tmp_path, steps, offset):
+        path = str(tmp_path / "t.ssxd")
+        ssxd_write(path, [steps], encoding="rle")
+        start, end = steps.start + offset[0], steps.start + offset[1]
+        got = ssxd_read_template(path, "chr1", start, end)
+        assert isinstance(got, RunLengthDepthArray)
+        np.testing.assert_array_equal(got.to_dense().depths, ssxd_read_depths(path, "chr1", start, end).depths)
+
+    def test_template_raw_block_stays_dense(self, tmp_path, steps):
+        path = str(tmp_path / "t.ssxd")
+        ssxd_write(path, [steps], encoding="raw")
+        assert isinstance(ssxd_read_template(path, "chr1", steps.start, steps.end), DepthArray)
+
+    def test_raw_region_is_memmapped(self, tmp_path, steps):
+        path = str(tmp_path / "t.ssxd")
+        ssxd_write(path, [steps], encoding="raw")
+        got = ssxd_read_depths(path, "chr1", steps.start + 10, steps.start + 20)
+        assert isinstance(got.depths, np.memmap)
+        assert not got.depths.flags.writeable
+
+    def test_chr_prefix_and_missing_contig(self, tmp_path, steps):
+        path = str(tmp_path / "t.ssxd")
+        ssxd_write(path, [steps])
+        np.testing.assert_array_equal(
+            ssxd_read_depths(path, "1", steps.start, steps.end).depths, steps.depths,
+        )
+        assert not ssxd_read_depths(path, "chr9", 0, 10).depths.any()
+
+    def test_streamed_arrays(self, tmp_path, steps):
+        other = _arr(np.arange(500) % 7, contig="chr2")
+        ssxd_write(str(tmp_path / "list.ssxd"), [steps, other])
+        ssxd_write(str(tmp_path / "gen.ssxd"), (a for a in (steps, other)))
+        assert (tmp_path / "gen.ssxd").read_bytes() == (tmp_path / "list.ssxd").read_bytes()
+
+    def test_bad_magic(self, tmp_path):
+        path = tmp_path / "t.ssxd"
+        path.write_bytes(b"chr1\t0\t1\t5\n" * 4)
+        with pytest.raises(ValueError, match="bad magic"):
+            ssxd_read_header(str(path))
+
+    def test_unknown_encoding(self, tmp_path, steps):
+        with pytest.raises(ValueError, match="Unknown ssxd encoding"):
+            ssxd_write(str(tmp_path / "t.ssxd"), [steps], encoding="zstd")
+
+
+# ── BED conversion ───────────────────────────────────────────────────────────
+
+
+class TestSsxdBed:
+    @pytest.mark.parametrize("collapse", [0, 3])
+    def test_to_bed_matches_write_bed_output(self, tmp_path, steps, collapse):
+        path = str(tmp_path / "t.ssxd")
+        ssxd_write(path, [steps], collapse=collapse, encoding="raw")
+        assert ssxd_read_header(path).collapse == collapse
+
+        got, expected = io.StringIO(), io.StringIO()
+        ssxd_to_bed(path, got)
+        write_bed_output(expected, steps, collapse=collapse)
+        assert got.getvalue() == expected.getvalue()
+
+    def test_bed_read_depths_dispatch(self, tmp_path, steps):
+        path = str(tmp_path / "t.ssxd")
+        ssxd_write(path, [steps])
+        got = bed_read_depths(path, "chr1", steps.start, steps.end)
+        np.testing.assert_array_equal(got.depths, steps.depths)
+
+    def test_contig_extents(self, tmp_path):
+        bed = tmp_path / "t.bed"
+        bed.write_text("chr2\t10\t20\t1\nchr1\t5\t6\t2\n# x\nchr2\t0\t5\t3\nchr1 40 90 4\n")
+        assert bed_contig_extents(str(bed)) == {"chr2": (0, 20), "chr1": (5, 90)}